@@ -32,7 +32,8 @@
 
 # Python specific imports
 import json
-from datetime import datetime, timedelta
+from time import time
+from collections import OrderedDict
 from uuid import uuid4
 
 try:
@@ -47,6 +48,11 @@ except ImportError:
     def _checkIsStringIO(obj):
         return isinstance(obj, StringIO)
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 # twisted specific imports
 from twisted.python import log
 from twisted.internet.task import LoopingCall
@@ -55,6 +61,34 @@ from twisted.internet.task import LoopingCall
 from rce.error import InternalError, InvalidRequest
 
 
+# Wire encodings which can be negotiated for the websocket connections
+JSON_ENCODING = 'json'
+MSGPACK_ENCODING = 'msgpack'
+
+if msgpack:
+    ENCODINGS = (MSGPACK_ENCODING, JSON_ENCODING)
+else:
+    ENCODINGS = (JSON_ENCODING,)
+
+# msgpack extension type which is used for binary data
+_MSGPACK_BINARY = 0
+
+# struct formats of the numeric types whose arrays can be sent as little-endian
+# binary data; shared by the cloud engine and the robot clients
+ARRAY_FORMATS = {   'byte'    : 'b',
+                    'char'    : 'B',
+                    'uint8'   : 'B',
+                    'int8'    : 'b',
+                    'uint16'  : 'H',
+                    'int16'   : 'h',
+                    'uint32'  : 'I',
+                    'int32'   : 'i',
+                    'uint64'  : 'Q',
+                    'int64'   : 'q',
+                    'float32' : 'f',
+                    'float64' : 'd' }
+
+
 def recursiveBinarySearch(multidict):
     """ Search a JSON message for StringIO instances which should be replaced
         with a reference to a binary message. Returns a list of all binary
@@ -109,12 +143,62 @@ def recursiveBinarySearch(multidict):
         multidict['{0}*'.format(k)] = ele
     
     return uriBinary, multidict      
+
+
+def _packBinary(obj):
+    if _checkIsStringIO(obj):
+        return msgpack.ExtType(_MSGPACK_BINARY, obj.getvalue())
+    
+    raise TypeError('Can not pack object of type '
+                    "'{0}'.".format(type(obj).__name__))
+
+
+def _unpackBinary(code, data):
+    if code == _MSGPACK_BINARY:
+        return StringIO(data)
+    
+    return msgpack.ExtType(code, data)
+
+
+def packMessage(msg):
+    """ Encode a message in the msgpack format. Other than in the JSON
+        encoding the StringIO instances are included directly in the message
+        as binary data.
+        
+        @param msg:     Message which should be encoded.
+        @type  msg:     { str : ... }
         
+        @return:        Encoded message.
+        @rtype:         str
+    """
+    return msgpack.packb(msg, default=_packBinary)
+
+
+def unpackMessage(data):
+    """ Decode a message in the msgpack format.
+        
+        @param data:    Encoded message.
+        @type  data:    str
+        
+        @return:        Decoded message where the binary data is represented
+                        by StringIO instances.
+        @rtype:         { str : ... }
+    """
+    try:
+        msg = msgpack.unpackb(data, ext_hook=_unpackBinary)
+    except (TypeError, ValueError):
+        raise InvalidRequest('Message is not in valid msgpack format.')
+    
+    if not isinstance(msg, dict):
+        raise InvalidRequest('Message has to be a dictionary.')
+    
+    return msg
+
 
 class _IncompleteMsg(object):
     """ Class which represents an incomplete class.
     """
-    def __init__(self, assembler, msg, uris):
+    def __init__(self, assembler, msg, uris, size):
         """ Initialize the incomplete message.
             
             @param assembler:   Assembler to which the this instance
@@ -124,8 +208,13 @@ class _IncompleteMsg(object):
             @param msg:     Incomplete message as a dictionary.
             @type  msg:     dict
             
-            @param uris:    Return value of _recursiveURISearch
+            @param uris:    References to the binary data collected by
+                            _parseMessage
             @type  nr:      [ (str, dict, str) ]
+            
+            @param size:    Size of the message in bytes, which includes the
+                            already attached binaries.
+            @type  size:    int
         """
         self._assembler = assembler
         self._msg = msg
@@ -134,7 +223,8 @@ class _IncompleteMsg(object):
         for uri, msgDict, key in uris:
             self._uris[uri] = (msgDict, key)
         
-        self._added = datetime.now()
+        self._size = size
+        self._added = time()
     
     @property
     def msg(self):
@@ -144,13 +234,22 @@ class _IncompleteMsg(object):
         
         return self._msg
     
-    def older(self, timestamp):
-        """ Returns True if this incomplete message is older the the given
-            timestamp.
-        """
-        return self._added < timestamp
+    @property
+    def uris(self):
+        """ List of URIs of the binaries which are still missing. """
+        return self._uris.keys()
     
-    def addBinary(self, uri, binaryData):
+    @property
+    def size(self):
+        """ Size of the message and the attached binaries in bytes. """
+        return self._size
+    
+    @property
+    def timestamp(self):
+        """ Time when the last part was added to this incomplete message. """
+        return self._added
+    
+    def addBinary(self, uri, binaryData, size):
         """ Add the binary data with the given uri.
             
             @return:    True if the binary was used; False otherwise.
@@ -160,9 +259,10 @@ class _IncompleteMsg(object):
         if ref:
             parent, key = ref
             parent[key] = binaryData
+            self._size += size
             
             if self._uris:
-                self._added = datetime.now()
+                self._added = time()
             else:
                 self._assembler.forwardCompleteMessage(self)
             
@@ -174,8 +274,17 @@ class _IncompleteMsg(object):
 class MessageAssembler(object):
     """ Class which is used to store incomplete messages for a certain time
         and which is used to assemble them when possible.
+        
+        The stored parts are limited by a count and a byte budget. If a budget
+        is exceeded the least recently updated parts are dropped. The protocol
+        is informed via the callback 'assemblerCongested' as soon as the usage
+        of a budget crosses the high or the low watermark.
     """
-    def __init__(self, protocol, timeout):
+    # CONFIG
+    HIGH_WATERMARK = 0.8  # Fraction of the budget where congestion starts
+    LOW_WATERMARK = 0.5   # Fraction of the budget where congestion ends
+    
+    def __init__(self, protocol, timeout, maxCount=1000, maxSize=50000000):
         """ Initialize the binary assembler.
             
             @param protocol:    Protocol instance for which this assembler is
@@ -184,27 +293,87 @@ class MessageAssembler(object):
             @param timeout:     Timeout in seconds after which incomplete
                                 message parts are removed.
             @type  timeout:     int
+            
+            @param maxCount:    Maximal number of incomplete messages and
+                                unmatched binaries which are stored.
+            @type  maxCount:    int
+            
+            @param maxSize:     Maximal size in bytes of all incomplete
+                                messages and unmatched binaries which are
+                                stored.
+            @type  maxSize:     int
         """
         self._protocol = protocol
         self._timeout = timeout
+        self._maxCount = maxCount
+        self._maxSize = maxSize
         
-        # Set of _IncompleteMessage instances
-        self._incompleteMsgs = set()
+        # Incomplete messages as keys in the order of their last update
+        self._incompleteMsgs = OrderedDict()
         
-        # Dictionary with binary UID as key and the binary as value
-        self._binaries = {}
+        # Dictionary with binary UID as key and the _IncompleteMessage
+        # instance which waits for the binary as value
+        self._pendingURIs = {}
+        
+        # Dictionary with binary UID as key and the tuple
+        # (binary, size, timestamp) as value in the order of their arrival
+        self._binaries = OrderedDict()
+        
+        # Number of bytes used by the stored parts
+        self._size = 0
+        self._congested = False
+        
+        # Counters for the dropped parts
+        self._droppedMsgs = 0
+        self._droppedBinaries = 0
+        self._droppedBytes = 0
         
         # Setup repeated calling of the clean up method
         self._cleaner = LoopingCall(self._cleanUp)
     
+    @property
+    def stats(self):
+        """ Dictionary containing the current usage of the budgets and the
+            counters of the dropped parts.
+        """
+        return {'incompleteMessages' : len(self._incompleteMsgs),
+                'binaries' : len(self._binaries),
+                'size' : self._size,
+                'droppedMessages' : self._droppedMsgs,
+                'droppedBinaries' : self._droppedBinaries,
+                'droppedBytes' : self._droppedBytes}
+    
     def forwardCompleteMessage(self, msgRepr):
         """ Callback for client.assembler._IncompleteMsg to send a completed
             message to the correct handler.
         """
-        self._incompleteMsgs.remove(msgRepr)
+        self._removeIncompleteMsg(msgRepr)
         self._protocol.processCompleteMessage(msgRepr.msg)
     
-    def _handleString(self, msg, uris):
+    def _removeIncompleteMsg(self, msg):
+        """ Internally used method to remove an incomplete message and all
+            references to it from the assembler.
+        """
+        del self._incompleteMsgs[msg]
+        self._size -= msg.size
+        
+        for uri in msg.uris:
+            if self._pendingURIs.get(uri) == msg:
+                del self._pendingURIs[uri]
+    
+    def _removeBinary(self, uri):
+        """ Internally used method to remove an unmatched binary from the
+            assembler.
+            
+            @return:    The removed binary or None.
+        """
+        binaryData = self._binaries.pop(uri, None)
+        
+        if binaryData:
+            self._size -= binaryData[1]
+            return binaryData[0]
+    
+    def _handleString(self, msg, uris, size):
         """ Try to process the received incomplete string message, i.e.
             assemble the message with the waiting binary data. Forward the
             message if it can be completed and store the incomplete message
@@ -215,21 +384,34 @@ class MessageAssembler(object):
             
             @param uris:    Return value of _recursiveURISearch
             @type  uris:    [ (str, dict, str) or (str, list, int) ]
+            
+            @param size:    Size of the received string message in bytes.
+            @type  size:    int
         """
         missing = []
         
         for ref in uris:
             uri, parent, key = ref
-            binaryData = self._binaries.pop(uri, None)
+            binarySize = self._binaries.get(uri, (None, 0))[1]
+            binaryData = self._removeBinary(uri)
             
             if binaryData:
-                parent[key] = binaryData[0]
+                parent[key] = binaryData
+                size += binarySize
             else:
                 missing.append(ref)
         
         if missing:
-            self._incompleteMsgs.add(_IncompleteMsg(self, msg, missing))
+            incomplete = _IncompleteMsg(self, msg, missing, size)
+            self._incompleteMsgs[incomplete] = None
+            self._size += size
+            
+            for uri, _, _ in missing:
+                self._pendingURIs[uri] = incomplete
+            
+            self._enforceBudget()
         else:
+            self._updateCongestion()
             self._protocol.processCompleteMessage(msg)
     
     def _handleBinary(self, msg):
@@ -242,43 +424,108 @@ class MessageAssembler(object):
             @type  msg:     str
         """
         uri = msg[:32]
-        binaryData = StringIO()
-        binaryData.write(msg[32:])
+        size = len(msg) - 32
         
-        for msg in self._incompleteMsgs:
-            if msg.addBinary(uri, binaryData):
-                break
+        # Wrap the payload without copying it; the received message is kept
+        # alive by the read-only StringIO instance
+        binaryData = StringIO(buffer(msg, 32))
+        
+        incomplete = self._pendingURIs.pop(uri, None)
+        self._size += size
+        
+        if incomplete and incomplete.addBinary(uri, binaryData, size):
+            if incomplete in self._incompleteMsgs:
+                # Mark the incomplete message as most recently updated
+                del self._incompleteMsgs[incomplete]
+                self._incompleteMsgs[incomplete] = None
         else:
-            self._binaries[uri] = (binaryData, datetime.now())
+            self._binaries[uri] = (binaryData, size, time())
+        
+        self._enforceBudget()
     
-    def _recursiveURISearch(self, multidict):
-        """ Internally used method to find binary data in incoming messages.
+    def _enforceBudget(self):
+        """ Internally used method to drop the least recently updated parts
+            until the stored parts fit into the budgets again.
+        """
+        droppedMsgs = 0
+        droppedBinaries = 0
+        droppedBytes = 0
+        
+        while (len(self._incompleteMsgs) + len(self._binaries) > self._maxCount
+               or self._size > self._maxSize):
+            msg = next(self._incompleteMsgs.iterkeys(), None)
+            uri = next(self._binaries.iterkeys(), None)
+            
+            if uri is None or (msg and
+                               msg.timestamp < self._binaries[uri][2]):
+                self._removeIncompleteMsg(msg)
+                droppedMsgs += 1
+                droppedBytes += msg.size
+            else:
+                droppedBinaries += 1
+                droppedBytes += self._binaries[uri][1]
+                self._removeBinary(uri)
+        
+        if droppedBytes:
+            self._droppedMsgs += droppedMsgs
+            self._droppedBinaries += droppedBinaries
+            self._droppedBytes += droppedBytes
             
-            @return:    List of tuples of the forms (uri, dict, key) or
-                        (uri, list, index)
+            log.msg('Assembler budget exceeded: {0} incomplete messages and '
+                    '{1} unused binaries have been dropped ({2} bytes dropped '
+                    'in total).'.format(droppedMsgs, droppedBinaries,
+                                        self._droppedBytes))
+        
+        self._updateCongestion()
+    
+    def _updateCongestion(self):
+        """ Internally used method to inform the protocol when the usage of
+            the budgets crosses one of the watermarks.
         """
-        valueList = []
-        keys = []
+        usage = max(float(len(self._incompleteMsgs) + len(self._binaries)) /
+                    self._maxCount, float(self._size) / self._maxSize)
         
-        for k, v in multidict.iteritems():
-            if isinstance(v, dict):
-                valueList += self._recursiveURISearch(v)
-            elif k[-1] == '*':
-                keys.append(k)
+        if not self._congested and usage >= self.HIGH_WATERMARK:
+            self._congested = True
+            self._protocol.assemblerCongested(True)
+        elif self._congested and usage <= self.LOW_WATERMARK:
+            self._congested = False
+            self._protocol.assemblerCongested(False)
+    
+    def _parseMessage(self, msg):
+        """ Internally used method to decode an incoming JSON message. The
+            references to binary data, i.e. the keys ending with '*', are
+            collected while the message is decoded such that the decoded
+            message does not have to be searched a second time.
+            
+            @return:    Decoded message and a list of tuples of the forms
+                        (uri, dict, key) or (uri, list, index)
+        """
+        uris = []
         
-        for k in keys:
-            ele = multidict.pop(k)
+        def collect(pairs):
+            multidict = {}
             
-            if isinstance(ele, list):
-                lst = [None]*len(ele)
-                multidict[k[:-1]] = lst
-                
-                for i, uri in enumerate(ele):
-                    valueList.append((uri, lst, i))
-            else:
-                valueList.append((ele, multidict, k[:-1]))
+            for k, v in pairs:
+                if k[-1:] != '*':
+                    multidict[k] = v
+                elif isinstance(v, list):
+                    lst = [None]*len(v)
+                    multidict[k[:-1]] = lst
+                    
+                    for i, uri in enumerate(v):
+                        uris.append((uri, lst, i))
+                else:
+                    uris.append((v, multidict, k[:-1]))
+            
+            return multidict
         
-        return valueList
+        try:
+            msg = json.loads(msg, object_pairs_hook=collect)
+        except ValueError:
+            raise InvalidRequest('Message is not in valid JSON format.')
+        
+        return msg, uris
     
     def processMessage(self, msg, binary):
         """ This method is used to process any messages which should pass
@@ -287,18 +534,21 @@ class MessageAssembler(object):
         if binary:
             self._handleBinary(msg)
         else:
-            try:
-                msg = json.loads(msg)
-            except ValueError:
-                raise InvalidRequest('Message is not in valid JSON format.')
-            
-            uris = self._recursiveURISearch(msg)
+            size = len(msg)
+            msg, uris = self._parseMessage(msg)
             
             if uris:
-                self._handleString(msg, uris)
+                self._handleString(msg, uris, size)
             else:
                 self._protocol.processCompleteMessage(msg)
     
+    def processPackedMessage(self, msg):
+        """ This method is used to process messages which use the msgpack
+            encoding. These messages are always complete and are therefore
+            directly forwarded to the protocol.
+        """
+        self._protocol.processCompleteMessage(unpackMessage(msg))
+    
     def start(self):
         """ Start the cleaner of the assembler.
         """
@@ -308,7 +558,10 @@ class MessageAssembler(object):
         """ Stop the cleaner of the assembler and remove any circular
             references.
         """
-        self._incompleteMsgs = set()
+        self._incompleteMsgs = OrderedDict()
+        self._pendingURIs = {}
+        self._binaries = OrderedDict()
+        self._size = 0
         
         if self._cleaner.running:
             self._cleaner.stop()
@@ -316,23 +569,36 @@ class MessageAssembler(object):
     def _cleanUp(self):
         """ Internally used method to remove old incomplete messages.
         """
-        limit = datetime.now()-timedelta(seconds=self._timeout)
+        limit = time()-self._timeout
+        
+        toClean = []
         
-        toClean = [msg for msg in self._incompleteMsgs if msg.older(limit)]
+        for msg in self._incompleteMsgs:
+            if msg.timestamp >= limit:
+                break
+            
+            toClean.append(msg)
         
         if toClean:
             for msg in toClean:
-                self._incompleteMsgs.remove(msg)
+                self._removeIncompleteMsg(msg)
             
             log.msg('{0} incomplete messages have been dropped '
                     'from assembler.'.format(len(toClean)))
         
-        toClean = [uri for uri, (_, timestamp) in self._binaries.iteritems()
-                   if timestamp < limit]
+        toClean = []
+        
+        for uri, (_, _, timestamp) in self._binaries.iteritems():
+            if timestamp >= limit:
+                break
+            
+            toClean.append(uri)
         
         if toClean:
             for uri in toClean:
-                del self._binaries[uri]
+                self._removeBinary(uri)
             
             log.msg('{0} unused binaries have been dropped '
                     'from assembler.'.format(len(toClean)))
+        
+        self._updateCongestion()
@@ -101,7 +101,8 @@ class IRobot(Interface):
             @type  nTag:        str
         """
     
-    def addInterface(eTag, iTag, iType, clsName, addr=''): #@NoSelf
+    def addInterface(eTag, iTag, iType, clsName, addr='', #@NoSelf
+                     options=None):
         """ Add an interface to an endpoint, i.e. a ROS environment or a 
             Robot object.
             
@@ -120,7 +121,7 @@ class IRobot(Interface):
                                      ServiceClient, ServiceProvider,
                                      Publisher, Subscriber
                                  - Valid suffixes are:
-                                     Interface, Converter, Forwarder
+                                     Interface, Converter, Forwarder, Raw
             @type  iType:       str
             
             @param clsName:     Message type/Service type consisting of the
@@ -132,6 +133,29 @@ class IRobot(Interface):
                                 use. Only necessary if the suffix of @param
                                 iType is 'Interface'.
             @type  addr:        str
+            
+            @param options:     Additional options for the interface. Only
+                                supported if the suffix of @param iType is
+                                'Converter', 'Forwarder' or 'Raw'. Publishers
+                                support the keys 'conflate' (only the latest
+                                message is kept while the connection to the
+                                robot is congested) and 'maxRate' (maximal
+                                number of messages per second sent to the
+                                robot). Converters of
+                                message types with a custom Converter support
+                                the key 'converter' with the keyword arguments
+                                for the custom Converter, e.g. for images
+                                {'codec' : 'jpeg', 'quality' : 80,
+                                 'scale' : 0.5, 'roi' : [0, 0, 320, 240]}.
+                                Publisher Converters support the keys
+                                'fields' (list of dotted paths, i.e.
+                                'pose.pose.position', of the fields sent to
+                                the robot) and 'threshold' (dictionary with
+                                dotted paths of numeric fields as keys and
+                                thresholds as values; a message is only sent
+                                if a field changed by more than its
+                                threshold).
+            @type  options:     { str : bool / float / list / dict }
         """
     
     def removeInterface(eTag, iTag): #@NoSelf
@@ -237,6 +261,11 @@ class IRobot(Interface):
     def unregisterConnectionToRobot(): #@NoSelf
         """ Unregister the connection to the robot with this avatar.
         """
+    
+    def connectionResumed(): #@NoSelf
+        """ Callback for the connection to inform the avatar that the
+            connection to the robot is able to accept messages again.
+        """
 
 
 class IRobotCredentials(Interface):
@@ -38,10 +38,14 @@ try:
 except ImportError:
     from StringIO import StringIO #@UnusedImport
 
+# zope specific imports
+from zope.interface import implements
+
 # twisted specific imports
 from twisted.python import log
 from twisted.python.failure import Failure
 from twisted.internet.defer import fail
+from twisted.internet.interfaces import IPushProducer
 from twisted.cred.error import UnauthorizedLogin
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
@@ -55,7 +59,8 @@ from autobahn.websocket import HttpException, \
 from rce.error import InvalidRequest, InternalError, DeadConnection
 from rce.client import types
 from rce.client.interfaces import IRobot
-from rce.client.assembler import recursiveBinarySearch, MessageAssembler
+from rce.client.assembler import recursiveBinarySearch, packMessage, \
+    MessageAssembler, ENCODINGS, JSON_ENCODING, MSGPACK_ENCODING
 from rce.client.cred import RobotCredentials
 
 
@@ -105,6 +110,15 @@ class MasterRobotAuthentication(Resource):
                                       'Minimal version is '
                                       "'{0}'.".format(_MIN_VERSION)))
         
+        # Select the first encoding supported by the client and the cloud
+        # engine; the client lists its encodings in order of preference
+        encoding = JSON_ENCODING
+        
+        for option in args.get('encoding', []):
+            if option in ENCODINGS:
+                encoding = option
+                break
+        
         # Version is ok, now the GET request can be processed
         try:
             userID = args['userID']
@@ -121,14 +135,15 @@ class MasterRobotAuthentication(Resource):
                                            'in request.'.format(name)))
         
         d = self._realm.requestUser(userID[0], robotID[0], password[0])
-        d.addCallback(lambda result: (result, version))
+        d.addCallback(lambda result: (result, version, encoding))
         return d
     
-    def _processGETResp(self, ((key, addr), version), request):
+    def _processGETResp(self, ((key, addr), version, encoding), request):
         """ Internally used method to process a response to a GET request from
             the realm.
         """
-        msg = {'key' : key, 'url' : 'ws://{0}/'.format(addr)}
+        msg = {'key' : key, 'url' : 'ws://{0}/'.format(addr),
+               'encoding' : encoding}
         
         if version != _CUR_VERSION:
             msg['current'] = _CUR_VERSION
@@ -183,8 +198,12 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
     """ Protocol which is used for the connections from the robots to the
         robot manager.
     """
+    implements(IPushProducer)
+    
     # CONFIG
     MSG_QUEUE_TIMEOUT = 60
+    MSG_QUEUE_MAX_COUNT = 1000      # Max. number of stored incomplete parts
+    MSG_QUEUE_MAX_SIZE = 50000000   # Max. size in bytes of stored parts
     
     def __init__(self, portal):
         """ Initialize the Protocol.
@@ -196,9 +215,15 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
             @type  portal:      twisted.cred.portal.Portal
         """
         self._protal = portal
-        self._assembler = MessageAssembler(self, self.MSG_QUEUE_TIMEOUT)
+        self._assembler = MessageAssembler(self, self.MSG_QUEUE_TIMEOUT,
+                                           self.MSG_QUEUE_MAX_COUNT,
+                                           self.MSG_QUEUE_MAX_SIZE)
         self._avatar = None
         self._logout = None
+        self._paused = False
+        self._encoding = JSON_ENCODING
+        self._positional = False
+        self._binaryArrays = False
     
     def onConnect(self, req):
         """ Method is called by the Autobahn engine when a request to establish
@@ -227,6 +252,33 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
                                     "Parameter '{0}' has to be unique in "
                                     'request.'.format(name))
         
+        encoding = params.get('encoding', [JSON_ENCODING])
+        
+        if len(encoding) != 1 or encoding[0] not in ENCODINGS:
+            raise HttpException(httpstatus.HTTP_STATUS_CODE_BAD_REQUEST[0],
+                                "Parameter 'encoding' has to be unique and "
+                                'one of: {0}'.format(', '.join(ENCODINGS)))
+        
+        self._encoding = encoding[0]
+        
+        positional = params.get('positional', ['0'])
+        
+        if len(positional) != 1 or positional[0] not in ('0', '1'):
+            raise HttpException(httpstatus.HTTP_STATUS_CODE_BAD_REQUEST[0],
+                                "Parameter 'positional' has to be unique and "
+                                "either '0' or '1'.")
+        
+        self._positional = positional[0] == '1'
+        
+        binaryArrays = params.get('binaryArrays', ['0'])
+        
+        if len(binaryArrays) != 1 or binaryArrays[0] not in ('0', '1'):
+            raise HttpException(httpstatus.HTTP_STATUS_CODE_BAD_REQUEST[0],
+                                "Parameter 'binaryArrays' has to be unique "
+                                "and either '0' or '1'.")
+        
+        self._binaryArrays = binaryArrays[0] == '1'
+        
         cred = RobotCredentials(userID[0], robotID[0], key[0])
         avatar = self._protal.login(cred, self, IRobot)
         avatar.addCallback(self._authenticate_success)
@@ -246,6 +298,8 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
         self._avatar = avatar
         self._logout = logout
         self._assembler.start()
+        
+        self.transport.registerProducer(self, True)
     
     def _authenticate_failed(self, e):
         """ Method is called by deferred when the connection could not been
@@ -293,6 +347,21 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
         else:
             raise InvalidRequest('This message type is not supported.')
     
+    def assemblerCongested(self, congested):
+        """ Inform the robot that the budget of the assembler is (almost)
+            exhausted and that it should slow down or that it can resume
+            sending at the normal rate. (Called by
+            client.protocol.MessageAssembler)
+            
+            @param congested:   Flag which is True if the robot should slow
+                                down and False otherwise.
+            @type  congested:   bool
+        """
+        stats = self._assembler.stats
+        log.msg('WebSocket: Message assembler is {0}congested: '
+                '{1}'.format('' if congested else 'no longer ', stats))
+        self.sendStatusMessage({'congested' : congested, 'assembler' : stats})
+    
     def _process_createContainer(self, data):
         """ Internally used method to process a request to create a container.
         """
@@ -344,7 +413,8 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
                                           conf['interfaceTag'],
                                           conf['interfaceType'],
                                           conf['className'],
-                                          conf.get('addr', ''))
+                                          conf.get('addr', ''),
+                                          conf.get('options', {}))
             except KeyError as e:
                 raise InvalidRequest("Can not process 'ConfigureComponent' "
                                      "request. 'addInterfaces' is missing "
@@ -431,7 +501,10 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
                 '(binary={0})'.format(binary))
         
         try:
-            self._assembler.processMessage(msg, binary)
+            if self._encoding == MSGPACK_ENCODING:
+                self._assembler.processPackedMessage(msg)
+            else:
+                self._assembler.processMessage(msg, binary)
         except InvalidRequest as e:
             #msg = 'Invalid Request: {0}'.format(e)
             import traceback
@@ -444,7 +517,54 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
             import traceback
             self.sendErrorMessage(traceback.format_exc())
     
-    def sendMessage(self, msg):
+    @property
+    def encoding(self):
+        """ Wire encoding which is used for the messages of the connection. """
+        return self._encoding
+    
+    @property
+    def positional(self):
+        """ Flag which is True if the robot requested the positional encoding
+            for the converted messages.
+        """
+        return self._positional
+    
+    @property
+    def binaryArrays(self):
+        """ Flag which is True if the robot requested that large numeric
+            arrays in the converted messages are sent as binary data.
+        """
+        return self._binaryArrays
+    
+    @property
+    def congested(self):
+        """ Flag which is True if the transport can currently not accept
+            more data.
+        """
+        return self._paused
+    
+    def pauseProducing(self):
+        """ Method is called by the transport when its buffer is full.
+            (Implementation of IPushProducer)
+        """
+        self._paused = True
+    
+    def resumeProducing(self):
+        """ Method is called by the transport when its buffer has been
+            drained. (Implementation of IPushProducer)
+        """
+        self._paused = False
+        
+        if self._avatar:
+            self._avatar.connectionResumed()
+    
+    def stopProducing(self):
+        """ Method is called by the transport when the connection can no
+            longer be used. (Implementation of IPushProducer)
+        """
+        self._paused = True
+    
+    def sendMessage(self, msg, binary=True):
         """ Internally used method to send a message to the robot.
             
             Should not be used from outside the Protocol; instead use the
@@ -453,16 +573,47 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
             (Overwrites method from autobahn.websocket.WebSocketServerProtocol)
             
             @param msg:     Message which should be sent.
+            
+            @param binary:  Flag which is False if the message is known to
+                            contain no StringIO instances, in which case the
+                            search for binary data is skipped.
+            @type  binary:  bool
         """
+        if self._encoding == MSGPACK_ENCODING:
+            WebSocketServerProtocol.sendMessage(self, packMessage(msg), True)
+            return
+        
+        if not binary:
+            WebSocketServerProtocol.sendMessage(self, json.dumps(msg))
+            return
+        
         uriBinary, msgURI = recursiveBinarySearch(msg)
         
         WebSocketServerProtocol.sendMessage(self, json.dumps(msgURI))
         
-        for binData in uriBinary:
-            WebSocketServerProtocol.sendMessage(self,
-                binData[0] + binData[1].getvalue(), binary=True)
+        for uri, data in uriBinary:
+            self._sendBinaryMessage(uri, data)
     
-    def sendDataMessage(self, iTag, clsName, msgID, msg):
+    def _sendBinaryMessage(self, uri, binary):
+        """ Internally used method to send a binary message to the robot.
+            The URI and the binary data are written as a single frame without
+            joining the two parts first.
+            
+            @param uri:     URI which is used to identify the binary data.
+            @type  uri:     str
+            
+            @param binary:  Binary data which should be sent.
+            @type  binary:  StringIO
+        """
+        payload = binary.getvalue()
+        
+        self.beginMessage(WebSocketServerProtocol.MESSAGE_TYPE_BINARY)
+        self.beginMessageFrame(len(uri) + len(payload))
+        self.sendMessageFrameData(uri)
+        self.sendMessageFrameData(payload)
+        self.endMessage()
+    
+    def sendDataMessage(self, iTag, clsName, msgID, msg, binary=True):
         """ Callback for IRobot Avatar to send a data message to the robot
             using this websocket connection.
             
@@ -485,10 +636,66 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
                                 complete message can be replaced by a StringIO
                                 instance which is interpreted as binary data.
             @type  msg:         {str : {} / base_types / StringIO} / StringIO
+            
+            @param binary:      Flag which is False if the message is known to
+                                contain no StringIO instances.
+            @type  binary:      bool
         """
         self.sendMessage({'type' : types.DATA_MESSAGE,
                           'data' : {'iTag' : iTag, 'type' : clsName,
-                                    'msgID' : msgID, 'msg' : msg}})
+                                    'msgID' : msgID, 'msg' : msg}}, binary)
+    
+    def sendEncodedDataMessage(self, iTag, clsName, msgID, msg):
+        """ Callback for IRobot Avatar to send a data message, which is
+            already JSON encoded, to the robot using this websocket connection.
+            
+            @param iTag:        Tag which is used to identify the interface
+                                from the message is sent.
+            @type  iTag:        str
+            
+            @param clsName:     Message type/Service type consisting of the
+                                package and the name of the message/service,
+                                i.e. 'std_msgs/Int32'.
+            @type  clsName:     str
+            
+            @param msgID:       Message ID which can be used to get a
+                                correspondence between request and response
+                                message for a service call.
+            @type  msgID:       str
+            
+            @param msg:         JSON encoded message which should be sent.
+            @type  msg:         rce.util.converter.JSONFragment
+        """
+        if self._encoding != JSON_ENCODING:
+            self.sendDataMessage(iTag, clsName, msgID, json.loads(msg), False)
+            return
+        
+        WebSocketServerProtocol.sendMessage(self,
+            '{{"type":{0},"data":{{"iTag":{1},"type":{2},"msgID":{3},'
+            '"msg":{4}}}}}'.format(json.dumps(types.DATA_MESSAGE),
+                                   json.dumps(iTag), json.dumps(clsName),
+                                   json.dumps(msgID), msg))
+    
+    def sendLayoutMessage(self, iTag, clsName, layouts):
+        """ Callback for IRobot Avatar to send the layouts of the messages of
+            an interface, which are necessary to decode the messages in the
+            positional encoding, to the robot using this websocket connection.
+            
+            @param iTag:        Tag which is used to identify the interface
+                                which uses the layouts.
+            @type  iTag:        str
+            
+            @param clsName:     Message type of the messages which are sent by
+                                the interface, i.e. 'std_msgs/Int32'.
+            @type  clsName:     str
+            
+            @param layouts:     Layouts of the message types which have not yet
+                                been sent to the robot.
+            @type  layouts:     { str : [ (str, str) ] }
+        """
+        self.sendMessage({'type' : types.LAYOUT,
+                          'data' : {'iTag' : iTag, 'type' : clsName,
+                                    'layouts' : layouts}})
     
     def sendErrorMessage(self, msg):
         """ Callback for IRobot Avatar to send an error message to the robot
@@ -499,6 +706,16 @@ class RobotWebSocketProtocol(WebSocketServerProtocol):
         """
         self.sendMessage({'data' : msg, 'type' : types.ERROR})
     
+    def sendStatusMessage(self, status):
+        """ Send a status message to the robot using this websocket
+            connection.
+            
+            @param status:      Status information which should be sent to
+                                the robot.
+            @type  status:      { str : {} / base_types }
+        """
+        self.sendMessage({'data' : status, 'type' : types.STATUS})
+    
     def onClose(self, wasClean, code, reason):
         """ Method is called by the Autobahn engine when the connection has
             been lost.
@@ -39,8 +39,10 @@
         CX      Change connections between Interfaces
         
         DM      ROS Message
+        LT      Layouts of the messages of an interface (positional encoding
+                and binary arrays)
         
-        ST      Status message (currently not used)
+        ST      Status message
         ER      Error message
 """
 
@@ -51,6 +53,7 @@ CONFIGURE_COMPONENT = 'CN'
 CONFIGURE_CONNECTION = 'CX'
 
 DATA_MESSAGE = 'DM'
+LAYOUT = 'LT'
 
-#STATUS = 'ST'
+STATUS = 'ST'
 ERROR = 'ER'
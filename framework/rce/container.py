@@ -171,6 +171,10 @@ class RCEContainer(Referenceable):
         os.mkdir(rceDir)
         os.mkdir(rosDir)
         
+        # Unix domain socket of the environment process; the socket is created
+        # inside the container in 'rceDir' which is bound to 'opt/rce/data'
+        self._socket = pjoin(rceDir, 'comm.sock')
+        
         # Create network variables
         ip = '{0}.{1}'.format(client.getNetworkAddress(), nr)
         self._address = '{0}:{1}'.format(ip, client.envPort)
@@ -256,6 +260,16 @@ class RCEContainer(Referenceable):
         """
         return int(self._fwdPort)
     
+    def remote_getSocket(self):
+        """ Get the path of the Unix domain socket in the host filesystem
+            which can be used to connect to the container from a process
+            running in the same machine.
+            
+            @return:            Path of the Unix domain socket.
+            @rtype:             str
+        """
+        return self._socket
+    
     def _stop(self):
         """ Method which stops the container.
         """
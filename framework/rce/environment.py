@@ -38,6 +38,7 @@ import rospy
 
 # twisted specific imports
 from twisted.python import log
+from twisted.python.threadpool import ThreadPool
 from twisted.spread.pb import PBClientFactory
 
 # Custom imports
@@ -58,6 +59,9 @@ class Environment(Namespace):
     _MAP = [ServiceClientInterface, PublisherInterface,
             SubscriberInterface, ServiceProviderInterface]
     
+    # CONFIG
+    SERVICE_THREADS = 10  # Max. number of concurrent service calls
+    
     def __init__(self, client, status, reactor):
         """ Initialize the Environment.
             
@@ -79,6 +83,10 @@ class Environment(Namespace):
         self._reactor = reactor
         self._loader = Loader()
         
+        self._threadPool = ThreadPool(maxthreads=self.SERVICE_THREADS,
+                                      name='ServiceClient')
+        self._threadPool.start()
+        
         self._nodes = set()
         self._parameters = set()
         
@@ -94,6 +102,11 @@ class Environment(Namespace):
         """ Reference to the ROS loader. """
         return self._loader
     
+    @property
+    def threadPool(self):
+        """ Reference to the worker pool used for the service calls. """
+        return self._threadPool
+    
     def registerNode(self, node):
         assert node not in self._nodes
         self._nodes.add(node)
@@ -164,7 +177,8 @@ class Environment(Namespace):
         """
         return Parameter(self, status, name, value)
     
-    def remote_createInterface(self, status, uid, iType, clsName, addr):
+    def remote_createInterface(self, status, uid, iType, clsName, addr,
+                               options):
         """ Create an Interface object in the environment namespace and
             therefore in the endpoint.
             
@@ -189,6 +203,10 @@ class Environment(Namespace):
             @param addr:        ROS name/address which the interface should
                                 use.
             @type  addr:        str
+            
+            @param options:     Additional options for the interface, which
+                                are not used by the ROS-side interfaces.
+            @type  options:     dict
         """
         return self._MAP[iType](self, status, UUID(bytes=uid), clsName, addr)
     
@@ -211,6 +229,8 @@ class Environment(Namespace):
         
         Namespace.remote_destroy(self)
         
+        self._threadPool.stop()
+        
         self._client.unregisterEnvironment(self)
 
 
@@ -218,7 +238,7 @@ class EnvironmentClient(Endpoint):
     """ Environment client is responsible for the cloud engine components
         inside a container.
     """
-    def __init__(self, reactor, commPort):
+    def __init__(self, reactor, commPort, commSocket):
         """ Initialize the Environment Client.
             
             @param reactor:     Reference to the twisted reactor used in this
@@ -229,8 +249,14 @@ class EnvironmentClient(Endpoint):
                                 internal communication will listen for incoming
                                 connections.
             @type  commPort:    int
+            
+            @param commSocket:  Path of the Unix domain socket where the server
+                                for the cloud engine internal communication
+                                will listen for incoming connections from
+                                endpoints in the same machine.
+            @type  commSocket:  str
         """
-        Endpoint.__init__(self, reactor, commPort)
+        Endpoint.__init__(self, reactor, commPort, commSocket)
         
         self._environment = None
     
@@ -281,7 +307,7 @@ def main(reactor, cred, masterIP, masterPort, commPort, uid):
     factory = PBClientFactory()
     reactor.connectTCP(masterIP, masterPort, factory)
     
-    client = EnvironmentClient(reactor, commPort)
+    client = EnvironmentClient(reactor, commPort, '/opt/rce/data/comm.sock')
     
     def terminate():
         reactor.callFromThread(client.terminate)
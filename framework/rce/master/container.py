@@ -31,7 +31,7 @@
 #     
 
 # twisted specific imports
-from twisted.internet.address import IPv4Address
+from twisted.internet.address import IPv4Address, UNIXAddress
 from twisted.internet.defer import Deferred, succeed
 
 # Custom imports
@@ -90,6 +90,27 @@ class Container(Proxy):
         
         return succeed(self._address)
     
+    def getUnixAddress(self, ip):
+        """ Get the address of the Unix domain socket which can be used by a
+            process running in the machine with the given IP address to
+            connect to the environment process for the cloud engine internal
+            communication.
+            
+            @param ip:          IP address of the machine in which the process
+                                which wants to connect is running.
+            @type  ip:          str
+            
+            @return:            twisted::UNIXAddress which can be used to
+                                connect to the ServerFactory of the cloud
+                                engine internal communication protocol or None
+                                if the container is in a different machine.
+            @rtype:             twisted::Deferred
+        """
+        if not ip or ip != self._machine.IP:
+            return succeed(None)
+        
+        return self.callRemote('getSocket').addCallback(UNIXAddress)
+    
     def destroy(self):
         """ Method should be called to destroy the container and will take care
             of deleting all circular references.
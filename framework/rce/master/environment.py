@@ -206,6 +206,32 @@ class EnvironmentEndpoint(Endpoint):
         """
         return self._container.getAddress()
     
+    def getMachineIP(self):
+        """ Get the IP address of the machine in which the container of the
+            environment endpoint is running.
+            
+            @return:            IP address of the machine. (type: str)
+            @rtype:             twisted::Deferred
+        """
+        return self._container.getAddress().addCallback(lambda addr:
+                                                         addr.host)
+    
+    def getLocalAddress(self, endpoint):
+        """ Get the address of the environment endpoint's internal
+            communication server which can be used by the given endpoint if
+            both endpoints are in the same machine.
+            
+            @param endpoint:    Endpoint which wants to connect.
+            @type  endpoint:    rce.master.network.Endpoint
+            
+            @return:            Address of the Unix domain socket of the
+                                environment endpoint's internal communication
+                                server or None.
+                                (type: twisted.internet.address.UNIXAddress)
+            @rtype:             twisted::Deferred
+        """
+        return endpoint.getHostIP().addCallback(self._container.getUnixAddress)
+    
     def createNamespace(self):
         """ Create a Environment object in the environment endpoint.
             
@@ -35,7 +35,8 @@ from uuid import uuid4
 
 # twisted specific imports
 from twisted.python.failure import Failure
-from twisted.internet.defer import Deferred, DeferredList
+from twisted.internet.address import UNIXAddress
+from twisted.internet.defer import Deferred, DeferredList, succeed
 from twisted.spread.pb import Referenceable, PBConnectionLost
 
 # Custom imports
@@ -47,6 +48,11 @@ class Network(object):
     """ The network is responsible for keeping track of all endpoints,
         namespaces, and interfaces in the cloud engine. Additionally, it
         provides the method to connect two interface.
+        
+        The connections between endpoints of different types, i.e. between
+        robot processes and environments, are established in the background
+        as soon as an endpoint is ready, such that connecting two interfaces
+        only has to register the interfaces with the existing protocols.
     """
     def __init__(self):
         """ Initialize the Network.
@@ -56,6 +62,10 @@ class Network(object):
     def registerEndpoint(self, endpoint):
         assert endpoint not in self._endpoints
         self._endpoints[endpoint] = set()
+        
+        d = endpoint()
+        d.addCallback(lambda _: self._preconnect(endpoint))
+        d.addErrback(self._preconnectError)
     
     def unregisterEndpoint(self, endpoint):
         assert endpoint in self._endpoints
@@ -71,6 +81,34 @@ class Network(object):
         for connections in self._endpoints.itervalues():
             connections -= endedConnections
     
+    def _preconnect(self, endpoint):
+        """ Internally used method to create the connections between the given
+            endpoint and all endpoints of a different type in the background.
+            
+            @param endpoint:    Endpoint which is ready for connections.
+            @type  endpoint:    rce.master.network.Endpoint
+        """
+        if endpoint not in self._endpoints:
+            # Endpoint has died in the meantime
+            return
+        
+        for other in self._endpoints.keys():
+            if type(other) != type(endpoint):
+                self._getEndpointConnection(endpoint, other)
+    
+    def _preconnectError(self, failure):
+        """ Internally used method to print out the errors which prevented
+            the connections of an endpoint from being created in the
+            background.
+        """
+        print('Could not create the connections of the endpoint in the '
+              'background:')
+        
+        try:
+            failure.printTraceback()
+        except:
+            print(failure.getErrorMessage())
+    
     def _getEndpointConnection(self, epA, epB):
         """ Internally used method to get the connection between two endpoints.
             
@@ -99,10 +137,34 @@ class Network(object):
                 
                 return candidates.pop()
             else:
-                connection = EndpointConnection(epA, epB)
-                connectionsA.add(connection)
-                connectionsB.add(connection)
-                return connection
+                return EndpointConnection(self, epA, epB)
+    
+    def registerEndpointConnection(self, connection, epA, epB):
+        """ Add a new endpoint connection to the network. Called by the
+            endpoint connection before the connection attempt is started.
+            
+            @param connection:  Endpoint connection which should be added.
+            @type  connection:  rce.master.network.EndpointConnection
+            
+            @param epX:         The endpoint which is part of the connection.
+            @type  epX:         rce.master.network.Endpoint
+        """
+        assert epA in self._endpoints and epB in self._endpoints
+        self._endpoints[epA].add(connection)
+        self._endpoints[epB].add(connection)
+    
+    def unregisterEndpointConnection(self, connection):
+        """ Remove a failed endpoint connection from the network, such that
+            the next request for a connection between the two endpoints
+            creates a new endpoint connection.
+            
+            @param connection:  Endpoint connection which should be removed.
+            @type  connection:  rce.master.network.EndpointConnection
+        """
+        for connections in self._endpoints.itervalues():
+            connections.discard(connection)
+        
+        connection.destroy()
     
     def createConnection(self, interfaceA, interfaceB):
         """ Create a connection between two interfaces.
@@ -173,6 +235,42 @@ class Endpoint(Proxy):
         """
         raise NotImplementedError('Endpoint can not be used directly.')
     
+    def getMachineIP(self):
+        """ Get the IP address of the machine in which the endpoint is
+            running.
+            
+            @return:            IP address of the machine. (type: str)
+            @rtype:             twisted::Deferred
+        """
+        raise NotImplementedError('Endpoint can not be used directly.')
+    
+    def getHostIP(self):
+        """ Get the IP address of the machine in which the endpoint process is
+            running, if the process has access to the filesystem of the
+            machine, i.e. it does not run inside a container.
+            
+            @return:            IP address of the machine or None.
+                                (type: str)
+            @rtype:             twisted::Deferred
+        """
+        return succeed(None)
+    
+    def getLocalAddress(self, endpoint):
+        """ Get the address of the endpoint's internal communication server
+            which can be used by the given endpoint if both endpoints are in
+            the same machine, e.g. a Unix domain socket.
+            
+            @param endpoint:    Endpoint which wants to connect.
+            @type  endpoint:    rce.master.network.Endpoint
+            
+            @return:            Address of the endpoint's internal
+                                communication server or None if there is no
+                                such address.
+                                (type: twisted.internet.address.UNIXAddress)
+            @rtype:             twisted::Deferred
+        """
+        return succeed(None)
+    
     def getUID(self):
         """ Get a ID which is unique within the endpoint.
             
@@ -247,7 +345,7 @@ class Endpoint(Proxy):
         """
         return self.callRemote('prepareConnection', connID, key, auth, status)
     
-    def connect(self, connID, addr):
+    def connect(self, connID, addr, compress=False, fallback=None):
         """ Tell the endpoint to connect to the given address using the
             authentication details matching the given connection ID. This
             means that the connection has to be first prepared using
@@ -260,13 +358,23 @@ class Endpoint(Proxy):
             @type  connID:      str
             
             @param addr:        Address to which the endpoint should connect.
-                                It consists of an IP address and a port number.
-            @type  addr:        (str, int)
+                                It consists either of an IP address and a port
+                                number or of the path of a Unix domain socket.
+            @type  addr:        (str, int) / str
+            
+            @param compress:    Flag which is True if the endpoint should
+                                request the compression of the connection.
+            @type  compress:    bool
+            
+            @param fallback:    IP address and port number to which the
+                                endpoint should connect if the connection
+                                to the Unix domain socket fails.
+            @type  fallback:    (str, int)
             
             @return:            None.
             @rtype:             twisted::Deferred
         """
-        return self.callRemote('connect', connID, addr)
+        return self.callRemote('connect', connID, addr, compress, fallback)
     
     def registerNamespace(self, namespace):
         assert namespace not in self._namespaces
@@ -389,7 +497,7 @@ class Namespace(Proxy):
         
         self._interfaces = set()
     
-    def createInterface(self, iType, clsName, addr):
+    def createInterface(self, iType, clsName, addr, options=None):
         """ Create an Interface object in the namespace and therefore endpoint.
             
             @param iType:       Type of the interface encoded as an integer.
@@ -402,6 +510,14 @@ class Namespace(Proxy):
                                 i.e. 'std_msgs/Int32'.
             @type  clsName:     str
             
+            @param addr:        ROS name/address which the interface should
+                                use or the tag of the interface if it is
+                                created in a robot namespace.
+            @type  addr:        str
+            
+            @param options:     Additional options for the interface.
+            @type  options:     dict
+            
             @return:            New Interface instance.
             @rtype:             rce.master.network.Interface
                                 (subclass of rce.master.base.Proxy)
@@ -410,7 +526,7 @@ class Namespace(Proxy):
         interface = Interface(self._endpoint, self, uid)
         status = Status(interface)
         self.callRemote('createInterface', status, uid.bytes, iType, clsName,
-                        addr).chainDeferred(interface)
+                        addr, options or {}).chainDeferred(interface)
         return interface
     
     def registerInterface(self, interface):
@@ -649,10 +765,13 @@ class EndpointConnection(object):
     """ Representation of a connection between two endpoints, where the two
         endpoints are not the same.
     """
-    def __init__(self, endpointA, endpointB):
+    def __init__(self, network, endpointA, endpointB):
         """ Initialize the connection between the two endpoints.
             The connection will be scheduled to be created here.
             
+            @param network:     Network to which the endpoints belong.
+            @type  network:     rce.master.network.Network
+            
             @param endpointX:   Endpoint which is part of the new connection.
             @type  endpointX:   rce.master.network.Endpoint
         """
@@ -662,6 +781,9 @@ class EndpointConnection(object):
         self._serverEndpoint = endpointA
         self._clientEndpoint = endpointB
         
+        self._network = network
+        network.registerEndpointConnection(self, endpointA, endpointB)
+        
         self._serverProtocol = Protocol(endpointA)
         self._clientProtocol = Protocol(endpointB)
         
@@ -681,30 +803,32 @@ class EndpointConnection(object):
         
         authenticator = DeferredList([authServerResult, authClientResult])
         authenticator.addCallback(self._validate)
-        authenticator.addErrback(self._logError)
+        authenticator.addErrback(self._connectionFailed)
         
         readyServer = endpointA.prepareConnection(connectionID, serverKey,
                                                   authClient, serverStatus)
         readyClient = endpointB.prepareConnection(connectionID, clientKey,
                                                   authServer, clientStatus)
         ready = DeferredList([readyServer, readyClient])
+        ready.addCallback(self._getLocalAddress)
         ready.addCallback(self._getAddress)
         ready.addCallback(self._connect, connectionID)
         ready.addErrback(self._connectPrepError, authenticator)
-        ready.addErrback(self._logError)
+        ready.addErrback(self._connectionFailed)
     
-    def _getAddress(self, result):
+    def _getLocalAddress(self, result):
         """ Internally used method which is part of a callback chain.
             Its task is to verify that both endpoints are ready for the
-            connection attempt. In case both signal readiness the address
-            of the designated server endpoint is retrieved.
+            connection attempt. In case both signal readiness the addresses
+            which can be used if both endpoints are in the same machine are
+            retrieved.
             
             @param result:      Response of the DeferredList containing the
                                 Deferreds of the 'prepareConnection' calls.
             
-            @return:            Address of the endpoint's internal
-                                communication server.
-            @rtype:             twisted.internet.address.IPv4Address
+            @return:            Response of the DeferredList containing the
+                                Deferreds of the 'getLocalAddress' calls.
+            @rtype:             twisted::Deferred
         """
         ((serverReady, _), (clientReady, _)) = result
         
@@ -715,15 +839,70 @@ class EndpointConnection(object):
             return Failure(InternalError('Server/Client could not be prepared '
                                          'for connection attempt.'))
         
-        return self._serverEndpoint.getAddress()
+        return DeferredList([
+            self._serverEndpoint.getLocalAddress(self._clientEndpoint),
+            self._clientEndpoint.getLocalAddress(self._serverEndpoint)],
+            consumeErrors=True)
     
-    def _connect(self, addr, connID):
+    def _getAddress(self, result):
+        """ Internally used method which is part of a callback chain.
+            Its task is to select the endpoint which has to connect and the
+            address to which it has to connect. A local address, i.e. a Unix
+            domain socket, is preferred; otherwise the address of the
+            designated server endpoint is retrieved and the compression is
+            requested if the endpoints are in different machines. For a local
+            address the TCP address of the same endpoint is retrieved as well,
+            such that the connecting endpoint can fall back to TCP.
+            
+            @param result:      Response of the DeferredList containing the
+                                Deferreds of the 'getLocalAddress' calls.
+            
+            @return:            Endpoint which has to connect, the address
+                                of the other endpoint's internal communication
+                                server, the compression flag and the fallback
+                                address, if any.
+            @rtype:             (rce.master.network.Endpoint,
+                                 twisted.internet.address.IPv4Address /
+                                 twisted.internet.address.UNIXAddress, bool,
+                                 twisted.internet.address.IPv4Address)
+        """
+        ((serverOK, serverAddr), (clientOK, clientAddr)) = result
+        
+        # Failures are not fatal as the connection can fall back to TCP
+        if serverOK and serverAddr:
+            d = self._serverEndpoint.getAddress()
+            d.addCallback(lambda addr: (self._clientEndpoint, serverAddr,
+                                        False, addr))
+            return d
+        
+        if clientOK and clientAddr:
+            d = self._clientEndpoint.getAddress()
+            d.addCallback(lambda addr: (self._serverEndpoint, clientAddr,
+                                        False, addr))
+            return d
+        
+        def cb(result):
+            ((_, addr), (_, ip)) = result
+            return self._clientEndpoint, addr, addr.host != ip, None
+        
+        d = DeferredList([self._serverEndpoint.getAddress(),
+                          self._clientEndpoint.getMachineIP()],
+                         fireOnOneErrback=True, consumeErrors=True)
+        d.addCallback(cb)
+        return d
+    
+    def _connect(self, result, connID):
         """ Internally used method which is part of a callback chain.
             Its task is to send the 'connect' command to the client.
             
-            @param addr:        Address of the endpoint's internal
-                                communication server.
-            @rtype:             twisted.internet.address.IPv4Address
+            @param result:      Endpoint which has to connect, the address
+                                of the other endpoint's internal communication
+                                server, the compression flag and the fallback
+                                address, if any.
+            @type  result:      (rce.master.network.Endpoint,
+                                 twisted.internet.address.IPv4Address /
+                                 twisted.internet.address.UNIXAddress, bool,
+                                 twisted.internet.address.IPv4Address)
             
             @param connID:      Connection ID which is used to identify the
                                 appropriate authentication key.
@@ -732,7 +911,13 @@ class EndpointConnection(object):
             @return:            None.
             @rtype:             twisted::Deferred
         """
-        return self._clientEndpoint.connect(connID, (addr.host, addr.port))
+        client, addr, compress, fallback = result
+        
+        if isinstance(addr, UNIXAddress):
+            return client.connect(connID, addr.name, False,
+                                  (fallback.host, fallback.port))
+        
+        return client.connect(connID, (addr.host, addr.port), compress)
     
     def _connectPrepError(self, failure, authenticator):
         """ Internally used method which is part of an errback chain.
@@ -769,6 +954,17 @@ class EndpointConnection(object):
                   'message instead:')
             print(failure.getErrorMessage())
     
+    def _connectionFailed(self, failure):
+        """ Internally used method which is part of an errback chain.
+            Its task is to print out the error and to remove the failed
+            connection from the network, such that a new connection between
+            the two endpoints can be created.
+        """
+        self._logError(failure)
+        
+        if self._network:
+            self._network.unregisterEndpointConnection(self)
+    
     def getProtocol(self, endpoint):
         """ Get the protocol which is part of this connection and belongs to
             the given endpoint.
@@ -805,6 +1001,8 @@ class EndpointConnection(object):
         
         self._serverEndpoint = None
         self._clientEndpoint = None
+        
+        self._network = None
 
 
 class InterfaceConnection(object):
@@ -110,13 +110,32 @@ class RobotEndpoint(Endpoint):
                                 (type: twisted.internet.address.IPv4Address)
             @rtype:             twisted::Deferred
         """
+        return self.getMachineIP().addCallback(
+            lambda ip: IPv4Address('TCP', ip, self._port))
+    
+    def getMachineIP(self):
+        """ Get the IP address of the machine in which the robot process is
+            running.
+            
+            @return:            IP address of the machine. (type: str)
+            @rtype:             twisted::Deferred
+        """
         def cb(remote):
             ip = remote.broker.transport.getPeer().host
-            ip = self._root.getInternalIP() if isLocalhost(ip) else ip
-            return IPv4Address('TCP', ip, self._port)
+            return self._root.getInternalIP() if isLocalhost(ip) else ip
         
         return self().addCallback(cb)
     
+    def getHostIP(self):
+        """ Get the IP address of the machine in which the robot process is
+            running, as the process has access to the filesystem of the
+            machine.
+            
+            @return:            IP address of the machine. (type: str)
+            @rtype:             twisted::Deferred
+        """
+        return self.getMachineIP()
+    
     def getWebsocketAddress(self):
         """ Get the address which can be used to connect to the robot
             namespaces which belong to this endpoint.
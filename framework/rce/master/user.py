@@ -242,7 +242,8 @@ class User(Referenceable):
         
         # TODO: Return some info about success/failure of request
     
-    def remote_addInterface(self, eTag, iTag, iType, clsName, addr=''):
+    def remote_addInterface(self, eTag, iTag, iType, clsName, addr='',
+                           options=None):
         """ Add an interface to an endpoint, i.e. a ROS environment or a 
             Robot object.
             
@@ -261,7 +262,7 @@ class User(Referenceable):
                                      ServiceClient, ServiceProvider,
                                      Publisher, Subscriber
                                  - Valid suffixes are:
-                                     Interface, Converter, Forwarder
+                                     Interface, Converter, Forwarder, Raw
             @type  iType:       str
             
             @param clsName:     Message type/Service type consisting of the
@@ -273,14 +274,44 @@ class User(Referenceable):
                                 use. Only necessary if the suffix of @param
                                 iType is 'Interface'.
             @type  addr:        str
-        """
-        if iType.endswith('Converter') or iType.endswith('Forwarder'):
+            
+            @param options:     Additional options for the interface. Only
+                                supported if the suffix of @param iType is
+                                'Converter', 'Forwarder' or 'Raw'. Publishers
+                                support the keys 'conflate' (only the latest
+                                message is kept while the connection to the
+                                robot is congested) and 'maxRate' (maximal
+                                number of messages per second sent to the
+                                robot). Converters of
+                                message types with a custom Converter support
+                                the key 'converter' with the keyword arguments
+                                for the custom Converter, e.g. for images
+                                {'codec' : 'jpeg', 'quality' : 80,
+                                 'scale' : 0.5, 'roi' : [0, 0, 320, 240]}.
+                                Publisher Converters support the keys
+                                'fields' (list of dotted paths, i.e.
+                                'pose.pose.position', of the fields sent to
+                                the robot) and 'threshold' (dictionary with
+                                dotted paths of numeric fields as keys and
+                                thresholds as values; a message is only sent
+                                if a field changed by more than its
+                                threshold).
+            @type  options:     { str : bool / float / list / dict }
+        """
+        if (iType.endswith('Converter') or iType.endswith('Forwarder') or
+            iType.endswith('Raw')):
             try:
-                self._robots[eTag].addInterface(iTag, iType, clsName)
+                self._robots[eTag].addInterface(iTag, iType, clsName,
+                                                options or {})
             except KeyError:
                 raise InvalidRequest('Can not add Interface, because Robot '
                                      '{0} does not exist.'.format(eTag))
         elif iType.endswith('Interface'):
+            if options:
+                raise InvalidRequest('Options are only supported for '
+                                     'Converters, Forwarders and Raw '
+                                     'interfaces.')
+            
             try:
                 self._containers[eTag].addInterface(iTag, iType, clsName, addr)
             except KeyError:
@@ -528,7 +559,7 @@ class Robot(_Wrapper):
         d.addCallback(lambda addr: (self._key, addr))
         return d
     
-    def addInterface(self, iTag, iType, clsName):
+    def addInterface(self, iTag, iType, clsName, options):
         """ Add an interface to the Robot object.
             
             @param iTag:        Tag which is used to identify the interface in
@@ -541,13 +572,16 @@ class Robot(_Wrapper):
                                      ServiceClient, ServiceProvider,
                                      Publisher, Subscriber
                                  - Valid suffixes are:
-                                     Converter, Forwarder
+                                     Converter, Forwarder, Raw
             @type  iType:       str
             
             @param clsName:     Message type/Service type consisting of the
                                 package and the name of the message/service,
                                 i.e. 'std_msgs/Int32'.
             @type  clsName:     str
+            
+            @param options:     Additional options for the interface.
+            @type  options:     { str : bool / float }
         """
         if not isLegalName(iTag):
             raise InvalidRequest('Interface tag is not a valid.')
@@ -556,14 +590,20 @@ class Robot(_Wrapper):
             raise InvalidRequest("Can not use the same interface tag '{0}' "
                                  'in the same robot twice.'.format(iTag))
         
-        modifier = 4 if iType.endswith('Forwarder') else 0
+        if iType.endswith('Forwarder'):
+            modifier = 4
+        elif iType.endswith('Raw'):
+            modifier = 8
+        else:
+            modifier = 0
         
         try:
             iType = Types.encode(iType)
         except TypeError:
             raise InvalidRequest('Interface type is invalid (Unknown prefix).')
         
-        interface = self._obj.createInterface(iType+modifier, clsName, iTag)
+        interface = self._obj.createInterface(iType+modifier, clsName, iTag,
+                                              options)
         interface = Interface(interface, iType, clsName)
         self._interfaces[iTag] = interface
         interface.notifyOnDeath(self._interfaceDied)
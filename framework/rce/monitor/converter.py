@@ -32,7 +32,9 @@
 
 # Python specific imports
 import zlib
+from time import time
 from uuid import uuid4
+from collections import deque
 
 try:
     from cStringIO import StringIO, InputType, OutputType
@@ -46,8 +48,13 @@ except ImportError:
     def _checkIsStringIO(obj):
         return isinstance(obj, StringIO)
 
+# twisted specific imports
+from twisted.python import log
+from twisted.internet.threads import deferToThreadPool
+
 # Custom imports
 from rce.error import InvalidRequest, InternalError
+from rce.client.assembler import JSON_ENCODING
 from rce.slave.interface import Interface
 import settings
 
@@ -56,11 +63,29 @@ import settings
 GZIP_LVL = settings.GZIP_LVL
 
 
+def _binarySize(msg):
+    """ Internally used function to get the size of a binary message without
+        copying its content.
+    """
+    msg.seek(0, 2)
+    size = msg.tell()
+    msg.seek(0)
+    return size
+
+
 class _AbstractConverter(Interface):
     """ Abstract base class which provides the basics for the robot-side
         interfaces.
     """
-    def __init__(self, owner, status, uid, clsName, tag):
+    # CONFIG
+    INLINE_SIZE = 65536     # Messages smaller than this are converted inline
+    MAX_JOBS = 10           # Maximal number of pending pooled conversions
+    
+    # Flag which is True if the interface sends the messages of a topic to
+    # the robot, i.e. the messages can be conflated and throttled
+    SENDS_TO_ROBOT = False
+    
+    def __init__(self, owner, status, uid, clsName, tag, options):
         """ Initialize the robot-side Interface.
             
             @param owner:       Namespace to which this interface belongs.
@@ -82,11 +107,72 @@ class _AbstractConverter(Interface):
             @param tag:         Unique ID which is used to identify the
                                 interface in the external communication.
             @type  tag:         str
+            
+            @param options:     Additional options for the interface.
+                                Publishers support the keys:
+                                 - 'conflate': If True, only the latest
+                                               message is kept while the
+                                               connection to the robot is
+                                               congested.
+                                 - 'maxRate':  Maximal number of messages per
+                                               second which are sent to the
+                                               robot; the latest message is
+                                               kept in between.
+                                Converters for message types with a custom
+                                Converter support the key:
+                                 - 'converter': Keyword arguments for the
+                                               custom Converter, e.g.
+                                               {'codec' : 'jpeg'} for images.
+                                Converters which send messages to the robot
+                                of a topic support the keys:
+                                 - 'fields':   List of dotted paths, i.e.
+                                               'pose.pose.position', of the
+                                               fields which are sent to the
+                                               robot.
+                                 - 'threshold': Dictionary with dotted paths
+                                               of numeric fields as keys and
+                                               thresholds as values; a message
+                                               is only sent if one of the
+                                               fields changed by more than its
+                                               threshold.
+            @type  options:     { str : bool / float / list / dict }
         """
         self._owner = owner
         self._clsName = clsName
         self._tag = tag
         
+        conflate = options.get('conflate', False)
+        maxRate = options.get('maxRate', 0)
+        
+        if not isinstance(maxRate, (int, long, float)) or maxRate < 0:
+            raise InvalidRequest("Option 'maxRate' has to be a positive "
+                                 'number.')
+        
+        if (conflate or maxRate) and not (self.DROPPABLE and
+                                          self.SENDS_TO_ROBOT):
+            raise InvalidRequest('Conflation and throttling are only '
+                                 'supported for Publishers.')
+        
+        self._conflate = bool(conflate)
+        self._interval = 1.0/maxRate if maxRate else 0
+        
+        # Latest message which waits to be sent to the robot
+        self._latest = None
+        self._lastSent = 0
+        self._waiting = False
+        self._sendCall = None
+        
+        # Conversions which wait for the worker pool; only one conversion of
+        # the interface is running at a time to preserve the message order
+        self._jobs = deque()
+        self._busy = False
+        self._droppedJobs = 0
+        
+        # Counter which is incremented whenever the interface is stopped, such
+        # that the results of conversions which were running in the worker
+        # pool at that time are dropped
+        self._generation = 0
+        
         Interface.__init__(self, owner, status, uid)
     
     @property
@@ -94,6 +180,169 @@ class _AbstractConverter(Interface):
         """ Interface tag of the converter. """
         return self._tag
     
+    def connectionResumed(self):
+        """ Callback for the Robot to inform the interface that the connection
+            to the robot is no longer congested.
+        """
+        self._waiting = False
+        self._schedule()
+    
+    def _stop(self):
+        if self._sendCall:
+            if self._sendCall.active():
+                self._sendCall.cancel()
+            
+            self._sendCall = None
+        
+        self._latest = None
+        self._jobs.clear()
+        self._generation += 1
+    
+    def _send(self, msg, msgID, protocol, remoteID):
+        """ Send a ROS message to the robot. If conflation or throttling is
+            enabled for the interface, only the latest message is kept until
+            the message can be sent.
+            
+            @param msg:         Received ROS message in serialized form.
+            @type  msg:         str
+            
+            @param msgID:       Unique ID to identify the message.
+            @type  msgID:       str
+            
+            @param protocol:    Protocol instance through which the message
+                                was sent.
+            @type  protocol:    rce.slave.protocol._Protocol
+            
+            @param remoteID:    Unique ID of the Interface which sent the
+                                message.
+            @type  remoteID:    str
+        """
+        if not (self._conflate or self._interval):
+            self._process(msg, msgID, protocol, remoteID)
+            return
+        
+        self._latest = (msg, msgID, protocol, remoteID)
+        self._schedule()
+    
+    def _schedule(self):
+        """ Internally used method to send the latest message as soon as the
+            rate limit and the state of the connection allow it.
+        """
+        if not self._latest or self._sendCall or self._waiting:
+            return
+        
+        delay = self._lastSent + self._interval - time()
+        
+        if delay > 0:
+            self._sendCall = self._owner.reactor.callLater(delay,
+                                                           self._delayedSend)
+        elif self._conflate and self._owner.congested:
+            self._waiting = True
+            self._owner.waitForConnection(self)
+        else:
+            msg, msgID, protocol, remoteID = self._latest
+            self._latest = None
+            self._lastSent = time()
+            self._process(msg, msgID, protocol, remoteID)
+    
+    def _delayedSend(self):
+        self._sendCall = None
+        self._schedule()
+    
+    def _convert(self, size, func, args, callback, cbArgs):
+        """ Internally used method to run the conversion 'func(*args)' and to
+            pass the result to 'callback(result, *cbArgs)'.
+            
+            Conversions of messages with at least INLINE_SIZE bytes are run in
+            the worker pool of the robot process, such that the reactor is not
+            blocked. The order of the messages of the interface is preserved;
+            small messages are converted inline only if no conversion of the
+            interface is pending.
+            
+            The pending conversions are bounded: For droppable interfaces only
+            the newest conversion is kept, as a stale message is worthless.
+            Otherwise, new conversions are rejected and reported to the robot
+            as soon as MAX_JOBS conversions are pending.
+            
+            @param size:        Size of the message in bytes.
+            @type  size:        int
+        """
+        if not self._busy and size < self.INLINE_SIZE:
+            callback(func(*args), *cbArgs)
+            return
+        
+        if self.DROPPABLE and self._jobs:
+            self._jobsDropped(len(self._jobs))
+            self._jobs.clear()
+        elif len(self._jobs) >= self.MAX_JOBS:
+            self._jobsDropped(1)
+            self._owner.sendErrorToClient('Message of interface "{0}" '
+                                          'dropped, because too many '
+                                          'conversions are pending.'.format(
+                                              self._tag))
+            return
+        
+        self._jobs.append((func, args, callback, cbArgs))
+        
+        if not self._busy:
+            self._runJob()
+    
+    def _jobsDropped(self, count):
+        """ Internally used method to log the conversions which have been
+            dropped, because the worker pool could not keep up.
+        """
+        self._droppedJobs += count
+        log.msg('Interface "{0}": {1} pending conversions have been dropped '
+                '({2} conversions dropped in total).'.format(
+                    self._tag, count, self._droppedJobs))
+    
+    def _runJob(self):
+        """ Internally used method to run the next pending conversion in the
+            worker pool.
+        """
+        func, args, callback, cbArgs = self._jobs.popleft()
+        self._busy = True
+        
+        generation = self._generation
+        
+        d = deferToThreadPool(self._owner.reactor, self._owner.threadPool,
+                              func, *args)
+        d.addCallback(self._jobFinished, generation, callback, cbArgs)
+        d.addErrback(self._convertFailed, generation)
+        d.addBoth(self._jobDone)
+    
+    def _jobFinished(self, result, generation, callback, cbArgs):
+        if generation != self._generation:
+            # The interface has been stopped while the conversion was running
+            return
+        
+        callback(result, *cbArgs)
+    
+    def _jobDone(self, _):
+        self._busy = False
+        
+        if self._jobs:
+            self._runJob()
+    
+    def _convertFailed(self, failure, generation):
+        log.msg('Conversion of a message of interface "{0}" failed: '
+                '{1}'.format(self._tag, failure.getErrorMessage()))
+        
+        if generation != self._generation:
+            return
+        
+        # Inform the robot, like for the errors of the inline conversions, if
+        # the failure would otherwise leave a service call unanswered
+        if not self.DROPPABLE:
+            self._owner.sendErrorToClient(failure.getTraceback())
+    
+    def _process(self, msg, msgID, protocol, remoteID):
+        """ This method is used as a hook to convert the message received from
+            the protocol and to send it to the robot.
+        """
+        raise NotImplementedError("The method '_process' has to "
+                                  'be implemented.')
+    
     def _receive(self, msg, msgID):
         """ This method is used as a hook to send the message received from the
             robot to the appropriate protocol.
@@ -112,8 +361,9 @@ class _AbstractConverter(Interface):
 class _ConverterBase(_AbstractConverter):
     """ Class which implements the basic functionality of a Converter.
     """
-    def __init__(self, owner, status, uid, clsName, tag):
-        _AbstractConverter.__init__(self, owner, status, uid, clsName, tag)
+    def __init__(self, owner, status, uid, clsName, tag, options):
+        _AbstractConverter.__init__(self, owner, status, uid, clsName, tag,
+                                    options)
         
         self._converter = owner.converter
         
@@ -121,9 +371,78 @@ class _ConverterBase(_AbstractConverter):
         self._outputMsgCls = None
         
         self._loadClass(owner.loader)
+        
+        # Custom Converter configured for this interface
+        self._custom = None
+        convOptions = options.get('converter')
+        
+        if convOptions is not None:
+            if not isinstance(convOptions, dict) or not self._outputMsgCls:
+                raise InvalidRequest("Option 'converter' has to be a "
+                                     'dictionary and can only be used for '
+                                     'messages sent to the robot.')
+            
+            try:
+                self._custom = self._converter.createCustomConverter(
+                    self._outputMsgCls, convOptions)
+            except (TypeError, ValueError) as e:
+                raise InvalidRequest(str(e))
+        
+        # Projection and change filter configured for this interface
+        self._projection = None
+        self._thresholds = []
+        self._lastValues = None
+        
+        fields = options.get('fields')
+        threshold = options.get('threshold')
+        
+        if fields is not None or threshold is not None:
+            if not (self.DROPPABLE and self._outputMsgCls):
+                raise InvalidRequest("Options 'fields' and 'threshold' are "
+                                     'only supported for Publishers.')
+            
+            self._loadFilter(fields, threshold)
     
     __init__.__doc__ = _AbstractConverter.__init__.__doc__
     
+    def _loadFilter(self, fields, threshold):
+        """ Internally used method to compile the projection and the change
+            filter from the options 'fields' and 'threshold'.
+        """
+        if fields is not None:
+            if (not isinstance(fields, list) or
+                not all(isinstance(f, basestring) for f in fields)):
+                raise InvalidRequest("Option 'fields' has to be a list of "
+                                     'strings.')
+            
+            if self._custom:
+                raise InvalidRequest("Option 'fields' can not be combined "
+                                     "with the option 'converter'.")
+            
+            try:
+                self._projection = self._converter.compileProjection(
+                    self._outputMsgCls, fields)
+            except ValueError as e:
+                raise InvalidRequest(str(e))
+        
+        if threshold is not None:
+            if not isinstance(threshold, dict):
+                raise InvalidRequest("Option 'threshold' has to be a "
+                                     'dictionary.')
+            
+            for path, limit in threshold.iteritems():
+                if not isinstance(limit, (int, long, float)) or limit < 0:
+                    raise InvalidRequest('Threshold for field "{0}" has to be '
+                                         'a positive number.'.format(path))
+                
+                try:
+                    getter = self._converter.compileNumericGetter(
+                        self._outputMsgCls, path)
+                except ValueError as e:
+                    raise InvalidRequest(str(e))
+                
+                self._thresholds.append((getter, limit))
+    
     def _loadClass(self, loader):
         """ This method is used as a hook to load the necessary ROS class
             for the interface. And is called as last step in the constructor.
@@ -161,6 +480,15 @@ class _ConverterBase(_AbstractConverter):
             raise InvalidRequest('Sent message type does not match the used '
                                  'message type for this interface.')
         
+        # The size of parsed JSON messages is not known; only the conversion
+        # of binary messages, e.g. images, is run in the worker pool
+        size = _binarySize(msg) if _checkIsStringIO(msg) else 0
+        self._convert(size, self._decode, (msg,), self._receive, (msgID,))
+    
+    def _decode(self, msg):
+        """ Internally used method to convert a JSON compatible message into a
+            serialized ROS message. Can be run in a worker thread.
+        """
         try:
             msg = self._converter.decode(self._inputMsgCls, msg)
         except (TypeError, ValueError) as e:
@@ -168,11 +496,9 @@ class _ConverterBase(_AbstractConverter):
         
         buf = StringIO()
         msg.serialize(buf)
-        msg = buf.getvalue()
-        
-        self._receive(msg, msgID)
+        return buf.getvalue()
     
-    def _send(self, msg, msgID, protocol, remoteID):
+    def _process(self, msg, msgID, protocol, remoteID):
         """ Convert a ROS message into a JSON encoded message.
             
             @param msg:         Received ROS message in serialized form.
@@ -187,28 +513,97 @@ class _ConverterBase(_AbstractConverter):
             
             @param remoteID:    Unique ID of the Interface which sent the
                                 message.
-            @type  remoteID:    uuid.UUID
+            @type  remoteID:    str
         """
         if not self._outputMsgCls:
             raise InternalError('This converter can not handle outgoing '
                                 'messages.')
         
-        rosMsg = self._outputMsgCls()
-        rosMsg.deserialize(msg)
+        # Projected messages are always sent as dictionaries without binary
+        # arrays
+        positional = self._owner.positional and not self._projection
+        binaryArrays = self._owner.binaryArrays and not self._projection
+        
+        if positional or binaryArrays:
+            # The robot needs the field types to unpack the binary arrays
+            self._owner.sendLayouts(self._tag, self._outputMsgCls)
+        
+        # Flag which is False if the converted message never contains binary
+        # data, such that the connection can skip the search for binary data
+        binary = self._converter.hasBinaries(self._outputMsgCls, binaryArrays)
         
+        direct = (not binary and not self._projection and
+                  self._owner.encoding == JSON_ENCODING)
+        self._convert(len(msg), self._encode,
+                      (msg, positional, binaryArrays, direct),
+                      self._sendEncoded, (msgID, protocol, remoteID, binary))
+    
+    def _encode(self, msg, positional, binaryArrays, direct):
+        """ Internally used method to convert a serialized ROS message into a
+            JSON compatible message. Can be run in a worker thread.
+            Returns None if the message is dropped by the change filter.
+        """
         try:
-            jsonMsg = self._converter.encode(rosMsg)
+            rosMsg = None
+            
+            if self._thresholds:
+                rosMsg = self._outputMsgCls()
+                rosMsg.deserialize(msg)
+                
+                if not self._changed(rosMsg):
+                    return None
+            
+            if direct:
+                # Skip the ROS message instance and the JSON compatible data
+                return self._converter.encodeSerialized(self._outputMsgCls,
+                                                        msg, positional)
+            
+            if rosMsg is None:
+                rosMsg = self._outputMsgCls()
+                rosMsg.deserialize(msg)
+            
+            if self._projection:
+                return self._projection(rosMsg)
+            
+            if self._custom:
+                return self._custom.encode(rosMsg)
+            
+            return self._converter.encode(rosMsg, positional, binaryArrays)
         except (TypeError, ValueError) as e:
             raise InvalidRequest(str(e))
+    
+    def _changed(self, rosMsg):
+        """ Internally used method to check whether one of the fields selected
+            by the option 'threshold' changed by more than its threshold since
+            the last message which has been sent to the robot.
+            
+            The conversions of an interface never run concurrently, hence the
+            last values can be updated from a worker thread.
+        """
+        values = [getter(rosMsg) for getter, _ in self._thresholds]
+        last = self._lastValues
         
-        self._sendToClient(jsonMsg, msgID, protocol, remoteID)
+        if last and all(abs(value - old) <= limit for value, old, (_, limit)
+                        in zip(values, last, self._thresholds)):
+            return False
+        
+        self._lastValues = values
+        return True
+    
+    def _sendEncoded(self, msg, msgID, protocol, remoteID, binary):
+        """ Internally used method to send the converted message to the
+            robot unless it has been dropped by the change filter.
+        """
+        if msg is not None:
+            self._sendToClient(msg, msgID, protocol, remoteID, binary)
 
 
 class ServiceClientConverter(_ConverterBase):
     """ Class which is used as a Service-Client Converter.
     """
-    def __init__(self, owner, status, uid, clsName, tag):
-        _ConverterBase.__init__(self, owner, status, uid, clsName, tag)
+    def __init__(self, owner, status, uid, clsName, tag, options):
+        _ConverterBase.__init__(self, owner, status, uid, clsName, tag,
+                                options)
         
         self._pendingRequests = {}
     
@@ -234,7 +629,7 @@ class ServiceClientConverter(_ConverterBase):
         
         self.respond(msg, msgID, protocol, remoteID)
     
-    def _sendToClient(self, msg, msgID, protocol, remoteID):
+    def _sendToClient(self, msg, msgID, protocol, remoteID, binary):
         while 1:
             uid = uuid4().hex
             
@@ -242,7 +637,7 @@ class ServiceClientConverter(_ConverterBase):
                 break
         
         self._pendingRequests[uid] = (msgID, protocol, remoteID)
-        self._owner.sendToClient(self._tag, self._clsName, msgID, msg)
+        self._owner.sendToClient(self._tag, self._clsName, msgID, msg, binary)
 
 
 class ServiceProviderConverter(_ConverterBase):
@@ -271,13 +666,16 @@ class ServiceProviderConverter(_ConverterBase):
     def _receive(self, msg, msgID):
         self.received(msg, msgID)
     
-    def _sendToClient(self, msg, msgID, protocol, remoteID):
-        self._owner.sendToClient(self._tag, self._clsName, msgID, msg)
+    def _sendToClient(self, msg, msgID, protocol, remoteID, binary):
+        self._owner.sendToClient(self._tag, self._clsName, msgID, msg, binary)
 
 
 class PublisherConverter(_ConverterBase):
     """ Class which is used as a Publisher Converter.
     """
+    DROPPABLE = True
+    SENDS_TO_ROBOT = True
+    
     def _loadClass(self, loader):
         args = self._clsName.split('/')
         
@@ -290,13 +688,15 @@ class PublisherConverter(_ConverterBase):
     def _receive(self, msg, msgID):
         self.received(msg, msgID)
     
-    def _sendToClient(self, msg, msgID, protocol, remoteID):
-        self._owner.sendToClient(self._tag, self._clsName, msgID, msg)
+    def _sendToClient(self, msg, msgID, protocol, remoteID, binary):
+        self._owner.sendToClient(self._tag, self._clsName, msgID, msg, binary)
 
 
 class SubscriberConverter(_ConverterBase):
     """ Class which is used as a Subscriber Converter.
     """
+    DROPPABLE = True
+    
     def _loadClass(self, loader):
         args = self._clsName.split('/')
         
@@ -309,13 +709,173 @@ class SubscriberConverter(_ConverterBase):
     def _receive(self, msg, msgID):
         self.received(msg, msgID)
     
-    def _sendToClient(self, msg, msgID, protocol, remoteID):
-        self._owner.sendToClient(self._tag, self._clsName, msgID, msg)
+    def _sendToClient(self, msg, msgID, protocol, remoteID, binary):
+        self._owner.sendToClient(self._tag, self._clsName, msgID, msg, binary)
+
+
+class _AdaptiveCompressor(object):
+    """ Class which is used by a Forwarder to select the compression level for
+        its messages based on the measured compression ratio and CPU load.
+        
+        Small messages and messages which turned out to be incompressible are
+        stored using the compression level 0, such that the receiver can still
+        inflate all messages in the same way. Incompressible streams are probed
+        again with the normal level periodically. If the compression takes up
+        too much of the CPU time of an interval the level is lowered and raised
+        again when there is enough headroom.
+    """
+    # CONFIG
+    MIN_SIZE = 256              # Minimal size in bytes which is compressed
+    MAX_RATIO = 0.9             # Maximal ratio for a compressible stream
+    PROBE_INTERVAL = 100        # Number of stored messages between two probes
+    LOAD_INTERVAL = 1.0         # Interval in seconds for measuring the load
+    MAX_LOAD = 0.25             # Maximal fraction of time spent compressing
+    
+    def __init__(self, tag, maxLevel):
+        """ Initialize the compressor.
+            
+            @param tag:         Tag of the interface which uses the compressor.
+            @type  tag:         str
+            
+            @param maxLevel:    Highest compression level which is used.
+            @type  maxLevel:    int
+        """
+        self._tag = tag
+        self._maxLevel = maxLevel
+        self._level = maxLevel
+        
+        self._incompressible = False
+        self._stored = 0
+        
+        self._messages = 0
+        self._storedMessages = 0
+        self._rawBytes = 0
+        self._compressedBytes = 0
+        self._time = 0.0
+        
+        # Start of the current load interval and the time spent compressing
+        # in it
+        self._intervalStart = time()
+        self._intervalTime = 0.0
+    
+    @property
+    def stats(self):
+        """ Dictionary containing the selected compression level, the flag
+            which indicates whether the stream is considered incompressible,
+            the number of (stored) messages, the overall compression ratio and
+            the total time in seconds spent compressing.
+        """
+        ratio = (float(self._compressedBytes)/self._rawBytes
+                 if self._rawBytes else 1.0)
+        return {'level' : self._level, 'incompressible' : self._incompressible,
+                'messages' : self._messages, 'stored' : self._storedMessages,
+                'ratio' : ratio, 'time' : self._time}
+    
+    def compress(self, msg):
+        """ Compress a message with the currently selected level.
+            
+            @param msg:         Message which should be compressed.
+            @type  msg:         str
+            
+            @return:            zlib compressed message.
+            @rtype:             str
+        """
+        size = len(msg)
+        
+        if size < self.MIN_SIZE:
+            level = 0
+        elif self._incompressible and self._stored < self.PROBE_INTERVAL:
+            self._stored += 1
+            level = 0
+        else:
+            level = self._level
+        
+        start = time()
+        data = zlib.compress(msg, level)
+        duration = time() - start
+        
+        self._messages += 1
+        self._rawBytes += size
+        self._compressedBytes += len(data)
+        self._time += duration
+        
+        if level:
+            self._adapt(size, len(data), duration)
+        else:
+            self._storedMessages += 1
+        
+        return data
+    
+    def _adapt(self, size, compressedSize, duration):
+        """ Internally used method to update the strategy after a message has
+            been compressed with the selected level.
+        """
+        incompressible = float(compressedSize)/size > self.MAX_RATIO
+        self._stored = 0
+        
+        if incompressible != self._incompressible:
+            self._incompressible = incompressible
+            log.msg('Forwarder "{0}": Messages are {1}compressible (ratio '
+                    '{2:.2f}).'.format(self._tag,
+                                       'in' if incompressible else '',
+                                       float(compressedSize)/size))
+        
+        if incompressible:
+            return
+        
+        self._intervalTime += duration
+        
+        now = time()
+        elapsed = now - self._intervalStart
+        
+        if elapsed < self.LOAD_INTERVAL:
+            return
+        
+        load = self._intervalTime/elapsed
+        self._intervalStart = now
+        self._intervalTime = 0.0
+        
+        level = self._level
+        
+        if load > self.MAX_LOAD and level > 1:
+            level -= 1
+        elif load < self.MAX_LOAD/4 and level < self._maxLevel:
+            level += 1
+        
+        if level != self._level:
+            self._level = level
+            log.msg('Forwarder "{0}": Compression level changed to {1} '
+                    '({2:.0%} of the time spent compressing).'.format(
+                        self._tag, level, load))
 
 
 class _ForwarderBase(_AbstractConverter):
     """ Class which implements the basic functionality of a Forwarder.
     """
+    # Flag which is False if the ROS messages are forwarded without compression
+    COMPRESS = True
+    
+    def __init__(self, owner, status, uid, clsName, tag, options):
+        _AbstractConverter.__init__(self, owner, status, uid, clsName, tag,
+                                    options)
+        
+        if self.COMPRESS:
+            self._compressor = _AdaptiveCompressor(tag, GZIP_LVL)
+        else:
+            self._compressor = None
+    
+    __init__.__doc__ = _AbstractConverter.__init__.__doc__
+    
+    @property
+    def stats(self):
+        """ Dictionary containing the compression strategy and ratio of the
+            Forwarder; empty if the messages are not compressed.
+        """
+        if not self._compressor:
+            return {}
+        
+        return self._compressor.stats
+    
     def receive(self, clsName, msgID, msg):
         """ Unwrap and inflate a JSON encoded ROS message.
             
@@ -337,9 +897,15 @@ class _ForwarderBase(_AbstractConverter):
         if not _checkIsStringIO(msg):
             raise InvalidRequest('Sent message is not a binary message.')
         
-        self._receive(zlib.decompress(msg.getvalue()), msgID)
+        msg = msg.getvalue()
+        
+        if self.COMPRESS:
+            self._convert(len(msg), zlib.decompress, (msg,), self._receive,
+                          (msgID,))
+        else:
+            self._receive(msg, msgID)
     
-    def _send(self, msg, msgID, protocol, remoteID):
+    def _process(self, msg, msgID, protocol, remoteID):
         """ Wrap and deflate a ROS message in a JSON encoded message.
             
             @param msg:         Received ROS message in serialized form.
@@ -354,17 +920,27 @@ class _ForwarderBase(_AbstractConverter):
             
             @param remoteID:    Unique ID of the Interface which sent the
                                 message.
-            @type  remoteID:    uuid.UUID
+            @type  remoteID:    str
         """
-        self._sendToClient(StringIO(zlib.compress(msg, GZIP_LVL)), msgID,
-                           protocol, remoteID)
+        if self._compressor:
+            self._convert(len(msg), self._deflate, (msg,), self._sendToClient,
+                          (msgID, protocol, remoteID))
+        else:
+            self._sendToClient(StringIO(msg), msgID, protocol, remoteID)
+    
+    def _deflate(self, msg):
+        """ Internally used method to compress a serialized ROS message. Can be
+            run in a worker thread.
+        """
+        return StringIO(self._compressor.compress(msg))
 
 
 class ServiceClientForwarder(_ForwarderBase):
     """ Class which is used as a Service-Client Forwarder.
     """
-    def __init__(self, owner, status, uid, clsName, tag):
-        _ForwarderBase.__init__(self, owner, status, uid, clsName, tag)
+    def __init__(self, owner, status, uid, clsName, tag, options):
+        _ForwarderBase.__init__(self, owner, status, uid, clsName, tag,
+                                options)
         
         self._pendingRequests = {}
     
@@ -412,6 +988,9 @@ class ServiceProviderForwarder(_ForwarderBase):
 class PublisherForwarder(_ForwarderBase):
     """ Class which is used as a Publisher Forwarder.
     """
+    DROPPABLE = True
+    SENDS_TO_ROBOT = True
+    
     def _receive(self, msg, msgID):
         self.received(msg, msgID)
     
@@ -422,8 +1001,38 @@ class PublisherForwarder(_ForwarderBase):
 class SubscriberForwarder(_ForwarderBase):
     """ Class which is used as a Subscriber Forwarder.
     """
+    DROPPABLE = True
+    
     def _receive(self, msg, msgID):
         self.received(msg, msgID)
     
     def _sendToClient(self, msg, msgID, protocol, remoteID):
         self._owner.sendToClient(self._tag, self._clsName, msgID, msg)
+
+
+class ServiceClientRaw(ServiceClientForwarder):
+    """ Class which is used as a Service-Client Raw interface, i.e. a
+        Forwarder which does not compress the ROS messages.
+    """
+    COMPRESS = False
+
+
+class ServiceProviderRaw(ServiceProviderForwarder):
+    """ Class which is used as a Service-Provider Raw interface, i.e. a
+        Forwarder which does not compress the ROS messages.
+    """
+    COMPRESS = False
+
+
+class PublisherRaw(PublisherForwarder):
+    """ Class which is used as a Publisher Raw interface, i.e. a Forwarder
+        which does not compress the ROS messages.
+    """
+    COMPRESS = False
+
+
+class SubscriberRaw(SubscriberForwarder):
+    """ Class which is used as a Subscriber Raw interface, i.e. a Forwarder
+        which does not compress the ROS messages.
+    """
+    COMPRESS = False
@@ -31,6 +31,7 @@
 #     
 
 # Python specific imports
+from time import time
 from threading import Event, Lock
 from uuid import uuid4
 
@@ -40,6 +41,7 @@ from genpy.message import Message
 import rospy
 
 # twisted specific imports
+from twisted.python import log
 from twisted.internet.threads import deferToThreadPool
 
 # Custom imports
@@ -82,7 +84,14 @@ class _ROSInterfaceBase(Interface):
 
 class ServiceClientInterface(_ROSInterfaceBase):
     """ Class which is used as a Service-Client Interface.
+        
+        The service calls are executed in the worker pool of the environment
+        using persistent service proxies, which are reused for subsequent
+        calls and replaced if a call fails.
     """
+    # CONFIG
+    QUEUE_DELAY_WARNING = 1.0  # Queueing delay in seconds which is logged
+    
     def __init__(self, owner, status, uid, clsName, addr):
         _ROSInterfaceBase.__init__(self, owner, status, uid, clsName, addr)
         
@@ -95,23 +104,82 @@ class ServiceClientInterface(_ROSInterfaceBase):
         self._srvCls = owner.loader.loadSrv(pkg, name)
         self._srvCls._request_class = rospy.AnyMsg
         self._srvCls._response_class = rospy.AnyMsg
+        
+        self._threadPool = owner.threadPool
+        
+        # Idle persistent service proxies
+        self._proxies = []
+        self._proxiesLock = Lock()
+        
+        # Statistics of the time the calls wait for a worker
+        self._calls = 0
+        self._totalDelay = 0.0
+        self._maxDelay = 0.0
 
     __init__.__doc__ = _ROSInterfaceBase.__init__.__doc__
     
+    @property
+    def stats(self):
+        """ Dictionary containing the number of service calls and the average
+            and maximal time in seconds the calls waited for a worker.
+        """
+        avgDelay = self._totalDelay/self._calls if self._calls else 0.0
+        return {'calls' : self._calls, 'avgQueueDelay' : avgDelay,
+                'maxQueueDelay' : self._maxDelay}
+    
+    def _stop(self):
+        with self._proxiesLock:
+            proxies = self._proxies
+            self._proxies = []
+        
+        for proxy in proxies:
+            proxy.close()
+    
     def _send(self, msg, msgID, protocol, remoteID):
-        d = deferToThreadPool(self._reactor, self._reactor.getThreadPool(),
-                              self._threadedCall, msg)
+        d = deferToThreadPool(self._reactor, self._threadPool,
+                              self._threadedCall, msg, time())
         d.addCallback(self._respond, msgID, protocol, remoteID)
         d.addErrback(self._errHandler)
     
-    def _threadedCall(self, msg):
+    def _recordDelay(self, delay):
+        self._calls += 1
+        self._totalDelay += delay
+        self._maxDelay = max(self._maxDelay, delay)
+        
+        if delay > self.QUEUE_DELAY_WARNING:
+            log.msg('Service call to "{0}" waited {1:.3f}s for a worker '
+                    '(stats: {2}).'.format(self._name, delay, self.stats))
+    
+    def _threadedCall(self, msg, queued):
+        self._reactor.callFromThread(self._recordDelay, time()-queued)
+        
         rosMsg = rospy.AnyMsg()
         rosMsg._buff = msg
         
-        rospy.wait_for_service(self._name, timeout=5)
-        serviceFunc = rospy.ServiceProxy(self._name,
-                                         self._srvCls)
-        return serviceFunc(rosMsg)
+        with self._proxiesLock:
+            proxy = self._proxies.pop() if self._proxies else None
+        
+        if not proxy:
+            rospy.wait_for_service(self._name, timeout=5)
+            proxy = rospy.ServiceProxy(self._name, self._srvCls,
+                                       persistent=True)
+        
+        try:
+            resp = proxy(rosMsg)
+        except Exception:
+            # Drop the proxy such that the next call uses a new connection
+            proxy.close()
+            raise
+        
+        with self._proxiesLock:
+            if self._ready:
+                self._proxies.append(proxy)
+                proxy = None
+        
+        if proxy:
+            proxy.close()
+        
+        return resp
     
     def _respond(self, resp, msgID, protocol, remoteID):
         self.respond(resp._buff, msgID, protocol, remoteID)
@@ -125,9 +193,22 @@ class ServiceClientInterface(_ROSInterfaceBase):
             e.printTraceback()
 
 
+class _PendingRequest(object):
+    """ Slot in the table of a Service-Provider Interface, which holds a
+        request waiting for its response.
+    """
+    def __init__(self):
+        self.event = Event()
+        self.response = None
+
+
 class ServiceProviderInterface(_ROSInterfaceBase):
     """ Class which is used as a Service-Provider Interface.
     """
+    # CONFIG
+    MAX_PENDING = 256      # Max. number of concurrent requests
+    REQUEST_TIMEOUT = 60   # Timeout in seconds for a request
+    
     def __init__(self, owner, status, uid, clsName, addr):
         _ROSInterfaceBase.__init__(self, owner, status, uid, clsName, addr)
         
@@ -138,8 +219,13 @@ class ServiceProviderInterface(_ROSInterfaceBase):
                                  'form pkg/srv, i.e. std_srvs/Empty.')
         
         self._service = None
+        
+        # Table of the pending requests with the message ID as key and
+        # preallocated slots for the requests
         self._pendingLock = Lock()
         self._pending = {}
+        self._freeSlots = [_PendingRequest() for _ in xrange(self.MAX_PENDING)]
+        self._nextID = 0
         
         self._srvCls = owner.loader.loadSrv(pkg, name)
         self._srvCls._request_class = rospy.AnyMsg
@@ -164,23 +250,26 @@ class ServiceProviderInterface(_ROSInterfaceBase):
         self._service = None
         
         with self._pendingLock:
-            for event in self._pending.itervalues():
-                event.set()
+            for slot in self._pending.itervalues():
+                slot.event.set()
             
             self._pending = {}
     
     def _send(self, msg, msgID, protocol, remoteID):
-        rosMsg = rospy.AnyMsg()
-        rosMsg._buff = msg
-        
         try:
-            with self._pendingLock:
-                event = self._pending[msgID]
-                self._pending[msgID] = rosMsg
-        except KeyError:
+            msgID = int(msgID)
+        except ValueError:
             return
         
-        event.set()
+        rosMsg = rospy.AnyMsg()
+        rosMsg._buff = msg
+        
+        with self._pendingLock:
+            slot = self._pending.get(msgID)
+            
+            if slot:
+                slot.response = rosMsg
+                slot.event.set()
     
     def _callback(self, request):
         """ This method is called by the ROS framework when a Service request
@@ -189,22 +278,34 @@ class ServiceProviderInterface(_ROSInterfaceBase):
             response is present, because the return value of this method is
             used as response to the request.
         """
-        msgID = uuid4().hex
-        event = Event()
-        
         with self._pendingLock:
-            self._pending[msgID] = event
+            if not self._freeSlots:
+                raise rospy.ServiceException('Too many pending requests.')
+            
+            slot = self._freeSlots.pop()
+            slot.event.clear()
+            slot.response = None
+            
+            msgID = self._nextID
+            self._nextID += 1
+            self._pending[msgID] = slot
         
-        self._reactor.callFromThread(self.received, request._buff, msgID)
+        self._reactor.callFromThread(self.received, request._buff, str(msgID))
         
         # Block execution here until the event is set, i.e. a response has
-        # arrived
-        event.wait()
+        # arrived, or the request timed out
+        responded = slot.event.wait(self.REQUEST_TIMEOUT)
         
         with self._pendingLock:
-            response = self._pending.pop(msgID, None)
+            self._pending.pop(msgID, None)
+            response = slot.response
+            slot.response = None
+            self._freeSlots.append(slot)
         
         if not isinstance(response, Message):
+            if not responded:
+                raise rospy.ServiceException('Request timed out.')
+            
             # TODO: Change exception?
             raise rospy.ROSInterruptException('Interrupted.')
         
@@ -214,6 +315,8 @@ class ServiceProviderInterface(_ROSInterfaceBase):
 class PublisherInterface(_ROSInterfaceBase):
     """ Class which is used as a Publisher Interface.
     """
+    DROPPABLE = True
+    
     def __init__(self, owner, status, uid, clsName, addr):
         _ROSInterfaceBase.__init__(self, owner, status, uid, clsName, addr)
         
@@ -251,6 +354,8 @@ class PublisherInterface(_ROSInterfaceBase):
 class SubscriberInterface(_ROSInterfaceBase):
     """ Class which is used as a Subscriber Interface.
     """
+    DROPPABLE = True
+    
     def _start(self):
         self._subscriber = rospy.Subscriber(self._name, rospy.AnyMsg,
                                             self._callback)
@@ -43,6 +43,7 @@ from zope.interface import implements
 # twisted specific imports
 from twisted.python import log
 from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
 from twisted.internet.defer import fail, maybeDeferred
 from twisted.cred.error import UnauthorizedLogin
 from twisted.cred.checkers import ICredentialsChecker
@@ -60,10 +61,11 @@ from rce.client.protocol import CloudEngineWebSocketFactory
 from rce.monitor.converter import PublisherConverter, SubscriberConverter, \
     ServiceClientConverter, ServiceProviderConverter, \
     PublisherForwarder, SubscriberForwarder, \
-    ServiceClientForwarder, ServiceProviderForwarder
+    ServiceClientForwarder, ServiceProviderForwarder, \
+    PublisherRaw, SubscriberRaw, ServiceClientRaw, ServiceProviderRaw
 from rce.slave.endpoint import Endpoint
 from rce.slave.namespace import Namespace
-from rce.util.converter import Converter
+from rce.util.converter import Converter, JSONFragment
 from rce.util.network import getIP
 from rce.util.loader import Loader
 from rce.util.path import processPkgPath
@@ -78,7 +80,9 @@ class Robot(Namespace):
     _MAP = [ServiceClientConverter, PublisherConverter,
             SubscriberConverter, ServiceProviderConverter,
             ServiceClientForwarder, PublisherForwarder,
-            SubscriberForwarder, ServiceProviderForwarder]
+            SubscriberForwarder, ServiceProviderForwarder,
+            ServiceClientRaw, PublisherRaw,
+            SubscriberRaw, ServiceProviderRaw]
     
     def __init__(self, client, status, user):
         """ Initialize the Robot.
@@ -101,6 +105,14 @@ class Robot(Namespace):
         self._user = user
         self._connection = None
         
+        # Interfaces which wait for the congested connection to the robot
+        self._waitingInterfaces = set()
+        
+        # Interface tags and message types whose layouts have been sent to the
+        # robot using the current connection
+        self._layoutTags = set()
+        self._sentLayouts = set()
+        
         # The following replaces the call to Namespace.__init__()
         self._status = status
         self._interfaces = {}
@@ -117,6 +129,46 @@ class Robot(Namespace):
         """ Reference to ROS components loader. """
         return self._client.loader
     
+    @property
+    def reactor(self):
+        """ Reference to the twisted reactor used in this robot process. """
+        return self._client.reactor
+    
+    @property
+    def threadPool(self):
+        """ Reference to the worker pool used for the conversion of large
+            messages.
+        """
+        return self._client.threadPool
+    
+    @property
+    def encoding(self):
+        """ Wire encoding which is used by the connection to the robot or None
+            if there is no connection.
+        """
+        return self._connection and self._connection.encoding
+    
+    @property
+    def positional(self):
+        """ Flag which is True if the converted messages should be sent using
+            the positional encoding.
+        """
+        return bool(self._connection and self._connection.positional)
+    
+    @property
+    def binaryArrays(self):
+        """ Flag which is True if large numeric arrays in the converted
+            messages should be sent as binary data.
+        """
+        return bool(self._connection and self._connection.binaryArrays)
+    
+    @property
+    def congested(self):
+        """ Flag which is True if the connection to the robot can currently
+            not accept more messages.
+        """
+        return bool(self._connection and self._connection.congested)
+    
     def _reportError(self, failure):
         self._connection.sendErrorMessage(failure.getTraceback())
     
@@ -209,7 +261,8 @@ class Robot(Namespace):
         
         d.addErrback(self._reportError)
     
-    def addInterface(self, eTag, iTag, iType, clsName, addr=''):
+    def addInterface(self, eTag, iTag, iType, clsName, addr='',
+                     options=None):
         """ Add an interface to an endpoint, i.e. a ROS environment or a 
             Robot object.
             
@@ -228,7 +281,7 @@ class Robot(Namespace):
                                      ServiceClient, ServiceProvider,
                                      Publisher, Subscriber
                                  - Valid suffixes are:
-                                     Interface, Converter, Forwarder
+                                     Interface, Converter, Forwarder, Raw
             @type  iType:       str
             
             @param clsName:     Message type/Service type consisting of the
@@ -240,10 +293,33 @@ class Robot(Namespace):
                                 use. Only necessary if the suffix of @param
                                 iType is 'Interface'.
             @type  addr:        str
+            
+            @param options:     Additional options for the interface. Only
+                                supported if the suffix of @param iType is
+                                'Converter', 'Forwarder' or 'Raw'. Publishers
+                                support the keys 'conflate' (only the latest
+                                message is kept while the connection to the
+                                robot is congested) and 'maxRate' (maximal
+                                number of messages per second sent to the
+                                robot). Converters of
+                                message types with a custom Converter support
+                                the key 'converter' with the keyword arguments
+                                for the custom Converter, e.g. for images
+                                {'codec' : 'jpeg', 'quality' : 80,
+                                 'scale' : 0.5, 'roi' : [0, 0, 320, 240]}.
+                                Publisher Converters support the keys
+                                'fields' (list of dotted paths, i.e.
+                                'pose.pose.position', of the fields sent to
+                                the robot) and 'threshold' (dictionary with
+                                dotted paths of numeric fields as keys and
+                                thresholds as values; a message is only sent
+                                if a field changed by more than its
+                                threshold).
+            @type  options:     { str : bool / float / list / dict }
         """
         try:
             d = self._user.callRemote('addInterface', eTag, iTag, iType,
-                                      clsName, addr)
+                                      clsName, addr, options or {})
         except (DeadReferenceError, PBConnectionLost):
             raise DeadConnection()
         
@@ -381,7 +457,7 @@ class Robot(Namespace):
         except (DeadReferenceError, PBConnectionLost):
             raise DeadConnection()
     
-    def sendToClient(self, iTag, msgType, msgID, msg):
+    def sendToClient(self, iTag, msgType, msgID, msg, binary=True):
         """ Process a data message which has been received from an interface
             send the message to the registered connection.
                             
@@ -403,7 +479,12 @@ class Robot(Namespace):
                                 JSON compatible dictionary where part or the
                                 complete message can be replaced by a StringIO
                                 instance which is interpreted as binary data.
-            @type  msg:         {str : {} / base_types / StringIO} / StringIO
+            @type  msg:         {str : {} / base_types / StringIO} / StringIO /
+                                JSONFragment
+            
+            @param binary:      Flag which is False if the message is known to
+                                contain no StringIO instances.
+            @type  binary:      bool
         """
         if not self._connection:
             # TODO: What should we do here?
@@ -411,7 +492,19 @@ class Robot(Namespace):
             #       time...
             return
         
-        self._connection.sendDataMessage(iTag, msgType, msgID, msg)
+        if isinstance(msg, JSONFragment):
+            self._connection.sendEncodedDataMessage(iTag, msgType, msgID, msg)
+        else:
+            self._connection.sendDataMessage(iTag, msgType, msgID, msg, binary)
+    
+    def sendErrorToClient(self, msg):
+        """ Send an error message to the registered connection.
+            
+            @param msg:         Error message which should be sent.
+            @type  msg:         str
+        """
+        if self._connection:
+            self._connection.sendErrorMessage(msg)
     
     def registerConnectionToRobot(self, connection):
         """ Register the connection to the robot with this avatar.
@@ -420,6 +513,9 @@ class Robot(Namespace):
         """
         self._connection = connection
         self._client.connectionEstablished(self)
+        
+        self._layoutTags = set()
+        self._sentLayouts = set()
     
     def unregisterConnectionToRobot(self):
         """ Unregister the connection to the robot with this avatar.
@@ -428,8 +524,53 @@ class Robot(Namespace):
         
         if self._client:
             self._client.connectionLost(self)
+        
+        self.connectionResumed()
     
-    def remote_createInterface(self, status, uid, iType, msgType, tag):
+    def sendLayouts(self, iTag, msgCls):
+        """ Send the layouts of the messages of the interface to the robot if
+            they have not yet been sent using the current connection.
+            
+            @param iTag:        Tag which is used to identify the interface.
+            @type  iTag:        str
+            
+            @param msgCls:      ROS message class of the messages which are
+                                sent by the interface.
+            @type  msgCls:      ROS Message class
+        """
+        if not self._connection or iTag in self._layoutTags:
+            return
+        
+        layouts = self.converter.getLayouts(msgCls)
+        
+        for msgType in self._sentLayouts.intersection(layouts):
+            del layouts[msgType]
+        
+        self._connection.sendLayoutMessage(iTag, msgCls._type, layouts)
+        self._layoutTags.add(iTag)
+        self._sentLayouts.update(layouts)
+    
+    def waitForConnection(self, interface):
+        """ Register an interface which should be informed as soon as the
+            connection to the robot is no longer congested.
+            
+            @param interface:   Interface which waits for the connection.
+            @type  interface:   rce.monitor.converter._AbstractConverter
+        """
+        self._waitingInterfaces.add(interface)
+    
+    def connectionResumed(self):
+        """ Callback for the connection to inform the avatar that the
+            connection to the robot is able to accept messages again.
+        """
+        waiting = self._waitingInterfaces
+        self._waitingInterfaces = set()
+        
+        for interface in waiting:
+            interface.connectionResumed()
+    
+    def remote_createInterface(self, status, uid, iType, msgType, tag,
+                               options):
         """ Create an Interface object in the robot namespace and therefore in
             the endpoint.
             
@@ -455,11 +596,15 @@ class Robot(Namespace):
                                 interface in the external communication.
             @type  tag:         str
             
+            @param options:     Additional options for the interface.
+            @type  options:     { str : bool / float }
+            
             @return:            New Interface instance.
             @rtype:             rce.master.network.Interface
                                 (subclass of rce.master.base.Proxy)
         """
-        return self._MAP[iType](self, status, UUID(bytes=uid), msgType, tag)
+        return self._MAP[iType](self, status, UUID(bytes=uid), msgType, tag,
+                                options)
     
     def registerInterface(self, interface):
         # "Special" method to account for 'dict' instead of standard 'set'
@@ -474,6 +619,9 @@ class Robot(Namespace):
         
         assert tag in self._interfaces
         del self._interfaces[tag]
+        
+        self._waitingInterfaces.discard(interface)
+        self._layoutTags.discard(tag)
     
     def remote_destroy(self):
         """ Method should be called to destroy the robot and will take care
@@ -520,6 +668,7 @@ class RobotClient(Endpoint):
     
     # CONFIG
     RECONNECT_TIMEOUT = 10
+    CONVERSION_THREADS = 4  # Max. number of concurrent message conversions
     
     def __init__(self, reactor, commPort, extIF, extPort, loader, converter):
         """ Initialize the Robot Client.
@@ -560,6 +709,11 @@ class RobotClient(Endpoint):
         self._robots = set()
         self._pendingRobots = {}
         self._deathCandidates = {}
+        
+        self._threadPool = ThreadPool(minthreads=1,
+                                      maxthreads=self.CONVERSION_THREADS,
+                                      name='Conversion')
+        self._threadPool.start()
     
     @property
     def converter(self):
@@ -573,6 +727,13 @@ class RobotClient(Endpoint):
         """ Reference to ROS components loader. """
         return self._loader
     
+    @property
+    def threadPool(self):
+        """ Reference to the worker pool used for the conversion of large
+            messages.
+        """
+        return self._threadPool
+    
     def registerRobot(self, robot):
         assert robot not in self._robots
         self._robots.add(robot)
@@ -739,11 +900,13 @@ class RobotClient(Endpoint):
             robot.remote_destroy()
         assert len(self._robots) == 0
         
+        self._threadPool.stop()
+        
         Endpoint.terminate(self)
 
 
 def main(reactor, cred, masterIP, masterPort, extIF, extPort, commPort,
-         pkgPath, customConverters):
+         pkgPath, customConverters, binaryArrayThreshold):
     log.startLogging(sys.stdout)
     
     def _err(reason):
@@ -759,7 +922,7 @@ def main(reactor, cred, masterIP, masterPort, extIF, extPort, commPort,
             rosPath.append(path)
     
     loader = Loader(rosPath)
-    converter = Converter(loader)
+    converter = Converter(loader, binaryArrayThreshold)
     
     for customConverter in customConverters:
         # Get correct path/name of the converter
@@ -30,7 +30,11 @@
 #     
 #     
 
+# Python specific imports
+import os
+
 # twisted specific imports
+from twisted.python import log
 from twisted.python.failure import Failure
 from twisted.internet.defer import fail
 from twisted.internet.protocol import ServerFactory, ClientCreator
@@ -44,7 +48,7 @@ from rce.slave.protocol import Loopback, RCEInternalProtocol
 class Endpoint(Referenceable):
     """ Abstract base class for an Endpoint in a slave process.
     """
-    def __init__(self, reactor, commPort):
+    def __init__(self, reactor, commPort, commSocket=None):
         """ Initialize the Endpoint.
             
             @param reactor:     Reference to the twisted reactor used in this
@@ -55,15 +59,34 @@ class Endpoint(Referenceable):
                                 internal communication will listen for incoming
                                 connections.
             @type  commPort:    int
+            
+            @param commSocket:  Optional path of a Unix domain socket where the
+                                server for the cloud engine internal
+                                communication will additionally listen for
+                                incoming connections from endpoints in the
+                                same machine.
+            @type  commSocket:  str
         """
         self._reactor = reactor
         reactor.listenTCP(commPort, _RCEInternalServerFactory(self))
         
+        if commSocket:
+            # Remove a stale socket of a previous run
+            if os.path.exists(commSocket):
+                os.remove(commSocket)
+            
+            reactor.listenUNIX(commSocket, _RCEInternalServerFactory(self))
+        
         self._loopback = None
         
         self._pendingConnections = {}
         self._protocols = set()
     
+    @property
+    def reactor(self):
+        """ Reference to the twisted reactor used in this slave process. """
+        return self._reactor
+    
     def remote_createNamespace(self, status, *args, **kw):
         """ Remote callable method to create a namespace in this endpoint.
             
@@ -116,7 +139,7 @@ class Endpoint(Referenceable):
         assert connID not in self._pendingConnections
         self._pendingConnections[connID] = [key, auth, status]
     
-    def remote_connect(self, connID, addr):
+    def remote_connect(self, connID, addr, compress=False, fallback=None):
         """ Connect to the endpoint with the given address using the
             connection information matching the received ID.
             
@@ -125,27 +148,58 @@ class Endpoint(Referenceable):
             @type  connID:      str
             
             @param addr:        Address to which the endpoint should connect.
-                                It consists of an IP address and a port number.
-            @type  addr:        (str, int)
+                                It consists either of an IP address and a port
+                                number or of the path of a Unix domain socket.
+            @type  addr:        (str, int) / str
+            
+            @param compress:    Flag which is True if the compression of the
+                                connection should be requested.
+            @type  compress:    bool
+            
+            @param fallback:    IP address and port number to which the
+                                endpoint should connect if the connection
+                                to the Unix domain socket fails.
+            @type  fallback:    (str, int)
+            
+            @return:            None if the connection has been established;
+                                otherwise the failure is returned such that
+                                the Master can tear down the connection.
+            @rtype:             twisted::Deferred
         """
         assert connID in self._pendingConnections
         
         # Retrieve the key which should be sent and replace it with None to
         # indicate that the key has already been sent
         info = self._pendingConnections[connID]
-        key, auth, _ = info
+        key, _, _ = info
         info[0] = None
         
         client = ClientCreator(self._reactor, RCEInternalProtocol, self)
-        d = client.connectTCP(*addr)
-        d.addCallback(lambda p: p.sendInit(connID, key))
-        d.addErrback(self._connectError, auth)
+        
+        if isinstance(addr, str):
+            d = client.connectUNIX(addr)
+            
+            if fallback:
+                # The socket might be stale or the other endpoint might not
+                # yet listen on it
+                d.addErrback(self._connectFallback, client, fallback)
+        else:
+            d = client.connectTCP(*addr)
+        
+        d.addCallback(lambda p: p.sendInit(connID, key, compress))
+        d.addErrback(self._connectError)
+        return d
+    
+    def _connectFallback(self, failure, client, addr):
+        log.msg('Connection through Unix domain socket failed, fall back to '
+                'TCP: {0}'.format(failure.getErrorMessage()))
+        return client.connectTCP(*addr)
     
-    def _connectError(self, failure, auth):
+    def _connectError(self, failure):
         failure.printTraceback()
-        # TODO: Signal back the error
-        # v does not work
-        #auth.callRemote('verifyKey', None, failure)
+        
+        # Signal back the error to the Master, which tears down the connection
+        return failure
     
     def processInit(self, protocol, connID, remoteKey):
         """ Callback for the RCE Internal Protocol which is called when the
@@ -30,9 +30,6 @@
 #     
 #     
 
-# Python specific imports
-from uuid import UUID
-
 # twisted specific imports
 from twisted.python import log
 from twisted.spread.pb import Referenceable, \
@@ -101,6 +98,11 @@ class Types(object):
 class Interface(Referenceable):
     """ Abstract base class for an Interface in a slave process.
     """
+    # Flag which is True if messages of this Interface can be dropped when the
+    # connection is congested, i.e. for topics; messages of services are never
+    # dropped
+    DROPPABLE = False
+    
     def __init__(self, owner, status, uid):
         """ Initialize the Interface.
             
@@ -120,6 +122,7 @@ class Interface(Referenceable):
         
         self._status = status
         self._uid = uid
+        self._rawUID = uid.bytes
         self._protocols = {}
         
         self._ready = False
@@ -129,6 +132,11 @@ class Interface(Referenceable):
         """ Unique ID of the interface. """
         return self._uid
     
+    @property
+    def rawUID(self):
+        """ Unique ID of the interface as a 16 byte string. """
+        return self._rawUID
+    
     def unregisterProtocol(self, protocol):
         """ Callback for the protocol to inform the interface that the
             protocol has died and should no longer be used.
@@ -156,8 +164,6 @@ class Interface(Referenceable):
         if not self._protocols:
             self.start()
         
-        remoteID = UUID(bytes=remoteID)
-        
         if protocol not in self._protocols:
             self._protocols[protocol] = set()
         
@@ -177,8 +183,6 @@ class Interface(Referenceable):
                                 interface should be disconnected.
             @type  remoteID:    str
         """
-        remoteID = UUID(bytes=remoteID)
-        
         protocol.unregisterConnection(self, remoteID)
         
         assert remoteID in self._protocols[protocol]
@@ -259,7 +263,7 @@ class Interface(Referenceable):
             
             @param remoteID:    Unique ID of the Interface which sent the
                                 message.
-            @type  remoteID:    uuid.UUID
+            @type  remoteID:    str
         """
         if not self._ready:
             raise InternalError('Interface is not ready to send a message.')
@@ -306,7 +310,7 @@ class Interface(Referenceable):
             
             @param remoteID:    Unique ID of the Interface to which the
                                 response be sent.
-            @type  remoteID:    uuid.UUID
+            @type  remoteID:    str
         """
         protocol.sendMessage(self, msg, msgID, remoteID)
     
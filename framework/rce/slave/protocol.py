@@ -31,11 +31,16 @@
 #     
 
 # Python specific imports
+import zlib
 import struct
-from uuid import UUID
+from collections import deque
+
+# zope specific imports
+from zope.interface import implements
 
 # twisted specific imports
 from twisted.python import log
+from twisted.internet.interfaces import IPushProducer
 from twisted.internet.defer import succeed
 from twisted.protocols.basic import Int32StringReceiver
 from twisted.spread.pb import Referenceable, \
@@ -53,6 +58,11 @@ class _Protocol(Referenceable):
         """ Initialize the Protocol.
         """
         self._status = None
+        
+        # Receivers with the raw ID of the remote Interface as key and a tuple
+        # containing a tuple of all registered local Interfaces, used for
+        # broadcast messages, and a dictionary with the raw ID of the local
+        # Interfaces as key, used for directed messages, as value
         self._receivers = {}
     
     def registerStatus(self, status):
@@ -82,8 +92,9 @@ class _Protocol(Referenceable):
             @param remoteID:    If the remote ID is supplied than only this
                                 Interface will receive the message, regardless
                                 of additional interfaces which might be
-                                registered.
-            @type  remoteID:    uuid.UUID
+                                registered. The ID is given as a 16 byte
+                                string.
+            @type  remoteID:    str
         """
         raise NotImplementedError("Method 'sendMessage' has to be "
                                   'implemented.')
@@ -93,8 +104,8 @@ class _Protocol(Referenceable):
             stored receivers.
             
             @param remoteID:    Unique ID of the Interface on the other side
-                                which sent the message.
-            @type  remoteID:    uuid.UUID
+                                which sent the message as a 16 byte string.
+            @type  remoteID:    str
             
             @param msg:         Message which was received.
             @type  msg:         str
@@ -107,20 +118,24 @@ class _Protocol(Referenceable):
             @param destID:      If the dest ID is supplied than only this
                                 Interface will receive the message, regardless
                                 of additional interfaces which might be
-                                registered.
-            @type  destID:      uuid.UUID
+                                registered. The ID is given as a 16 byte
+                                string.
+            @type  destID:      str
         """
-        if remoteID not in self._receivers:
+        try:
+            receivers, directed = self._receivers[remoteID]
+        except KeyError:
             log.msg('Received message dropped, because there is no interface '
                     'ready for the message.')
             return
         
-        for interface in self._receivers[remoteID]:
-            if destID:
-                if interface.UID == destID:
-                    interface.send(msg, msgID, self, remoteID)
-                    break
-            else:
+        if destID:
+            interface = directed.get(destID)
+            
+            if interface:
+                interface.send(msg, msgID, self, remoteID)
+        else:
+            for interface in receivers:
                 interface.send(msg, msgID, self, remoteID)
     
     def registerConnection(self, interface, remoteID):
@@ -131,15 +146,19 @@ class _Protocol(Referenceable):
             @param interface:   Reference to the local Interface.
             @type  interface:   rce.slave.interface.Interface
             
-            @param remoteID:    Unique ID of the remote Interface.
-            @type  remoteID:    uuid.UUID
+            @param remoteID:    Unique ID of the remote Interface as a 16 byte
+                                string.
+            @type  remoteID:    str
         """
-        if remoteID not in self._receivers:
-            self._receivers[remoteID] = set()
-        else:
-            assert interface not in self._receivers[remoteID]
+        try:
+            directed = self._receivers[remoteID][1]
+        except KeyError:
+            directed = {}
         
-        self._receivers[remoteID].add(interface)
+        assert interface.rawUID not in directed
+        directed[interface.rawUID] = interface
+        
+        self._receivers[remoteID] = (tuple(directed.itervalues()), directed)
     
     def unregisterConnection(self, interface, remoteID):
         """ Unregister the connection between the local Interface and the
@@ -149,16 +168,20 @@ class _Protocol(Referenceable):
             @param interface:   Reference to the local Interface.
             @type  interface:   rce.slave.interface.Interface
             
-            @param remoteID:    Unique ID of the remote Interface.
-            @type  remoteID:    uuid.UUID
+            @param remoteID:    Unique ID of the remote Interface as a 16 byte
+                                string.
+            @type  remoteID:    str
         """
         assert remoteID in self._receivers
-        receivers = self._receivers[remoteID]
+        directed = self._receivers[remoteID][1]
         
-        assert interface in receivers
-        receivers.remove(interface)
+        assert directed.get(interface.rawUID) is interface
+        del directed[interface.rawUID]
         
-        if not receivers:
+        if directed:
+            self._receivers[remoteID] = (tuple(directed.itervalues()),
+                                         directed)
+        else:
             del self._receivers[remoteID]
     
     def remote_destroy(self):
@@ -167,7 +190,12 @@ class _Protocol(Referenceable):
             deleting all circular references.
         """
         if self._receivers:
-            for interface in reduce(set.union, self._receivers.itervalues()):
+            interfaces = set()
+            
+            for _, directed in self._receivers.itervalues():
+                interfaces.update(directed.itervalues())
+            
+            for interface in interfaces:
                 interface.unregisterProtocol(self)
             
             self._receivers = None
@@ -190,21 +218,187 @@ class Loopback(_Protocol):
         which are in the same Endpoint.
     """
     def sendMessage(self, interface, msg, msgID, remoteID=None):
-        self.messageReceived(interface.UID, msg, msgID, remoteID)
+        self.messageReceived(interface.rawUID, msg, msgID, remoteID)
     
     sendMessage.__doc__ = _Protocol.sendMessage.__doc__
 
 
+class _ChunkedFrame(object):
+    """ Message frame which is larger than the chunk size and is therefore
+        written to the transport in several chunks, such that the frames of
+        other Interfaces can be sent in between.
+    """
+    def __init__(self, header, frame, chunkSize):
+        """ Initialize the chunked frame.
+            
+            @param header:      Header which is prepended to each chunk.
+            @type  header:      str
+            
+            @param frame:       Message frame which should be sent.
+            @type  frame:       str
+            
+            @param chunkSize:   Maximal number of bytes of the frame which
+                                are sent in a single chunk.
+            @type  chunkSize:   int
+        """
+        self._header = header
+        self._frame = frame
+        self._chunkSize = chunkSize
+        self._offset = 0
+    
+    def __len__(self):
+        return len(self._frame) - self._offset
+    
+    @property
+    def started(self):
+        """ Flag which is True if at least one chunk has been sent. """
+        return self._offset > 0
+    
+    @property
+    def nextSize(self):
+        """ Size of the next chunk in bytes. """
+        return len(self._header) + min(self._chunkSize, len(self))
+    
+    def pop(self):
+        """ Remove and return the next chunk of the frame. """
+        start = self._offset
+        self._offset = min(start + self._chunkSize, len(self._frame))
+        return self._header + self._frame[start:self._offset]
+
+
+class _SendQueue(object):
+    """ Queue which holds the message frames of a single Interface which are
+        waiting to be written to the transport.
+    """
+    def __init__(self, interface, droppable):
+        """ Initialize the send queue.
+            
+            @param interface:   Interface whose messages are queued.
+            @type  interface:   rce.slave.interface.Interface
+            
+            @param droppable:   Flag which is True if the oldest frames can be
+                                dropped when the queue grows too large.
+            @type  droppable:   bool
+        """
+        self.interface = interface
+        self.droppable = droppable
+        self.frames = deque()
+        self.size = 0
+        self.dropped = 0
+    
+    def __len__(self):
+        return len(self.frames)
+    
+    def push(self, frame):
+        """ Add a frame, or a chunked frame, at the end of the queue. """
+        self.frames.append(frame)
+        self.size += len(frame)
+    
+    @property
+    def nextSize(self):
+        """ Size in bytes of the data which is returned by the next call to
+            'pop'.
+        """
+        frame = self.frames[0]
+        
+        if isinstance(frame, _ChunkedFrame):
+            return frame.nextSize
+        
+        return len(frame)
+    
+    def pop(self):
+        """ Remove and return the frame, or the next chunk of the chunked
+            frame, at the front of the queue.
+        """
+        frame = self.frames[0]
+        
+        if isinstance(frame, _ChunkedFrame):
+            size = len(frame)
+            chunk = frame.pop()
+            self.size -= size - len(frame)
+            
+            if not frame:
+                self.frames.popleft()
+            
+            return chunk
+        
+        self.frames.popleft()
+        self.size -= len(frame)
+        return frame
+    
+    def shrink(self, limit):
+        """ Drop the oldest frames until the queue is not larger than the
+            given limit. The newest frame and a chunked frame which is
+            partially sent are never dropped.
+            
+            @return:            Number of bytes which have been dropped.
+            @rtype:             int
+        """
+        size = self.size
+        frames = self.frames
+        head = None
+        
+        if isinstance(frames[0], _ChunkedFrame) and frames[0].started:
+            head = frames.popleft()
+        
+        while self.size > limit and len(frames) > 1:
+            self.size -= len(frames.popleft())
+            self.dropped += 1
+        
+        if head:
+            frames.appendleft(head)
+        
+        return size - self.size
+
+
 class RCEInternalProtocol(Int32StringReceiver, _Protocol):
     """ Protocol which is used to connect Endpoints such that Interfaces in
         different Endpoint are able to communicate.
+        
+        Outgoing messages are queued per Interface and written in round-robin
+        order. The protocol is registered as a streaming producer with the
+        transport such that no messages are written while the transport is
+        congested.
+        
+        Messages which are larger than the chunk size are split into chunks
+        which are interleaved with the messages of the other Interfaces and
+        reassembled by the receiving protocol.
+        
+        If requested by the side which initiates the connection, the written
+        data is compressed as a single deflate stream which is flushed after
+        each batch.
     """
+    implements(IPushProducer)
+    
     # CONFIG
     MAX_LENGTH = 1000000  # Maximal message length in bytes
+    BATCH_SIZE = 65536    # Max. size of a batch in bytes (0 disables batching)
+    BATCH_DELAY = 0       # Max. time in seconds a message is held in a batch
+    CHUNK_SIZE = 65536    # Max. size of a chunk in bytes (0 disables chunking)
+    
+    # Maximal length of a chunked message in bytes and maximal number of bytes
+    # of all partially received chunked messages
+    MAX_CHUNKED_LENGTH = 100000000
+    MAX_REASSEMBLY_SIZE = 200000000
+    
+    # Max. level of the stream compression which is negotiated for connections
+    # between different machines (0 disables the compression)
+    COMPRESSION_LEVEL = 6
+    
+    # Size of a queue in bytes from which on the oldest messages of topics are
+    # dropped, and size to which the queue is reduced
+    QUEUE_HIGH_WATERMARK = 1000000
+    QUEUE_LOW_WATERMARK = 500000
     
     _MSG_ID_STRUCT = struct.Struct('!B')
+    _HEADER_STRUCT = struct.Struct('!x16sB')
+    _DIRECTED_HEADER_STRUCT = struct.Struct('!x16s16sB')
+    _LENGTH_STRUCT = struct.Struct('!I')
     _TRUE = struct.pack('!?', True)
     _FALSE = struct.pack('!?', False)
+    _BATCH = '\x02'
+    _CHUNK = '\x03'
+    _CHUNK_STRUCT = struct.Struct('!II')
     
     def __init__(self, endpoint):
         """ Initialize the Protocol.
@@ -217,9 +411,45 @@ class RCEInternalProtocol(Int32StringReceiver, _Protocol):
         self._endpoint = endpoint
         endpoint.registerProtocol(self)
         
+        self._reactor = endpoint.reactor
+        
+        # Send queues of the interfaces and the queues which contain frames
+        # in the order in which they are served
+        self._queues = {}
+        self._pending = deque()
+        self._queuedSize = 0
+        
+        # Counter for the IDs of the sent chunked messages and the partially
+        # received chunked messages with the ID as key and a list containing
+        # the length of the message, the number of received bytes and the
+        # received chunks as value
+        self._chunkID = 0
+        self._chunks = {}
+        self._reassemblySize = 0
+        
+        self._paused = False
+        self._flushCall = None
+        
+        # Negotiated compression level, the deflate streams and the counters
+        # of the raw and compressed bytes in both directions
+        self._level = 0
+        self._deflater = None
+        self._inflater = None
+        self._sentBytes = 0
+        self._sentCompressedBytes = 0
+        self._receivedBytes = 0
+        self._receivedCompressedBytes = 0
+        
+        self._initSent = False
         self._initialized = False
         self.stringReceived = self._initReceived
     
+    def connectionMade(self):
+        """ Method is called by the twisted framework when the connection is
+            established.
+        """
+        self.transport.registerProducer(self, True)
+    
     def _initReceived(self, msg):
         """ Internally used method process a complete string message as long as
             the connection is not yet initialized.
@@ -227,22 +457,64 @@ class RCEInternalProtocol(Int32StringReceiver, _Protocol):
             @param msg:         Message which was received.
             @type  msg:         str
         """
-        if len(msg) != 32:
+        if len(msg) != 33:
             log.msg('Protocol Error: iInit message has invalid format.')
             self.transport.loseConnection()
             return
         
-        d = self._endpoint.processInit(self, msg[:16], msg[16:])
+        level = ord(msg[32])
+        
+        if self._initSent:
+            # Response which contains the negotiated compression level
+            self._level = min(level, self._level)
+        else:
+            self._level = min(level, self.COMPRESSION_LEVEL)
+        
+        d = self._endpoint.processInit(self, msg[:16], msg[16:32])
+        
+        # The init messages are never compressed; as the response has been
+        # sent by now all following data is compressed
+        if self._level:
+            self._deflater = zlib.compressobj(self._level)
+            self._inflater = zlib.decompressobj()
+        
         d.addCallbacks(self._initSuccessful, self._initFailed)
     
     def _initSuccessful(self, _):
-        self.stringReceived = self._messageReceived
+        if self._inflater:
+            self.stringReceived = self._compressedReceived
+        else:
+            self.stringReceived = self._messageReceived
+        
         self._initialized = True
     
     def _initFailed(self, failure):
         log.msg('Protocol Error: {0}'.format(failure.getErrorMessage()))
         self.transport.loseConnection()
     
+    def _compressedReceived(self, msg):
+        """ Internally used method process a complete compressed string
+            message after the connection has been initialized.
+            
+            @param msg:         Message which was received.
+            @type  msg:         str
+        """
+        try:
+            data = self._inflater.decompress(msg, self.MAX_LENGTH)
+        except zlib.error:
+            log.msg('Protocol Error: Could not decompress message.')
+            self.transport.loseConnection()
+            return
+        
+        if self._inflater.unconsumed_tail:
+            log.msg('Protocol Error: Decompressed message is too long.')
+            self.transport.loseConnection()
+            return
+        
+        self._receivedBytes += len(data)
+        self._receivedCompressedBytes += len(msg)
+        self._messageReceived(data)
+    
     def _messageReceived(self, msg):
         """ Internally used method process a complete string message after
             the connection has been initialized.
@@ -250,34 +522,143 @@ class RCEInternalProtocol(Int32StringReceiver, _Protocol):
             @param msg:         Message which was received.
             @type  msg:         str
         """
-        if len(msg) < 17:
-            self.transport.loseConnection()
+        if msg[:1] != self._BATCH:
+            self._frameReceived(msg, 0, len(msg))
+            return
+        
+        offset = 1
+        end = len(msg)
+        
+        while offset < end:
+            if end - offset < 4:
+                log.msg('Protocol Error: Batch has invalid format.')
+                self.transport.loseConnection()
+                return
+            
+            length, = self._LENGTH_STRUCT.unpack_from(msg, offset)
+            offset += 4
+            
+            if offset + length > end:
+                log.msg('Protocol Error: Batch has invalid format.')
+                self.transport.loseConnection()
+                return
+            
+            self._frameReceived(msg, offset, offset + length)
+            offset += length
+    
+    def _frameReceived(self, msg, start, end):
+        """ Internally used method process a single message frame which is
+            either a complete string message or part of a batch.
+            
+            @param msg:         String containing the frame.
+            @type  msg:         str
+            
+            @param start:       Index in the string where the frame starts.
+            @type  start:       int
+            
+            @param end:         Index in the string where the frame ends.
+            @type  end:         int
+        """
+        if msg[start:start+1] == self._CHUNK:
+            self._chunkReceived(msg, start, end)
+            return
         
-        flag = msg[:1]
+        flag = msg[start:start+1]
         
         if flag == self._TRUE:
-            destID = UUID(bytes=msg[1:17])
-            offset = 17
+            header = self._DIRECTED_HEADER_STRUCT
         elif flag == self._FALSE:
-            destID = None
-            offset = 1
+            header = self._HEADER_STRUCT
         else:
             log.msg('Protocol Error: Could not identify flag.')
             self.transport.loseConnection()
             return
         
-        remoteID = UUID(bytes=msg[offset:offset+16])
-        offset += 16
+        if end - start < header.size:
+            log.msg('Protocol Error: Message is too short.')
+            self.transport.loseConnection()
+            return
         
-        idLen, = self._MSG_ID_STRUCT.unpack(msg[offset:offset+1])
-        offset += 1
+        # The IDs are used as raw strings for the lookup of the receivers
+        if flag == self._TRUE:
+            destID, remoteID, idLen = header.unpack_from(msg, start)
+        else:
+            remoteID, idLen = header.unpack_from(msg, start)
+            destID = None
         
+        offset = start + header.size
         msgID = msg[offset:offset+idLen]
         offset += idLen
         
-        self.messageReceived(remoteID, buffer(msg, offset), msgID, destID)
+        self.messageReceived(remoteID, buffer(msg, offset, end-offset), msgID,
+                             destID)
     
-    def sendInit(self, connID, key):
+    def _chunkReceived(self, msg, start, end):
+        """ Internally used method process a single chunk of a chunked
+            message. As soon as all chunks of the message have been received
+            the reassembled message frame is processed.
+            
+            @param msg:         String containing the chunk.
+            @type  msg:         str
+            
+            @param start:       Index in the string where the chunk starts.
+            @type  start:       int
+            
+            @param end:         Index in the string where the chunk ends.
+            @type  end:         int
+        """
+        if end - start < 9:
+            log.msg('Protocol Error: Chunk is too short.')
+            self.transport.loseConnection()
+            return
+        
+        chunkID, length = self._CHUNK_STRUCT.unpack_from(msg, start + 1)
+        entry = self._chunks.get(chunkID)
+        
+        if entry is None:
+            if length > self.MAX_CHUNKED_LENGTH:
+                log.msg('Protocol Error: Chunked message is too long.')
+                self.transport.loseConnection()
+                return
+            
+            if self._reassemblySize + length > self.MAX_REASSEMBLY_SIZE:
+                log.msg('Protocol Error: Too many partially received chunked '
+                        'messages.')
+                self.transport.loseConnection()
+                return
+            
+            entry = [length, 0, []]
+            self._chunks[chunkID] = entry
+            self._reassemblySize += length
+        elif entry[0] != length:
+            log.msg('Protocol Error: Chunk has invalid format.')
+            self.transport.loseConnection()
+            return
+        
+        entry[1] += end - start - 9
+        entry[2].append(msg[start+9:end])
+        
+        if entry[1] < length:
+            return
+        
+        del self._chunks[chunkID]
+        self._reassemblySize -= length
+        
+        if entry[1] > length:
+            log.msg('Protocol Error: Chunked message is too long.')
+            self.transport.loseConnection()
+            return
+        
+        frame = ''.join(entry[2])
+        
+        if frame[:1] == self._CHUNK:
+            log.msg('Protocol Error: Chunked message has invalid format.')
+            self.transport.loseConnection()
+            return
+        
+        self._frameReceived(frame, 0, length)
+    
+    def sendInit(self, connID, key, compress=False):
         """ Send an init message to the other side.
             
             @param connID:      Unique ID which is used to identify the
@@ -287,16 +668,44 @@ class RCEInternalProtocol(Int32StringReceiver, _Protocol):
             @param key:         Key which should be sent with the init message
                                 to authenticate this endpoint.
             @type  key:         str
+            
+            @param compress:    Flag which is True if the stream compression
+                                should be requested. Only used by the side
+                                which initiates the connection; the other side
+                                responds with the negotiated level.
+            @type  compress:    bool
         """
         assert len(connID) == 16
         assert len(key) == 16
         
-        self.sendString(connID + key)
+        if compress:
+            self._level = self.COMPRESSION_LEVEL
+        
+        self._initSent = True
+        self.sendString(connID + key + chr(self._level))
+    
+    @property
+    def stats(self):
+        """ Dictionary containing the negotiated compression level and the
+            number of raw and compressed bytes as well as the compression
+            ratio for both directions.
+        """
+        sentRatio = (float(self._sentCompressedBytes)/self._sentBytes
+                     if self._sentBytes else 1.0)
+        receivedRatio = (float(self._receivedCompressedBytes) /
+                         self._receivedBytes if self._receivedBytes else 1.0)
+        return {'level' : self._level,
+                'sent' : self._sentBytes,
+                'sentCompressed' : self._sentCompressedBytes,
+                'sentRatio' : sentRatio,
+                'received' : self._receivedBytes,
+                'receivedCompressed' : self._receivedCompressedBytes,
+                'receivedRatio' : receivedRatio}
     
     def sendMessage(self, interface, msg, msgID, remoteID=None):
         assert self._initialized
         
-        uid = interface.UID.bytes
+        uid = interface.rawUID
         assert len(uid) == 16
         
         try:
@@ -306,20 +715,189 @@ class RCEInternalProtocol(Int32StringReceiver, _Protocol):
         
         if remoteID:
             flag = self._TRUE
-            rmtID = remoteID.bytes
+            rmtID = remoteID
             assert len(rmtID) == 16
         else:
             flag = self._FALSE
             rmtID = ''
         
-        self.sendString(''.join((flag, rmtID, uid, idLen, msgID, msg)))
+        frame = ''.join((flag, rmtID, uid, idLen, msgID, msg))
+        
+        if self.CHUNK_SIZE and len(frame) > self.CHUNK_SIZE:
+            header = self._CHUNK + self._CHUNK_STRUCT.pack(self._chunkID,
+                                                           len(frame))
+            self._chunkID = (self._chunkID + 1) % 0x100000000
+            frame = _ChunkedFrame(header, frame, self.CHUNK_SIZE)
+        
+        self._queueFrame(interface, frame)
     
     sendMessage.__doc__ = _Protocol.sendMessage.__doc__
     
+    def _queueFrame(self, interface, frame):
+        """ Internally used method to add a message frame to the send queue
+            of the interface. The queued frames are written as soon as the
+            batch is full or the batch delay has passed.
+            
+            If the queue of a topic grows larger than the high watermark the
+            oldest frames are dropped; frames of services are never dropped.
+            
+            @param interface:   Interface which wants to send the frame.
+            @type  interface:   rce.slave.interface.Interface
+            
+            @param frame:       Message frame which should be sent.
+            @type  frame:       str / _ChunkedFrame
+        """
+        queue = self._queues.get(interface)
+        
+        if queue is None:
+            queue = _SendQueue(interface, interface.DROPPABLE)
+            self._queues[interface] = queue
+        
+        if not queue:
+            self._pending.append(queue)
+        
+        queue.push(frame)
+        self._queuedSize += len(frame)
+        
+        if queue.droppable and queue.size > self.QUEUE_HIGH_WATERMARK:
+            dropped = queue.shrink(self.QUEUE_LOW_WATERMARK)
+            self._queuedSize -= dropped
+            
+            log.msg('Send queue of interface {0} is full: {1} bytes have '
+                    'been dropped ({2} messages dropped in '
+                    'total).'.format(interface.UID, dropped, queue.dropped))
+            
+            if not queue:
+                self._pending.remove(queue)
+                del self._queues[interface]
+        
+        if self._paused:
+            return
+        
+        if self._queuedSize >= self.BATCH_SIZE:
+            self._flush()
+        elif not self._flushCall:
+            self._flushCall = self._reactor.callLater(self.BATCH_DELAY,
+                                                      self._flush)
+    
+    def _flush(self):
+        """ Internally used method to write the queued frames to the
+            transport until all queues are empty or the transport asks the
+            protocol to pause. The queues are served in round-robin order and
+            the frames are combined into batches.
+        """
+        if self._flushCall:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            
+            self._flushCall = None
+        
+        pending = self._pending
+        
+        while pending and not self._paused:
+            batch = []
+            batchSize = 0
+            
+            while pending:
+                queue = pending[0]
+                size = queue.nextSize + 4
+                
+                if batch and batchSize + size > self.BATCH_SIZE:
+                    break
+                
+                pending.popleft()
+                queuedSize = queue.size
+                batch.append(queue.pop())
+                self._queuedSize -= queuedSize - queue.size
+                batchSize += size
+                
+                if queue:
+                    pending.append(queue)
+                else:
+                    del self._queues[queue.interface]
+            
+            self._writeBatch(batch, batchSize)
+    
+    def _writeBatch(self, batch, batchSize):
+        """ Internally used method to write a batch of frames to the
+            transport.
+            
+            @param batch:       Message frames which should be written.
+            @type  batch:       [ str ]
+            
+            @param batchSize:   Size of the batch in bytes including the
+                                length prefixes of the frames.
+            @type  batchSize:   int
+        """
+        if len(batch) == 1:
+            data = batch
+        else:
+            data = [self._BATCH]
+            
+            for frame in batch:
+                data.append(self._LENGTH_STRUCT.pack(len(frame)))
+                data.append(frame)
+        
+        if self._deflater:
+            # Flush the stream such that the other side can process the batch
+            # while keeping the window for the following batches
+            deflater = self._deflater
+            compressed = [deflater.compress(part) for part in data]
+            compressed.append(deflater.flush(zlib.Z_SYNC_FLUSH))
+            compressed = ''.join(compressed)
+            
+            self._sentBytes += sum(len(part) for part in data)
+            self._sentCompressedBytes += len(compressed)
+            self.sendString(compressed)
+        elif len(batch) == 1:
+            self.sendString(batch[0])
+        else:
+            data.insert(0, self._LENGTH_STRUCT.pack(batchSize + 1))
+            self.transport.writeSequence(data)
+    
+    def pauseProducing(self):
+        """ Method is called by the transport when its buffer is full.
+            (Implementation of IPushProducer)
+        """
+        self._paused = True
+    
+    def resumeProducing(self):
+        """ Method is called by the transport when its buffer has been
+            drained. (Implementation of IPushProducer)
+        """
+        self._paused = False
+        self._flush()
+    
+    def stopProducing(self):
+        """ Method is called by the transport when the connection can no
+            longer be used. (Implementation of IPushProducer)
+        """
+        self._paused = True
+    
     def connectionLost(self, reason):
         """ Method is called by the twisted framework when the connection is
             lost.
         """
+        if self._flushCall:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            
+            self._flushCall = None
+        
+        self._queues = {}
+        self._pending = deque()
+        self._queuedSize = 0
+        
+        self._chunks = {}
+        self._reassemblySize = 0
+        
+        if self._level:
+            log.msg('Internal connection closed (compression stats: '
+                    '{0}).'.format(self.stats))
+        
+        self._deflater = None
+        self._inflater = None
+        
         _Protocol.remote_destroy(self)
         
         if self._endpoint:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#     
+#     test_converter.py
+#     
+#     This file is part of the RoboEarth Cloud Engine framework.
+#     
+#     This file was originally created for RoboEearth
+#     http://www.roboearth.org/
+#     
+#     The research leading to these results has received funding from
+#     the European Union Seventh Framework Programme FP7/2007-2013 under
+#     grant agreement no248942 RoboEarth.
+#     
+#     Copyright 2013 RoboEarth
+#     
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#     
+#     http://www.apache.org/licenses/LICENSE-2.0
+#     
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#     
+#     \author/s: Dominique Hunziker 
+#     
+#     
+
+# Python specific imports
+import zlib
+from uuid import uuid4
+
+# twisted specific imports
+from twisted.trial import unittest
+from twisted.internet.defer import Deferred
+
+# Custom imports
+from rce.monitor import converter
+
+
+class _Clock(object):
+    """ Clock which replaces the function 'time' of the converter module;
+        every call advances the time by the compression time of a message.
+    """
+    def __init__(self, step):
+        self.now = 0.0
+        self.step = step
+    
+    def __call__(self):
+        now = self.now
+        self.now += self.step
+        return now
+
+
+class AdaptiveCompressorTest(unittest.TestCase):
+    """ Tests for the selection of the compression level of a Forwarder.
+    """
+    def setUp(self):
+        self.msg = 'RoboEarth Cloud Engine ' * 4096
+    
+    def _compress(self, step, gap, count):
+        clock = _Clock(step)
+        self.patch(converter, 'time', clock)
+        compressor = converter._AdaptiveCompressor('test', 9)
+        
+        for _ in xrange(count):
+            clock.now += gap
+            self.assertEqual(zlib.decompress(compressor.compress(self.msg)),
+                             self.msg)
+        
+        return compressor
+    
+    def test_compressibleLevelStaysPut(self):
+        # About 9 MB/s, which is realistic for the level 9, at 10 messages per
+        # second uses less than a tenth of the CPU time
+        compressor = self._compress(0.01, 0.1, 100)
+        
+        self.assertEqual(compressor.stats['level'], 9)
+        self.assertFalse(compressor.stats['incompressible'])
+    
+    def test_overloadLowersLevel(self):
+        compressor = self._compress(0.1, 0.1, 100)
+        
+        self.assertTrue(compressor.stats['level'] < 9)
+        self.assertTrue(compressor.stats['level'] >= 1)
+
+
+class _Owner(object):
+    """ Robot which owns the interfaces in the tests.
+    """
+    reactor = None
+    threadPool = None
+    
+    def __init__(self):
+        self.errors = []
+    
+    def registerInterface(self, interface):
+        pass
+    
+    def sendErrorToClient(self, msg):
+        self.errors.append(msg)
+
+
+class _TopicConverter(converter._AbstractConverter):
+    DROPPABLE = True
+
+
+class _ServiceConverter(converter._AbstractConverter):
+    DROPPABLE = False
+
+
+class ConversionQueueTest(unittest.TestCase):
+    """ Tests for the conversions which wait for the worker pool.
+    """
+    def setUp(self):
+        self.running = []
+        self.results = []
+        self.patch(converter, 'deferToThreadPool', self._deferToThreadPool)
+    
+    def _deferToThreadPool(self, reactor, threadPool, func, *args):
+        # The conversion is blocked until the test finishes it
+        d = Deferred()
+        self.running.append((d, func, args))
+        return d
+    
+    def _finish(self):
+        d, func, args = self.running.pop(0)
+        d.callback(func(*args))
+    
+    def _fill(self, cls, count):
+        interface = cls(_Owner(), None, uuid4(), 'std_msgs/Int32', 'test', {})
+        
+        for i in xrange(count):
+            interface._convert(interface.INLINE_SIZE, lambda i: i, (i,),
+                               self.results.append, ())
+        
+        return interface
+    
+    def test_droppableKeepsNewest(self):
+        interface = self._fill(_TopicConverter, 100)
+        
+        self.assertEqual(len(interface._jobs), 1)
+        
+        self._finish()
+        self._finish()
+        
+        self.assertEqual(self.results, [0, 99])
+        self.assertFalse(interface._jobs)
+    
+    def test_serviceQueueBounded(self):
+        interface = self._fill(_ServiceConverter, 100)
+        maxJobs = interface.MAX_JOBS
+        
+        self.assertEqual(len(interface._jobs), maxJobs)
+        self.assertEqual(len(interface._owner.errors), 99 - maxJobs)
+        
+        while self.running:
+            self._finish()
+        
+        self.assertEqual(self.results, range(maxJobs + 1))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#     
+#     test_endpoint.py
+#     
+#     This file is part of the RoboEarth Cloud Engine framework.
+#     
+#     This file was originally created for RoboEearth
+#     http://www.roboearth.org/
+#     
+#     The research leading to these results has received funding from
+#     the European Union Seventh Framework Programme FP7/2007-2013 under
+#     grant agreement no248942 RoboEarth.
+#     
+#     Copyright 2013 RoboEarth
+#     
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#     
+#     http://www.apache.org/licenses/LICENSE-2.0
+#     
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#     
+#     \author/s: Dominique Hunziker 
+#     
+#     
+
+# twisted specific imports
+from twisted.trial import unittest
+from twisted.python.failure import Failure
+from twisted.internet.error import ConnectionRefusedError
+from twisted.test.proto_helpers import MemoryReactorClock
+
+# Custom imports
+from rce.slave.endpoint import Endpoint
+
+
+class ConnectTest(unittest.TestCase):
+    """ Tests for the connection attempts of a slave Endpoint.
+    """
+    def setUp(self):
+        self.reactor = MemoryReactorClock()
+        self.endpoint = Endpoint(self.reactor, 10030)
+        self.endpoint.remote_prepareConnection('connID', 'key', None, None)
+    
+    def _failUNIX(self):
+        path, factory = self.reactor.unixClients.pop(0)[:2]
+        self.assertEqual(path, '/opt/rce/data/comm.sock')
+        factory.clientConnectionFailed(None,
+                                       Failure(ConnectionRefusedError()))
+        self.reactor.advance(0)
+    
+    def test_unixFallsBackToTCP(self):
+        self.endpoint.remote_connect('connID', '/opt/rce/data/comm.sock',
+                                     False, ('10.0.3.1', 10030))
+        self._failUNIX()
+        
+        self.assertEqual(self.reactor.tcpClients[0][:2], ('10.0.3.1', 10030))
+    
+    def test_unixFailureIsReported(self):
+        d = self.endpoint.remote_connect('connID', '/opt/rce/data/comm.sock')
+        self._failUNIX()
+        
+        return self.assertFailure(d, ConnectionRefusedError)
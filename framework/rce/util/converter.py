@@ -32,7 +32,10 @@
 
 # Python specific imports
 import time
+import json
+import struct
 from datetime import datetime
+from functools import partial
 
 try:
     from cStringIO import StringIO, InputType, OutputType
@@ -47,16 +50,48 @@ except ImportError:
         return isinstance(obj, StringIO)
 
 # ROS specific imports
+from genmsg.msgs import parse_type
 from genmsg.names import package_resource_name
 from genpy.message import Message
 from rospy.rostime import Duration, Time
 
 # Custom imports
 from rce.error import InternalError
+from rce.client.assembler import ARRAY_FORMATS
 from rce.util.interface import verifyClass
 from rce.util.converters.interfaces import IROSConverter
 
 
+def _stringify(obj):
+    """ Internally used function to make sure that strings are of type str and
+        not of type unicode.
+    """
+    if isinstance(obj, unicode):
+        return obj.encode('utf-8')
+    else:
+        return obj
+
+
+def _jsonFloat(value):
+    """ Internally used function to get the JSON representation of a float
+        which matches the one of the json module.
+    """
+    if value != value:
+        return 'NaN'
+    elif value == float('inf'):
+        return 'Infinity'
+    elif value == float('-inf'):
+        return '-Infinity'
+    
+    return repr(value)
+
+
+class JSONFragment(str):
+    """ String which contains an already JSON encoded message. It can be used
+        in place of the JSON compatible data of a message.
+    """
+
+
 class _DurationConverter(object):
     """ Convert ROS Duration type to JSON style and back.
     """
@@ -133,14 +168,56 @@ class Converter(object):
     _SPECIAL_TYPES = {  'time'     : _TimeConverter,
                         'duration' : _DurationConverter }
     
-    def __init__(self, loader):
+    # struct formats of the numeric types whose arrays are converted in bulk
+    _ARRAY_FORMATS = ARRAY_FORMATS
+    
+    # struct formats of the fields of the special types in serialized messages
+    _SPECIAL_FORMATS = {    'time'     : (Time, '<2I'),
+                            'duration' : (Duration, '<2i') }
+    
+    _LENGTH = struct.Struct('<I')
+    
+    def __init__(self, loader, binaryArrayThreshold=0):
         """ Initialize the Converter.
             
             @param loader:      Used loader for ROS resources.
             @type  loader:      Loader
+            
+            @param binaryArrayThreshold:    Minimal number of elements of an
+                                array of a numeric type such that the array is
+                                sent as little-endian binary data instead of a
+                                JSON list, if the binary arrays are requested
+                                for the encoded message. 0 disables the binary
+                                encoding.
+            @type  binaryArrayThreshold:    int
         """
         self._loader = loader
+        self._binaryArrayThreshold = binaryArrayThreshold
         self._customTypes = {}
+        
+        # Caches for the compiled codec plans with the message class (and the
+        # flags positional and binaryArrays) as key and the specialized
+        # encode/decode function as value
+        self._encoders = {}
+        self._decoders = {}
+        
+        # Cache with the message class and the flag binaryArrays as key and a
+        # flag as value which indicates whether the encoded message might
+        # contain binary data
+        self._binaries = {}
+        
+        # Cache for the compiled functions which convert serialized ROS
+        # messages directly to JSON
+        self._serializedEncoders = {}
+    
+    def _invalidatePlans(self):
+        """ Internally used method to drop all compiled codec plans. Has to be
+            called whenever the registry of custom Converters changes.
+        """
+        self._encoders = {}
+        self._decoders = {}
+        self._binaries = {}
+        self._serializedEncoders = {}
     
     def addCustomConverter(self, converter):
         """ Register a new custom Converter.
@@ -163,6 +240,7 @@ class Converter(object):
         
         self._customTypes[converter.MESSAGE_TYPE] = (converter,
             self._loader.loadMsg(pkg, name))
+        self._invalidatePlans()
     
     def removeCustomConverter(self, msgType):
         """ Unregister a custom Converter.
@@ -177,61 +255,334 @@ class Converter(object):
         except KeyError:
             InternalError('Tried to remove a custom converter which was '
                           'never added.')
+        else:
+            self._invalidatePlans()
+    
+    def createCustomConverter(self, msgCls, options):
+        """ Create an instance of the custom Converter which is registered for
+            the given ROS message class using the given options.
+            
+            @param msgCls:      ROS message class for which the custom
+                                Converter should be created.
+            @type  msgCls:      ROS Message class
+            
+            @param options:     Keyword arguments for the constructor of the
+                                custom Converter.
+            @type  options:     { str : ... }
+            
+            @return:            New custom Converter instance.
+            @rtype:             rce.util.converters.interfaces.IROSConverter
+            
+            @raise:             TypeError, ValueError
+        """
+        for converter, cls in self._customTypes.itervalues():
+            if issubclass(msgCls, cls):
+                return converter(**options)
+        
+        raise TypeError('There is no custom Converter for the message type '
+                        '"{0}".'.format(msgCls._type))
+    
+    def _loadMsgCls(self, msgType):
+        """ Internally used method to load the ROS message class matching the
+            given message type, i.e. 'std_msgs/Int8'.
+        """
+        return self._loader.loadMsg(*msgType.split('/'))
     
-    def _stringify(self, _, obj):
-        """ Internally used method to make sure that strings are of type str
-            and not of type unicode.
+    def _getEncoder(self, msgCls, positional=False, binaryArrays=False):
+        """ Internally used method to get the compiled encode function for the
+            given ROS message class. The function is compiled on first use.
         """
-        if isinstance(obj, unicode):
-            return obj.encode('utf-8')
+        try:
+            return self._encoders[msgCls, positional, binaryArrays]
+        except KeyError:
+            pass
+        
+        for converter, cls in self._customTypes.itervalues():
+            if issubclass(msgCls, cls):
+                encoder = converter().encode
+                break
         else:
-            return obj
+            encoder = self._compileEncoder(msgCls, positional, binaryArrays)
+        
+        self._encoders[msgCls, positional, binaryArrays] = encoder
+        return encoder
     
-    def _encode(self, rosMsg):
-        """ Internally used method which is responsible for the heavy lifting.
+    def _compileEncoder(self, msgCls, positional, binaryArrays):
+        """ Internally used method which resolves the layout of the given ROS
+            message class once and returns a specialized encode function.
+            The function returns a dictionary or, if the flag positional is
+            set, a list with the fields in the order of the message layout.
+            If the flag binaryArrays is set, large numeric arrays are packed
+            as binary data.
         """
-        data = {}
-
-        for (slotName, slotType) in zip(rosMsg.__slots__, rosMsg._slot_types):
-            if '[]' == slotType[-2:]:
-                listBool = True
-                slotType = slotType[:-2]
-            else:
-                listBool = False
+        fields = []
+        
+        for slotName, slotType in zip(msgCls.__slots__, msgCls._slot_types):
+            convFunc, listBool = self._fieldEncoder(slotType, positional,
+                                                    binaryArrays)
+            fields.append((slotName, convFunc, listBool))
+        
+        return self._fieldsEncoder(msgCls.__name__, fields, positional)
+    
+    def _fieldEncoder(self, slotType, positional, binaryArrays):
+        """ Internally used method to get the encode function for a single
+            field of the given ROS type. Returns a tuple containing the encode
+            function and a flag which is True if the function has to be
+            applied to each element of the field.
+        """
+        slotType, listBool, _ = parse_type(slotType)
+        
+        if listBool and slotType in Converter._ARRAY_FORMATS:
+            return self._primitiveArrayEncoder(slotType, binaryArrays), False
+        
+        if slotType in Converter._BASE_TYPES:
+            convFunc = Converter._BASE_TYPES[slotType]
+        elif slotType in Converter._SPECIAL_TYPES:
+            convFunc = Converter._SPECIAL_TYPES[slotType]().encode
+        elif slotType in self._customTypes:
+            convFunc = self._customTypes[slotType][0]().encode
+        else:
+            convFunc = self._getEncoder(self._loadMsgCls(slotType), positional,
+                                        binaryArrays)
+        
+        return convFunc, listBool
+    
+    @staticmethod
+    def _fieldsEncoder(clsName, fields, positional):
+        """ Internally used method to create the encode function for a ROS
+            message from the list of tuples (slotName, convFunc, listBool)
+            describing the fields which should be encoded.
+        """
+        def encodePositional(rosMsg):
+            data = []
             
-            field = getattr(rosMsg, slotName)
+            for slotName, convFunc, listBool in fields:
+                field = getattr(rosMsg, slotName)
+                
+                try:
+                    if listBool:
+                        data.append(map(convFunc, field))
+                    else:
+                        data.append(convFunc(field))
+                except (ValueError, struct.error) as e:
+                    raise ValueError('{0}.{1}: {2}'.format(clsName, slotName,
+                                                           e))
             
-            if slotType in Converter._BASE_TYPES:
-                convFunc = Converter._BASE_TYPES[slotType]
-            elif slotType in Converter._SPECIAL_TYPES:
-                convFunc = Converter._SPECIAL_TYPES[slotType]().encode
-            elif slotType in self._customTypes:
-                convFunc = self._customTypes[slotType][0]().encode
+            return data
+        
+        def encode(rosMsg):
+            data = {}
+            
+            for slotName, convFunc, listBool in fields:
+                field = getattr(rosMsg, slotName)
+                
+                try:
+                    if listBool:
+                        data[slotName] = map(convFunc, field)
+                    else:
+                        data[slotName] = convFunc(field)
+                except (ValueError, struct.error) as e:
+                    raise ValueError('{0}.{1}: {2}'.format(clsName, slotName,
+                                                           e))
+            
+            return data
+        
+        return encodePositional if positional else encode
+    
+    def compileProjection(self, msgCls, paths):
+        """ Create a function which generates JSON compatible data from a ROS
+            message containing only the selected fields. The generated data
+            is always a dictionary, where the intermediate messages contain
+            only the selected fields as well.
+            
+            @param msgCls:      ROS message class of the messages which should
+                                be encoded.
+            @type  msgCls:      ROS Message class
+            
+            @param paths:       Selected fields given as dotted paths, i.e.
+                                'pose.pose.position'. The path has to go
+                                through nested messages only, i.e. a field
+                                inside an array can not be selected.
+            @type  paths:       [ str ]
+            
+            @return:            Function which takes a ROS message instance as
+                                argument and returns the JSON compatible data.
+            @rtype:             callable
+            
+            @raise:             ValueError
+        """
+        if not paths:
+            raise ValueError('At least one field has to be selected.')
+        
+        # Build a tree with the slot names as keys and either a subtree or
+        # None, if the whole field is selected, as values
+        tree = {}
+        
+        for path in paths:
+            names = path.split('.')
+            node = tree
+            
+            for name in names[:-1]:
+                node = node.setdefault(name, {})
+                
+                if node is None:
+                    # The whole parent field is already selected
+                    break
             else:
-                convFunc = self._encode
+                node[names[-1]] = None
+        
+        return self._compileProjectedEncoder(msgCls, tree)
+    
+    def _compileProjectedEncoder(self, msgCls, tree):
+        """ Internally used method which returns a specialized encode function
+            for the given ROS message class which encodes only the fields
+            selected in the given projection tree.
+        """
+        slotTypes = dict(zip(msgCls.__slots__, msgCls._slot_types))
+        fields = []
+        
+        for slotName, subtree in tree.iteritems():
+            try:
+                slotType = slotTypes[slotName]
+            except KeyError:
+                raise ValueError('Message type "{0}" has no field '
+                                 '"{1}".'.format(msgCls._type, slotName))
+            
+            if subtree is None:
+                convFunc, listBool = self._fieldEncoder(slotType, False, False)
+            else:
+                baseType, listBool, _ = parse_type(slotType)
+                
+                if (listBool or baseType in Converter._BASE_TYPES or
+                    baseType in Converter._SPECIAL_TYPES or
+                    baseType in self._customTypes):
+                    raise ValueError('Field "{0}" of message type "{1}" has '
+                                     'no selectable subfields.'.format(
+                                         slotName, msgCls._type))
+                
+                convFunc = self._compileProjectedEncoder(
+                    self._loadMsgCls(baseType), subtree)
+            
+            fields.append((slotName, convFunc, listBool))
+        
+        return self._fieldsEncoder(msgCls.__name__, fields, False)
+    
+    def compileNumericGetter(self, msgCls, path):
+        """ Create a function which returns the value of a numeric field of a
+            ROS message. Fields of type time or duration are returned in
+            seconds.
+            
+            @param msgCls:      ROS message class of the messages from which
+                                the value should be read.
+            @type  msgCls:      ROS Message class
             
+            @param path:        Field given as dotted path, i.e.
+                                'pose.pose.position.x'.
+            @type  path:        str
+            
+            @return:            Function which takes a ROS message instance as
+                                argument and returns the value of the field.
+            @rtype:             callable
+            
+            @raise:             ValueError
+        """
+        names = path.split('.')
+        
+        for i, name in enumerate(names):
             try:
-                if listBool:
-                    data[slotName] = map(convFunc, field)
-                else:
-                    data[slotName] = convFunc(field)
-            except ValueError as e:
-                raise ValueError('{0}.{1}: {2}'.format(
-                                     rosMsg.__class__.__name__, slotName, e))
-
-        return data
+                slotType = msgCls._slot_types[msgCls.__slots__.index(name)]
+            except ValueError:
+                raise ValueError('Message type "{0}" has no field '
+                                 '"{1}".'.format(msgCls._type, name))
+            
+            slotType, listBool, _ = parse_type(slotType)
+            last = i == len(names) - 1
+            
+            if listBool:
+                raise ValueError('Field "{0}" of message type "{1}" is an '
+                                 'array.'.format(name, msgCls._type))
+            
+            if (slotType in Converter._BASE_TYPES or
+                slotType in Converter._SPECIAL_TYPES or
+                slotType in self._customTypes):
+                if not last:
+                    raise ValueError('Field "{0}" of message type "{1}" has '
+                                     'no subfields.'.format(name,
+                                                            msgCls._type))
+            elif last:
+                raise ValueError('Field "{0}" of message type "{1}" is a '
+                                 'message.'.format(name, msgCls._type))
+            else:
+                msgCls = self._loadMsgCls(slotType)
+        
+        if slotType in Converter._SPECIAL_TYPES:
+            def getter(rosMsg):
+                for name in names:
+                    rosMsg = getattr(rosMsg, name)
+                
+                return rosMsg.to_sec()
+        elif slotType in Converter._ARRAY_FORMATS or slotType == 'bool':
+            def getter(rosMsg):
+                for name in names:
+                    rosMsg = getattr(rosMsg, name)
+                
+                return rosMsg
+        else:
+            raise ValueError('Field "{0}" of message type "{1}" is not '
+                             'numeric.'.format(names[-1], msgCls._type))
+        
+        return getter
     
-    def encode(self, rosMsg):
+    def _primitiveArrayEncoder(self, slotType, binaryArrays):
+        """ Internally used method to create the encode function for an array
+            of a numeric type, which converts the whole array in one go.
+            
+            If the flag binaryArrays is set, arrays with at least
+            'binaryArrayThreshold' elements are packed as little-endian binary
+            data instead of being added as a JSON list.
+        """
+        fmt = Converter._ARRAY_FORMATS[slotType]
+        threshold = self._binaryArrayThreshold if binaryArrays else 0
+        
+        def encode(field):
+            # Arrays of type uint8 or char are stored as a str by genpy
+            if isinstance(field, str):
+                if threshold and len(field) >= threshold:
+                    return StringIO(field)
+                
+                return list(bytearray(field))
+            
+            if threshold and len(field) >= threshold:
+                return StringIO(struct.pack('<{0}{1}'.format(len(field), fmt),
+                                            *field))
+            
+            return list(field)
+        
+        return encode
+    
+    def encode(self, rosMsg, positional=False, binaryArrays=False):
         """ Generate JSON compatible data from a ROS message.
 
             @param rosMsg:  The ROS message instance which should be converted.
             @type  rosMsg:  ROS message instance
 
+            @param positional:  Flag which is True if the messages should be
+                                encoded as lists with the fields in the order
+                                given by the method 'getLayouts' instead of
+                                dictionaries.
+            @type  positional:  bool
+            
+            @param binaryArrays:    Flag which is True if numeric arrays with
+                                at least 'binaryArrayThreshold' elements
+                                should be packed as little-endian binary data
+                                instead of being added as JSON lists.
+            @type  binaryArrays:    bool
+            
             @return:    Dictionary containing the parsed message. The basic
                         form does map each field in the ROS message to a key /
                         value pair in the returned data dict. Binaries are
                         added as StringIO instances.
-            @rtype:     {}
+            @rtype:     {} / []
 
             @raise:     TypeError, ValueError
         """
@@ -239,54 +590,450 @@ class Converter(object):
             raise TypeError('Given rosMsg object is not an instance of '
                             'genpy.message.Message.')
         
-        for converter, cls in self._customTypes.itervalues():
-            if isinstance(rosMsg, cls):
-                return converter().encode(rosMsg)
+        return self._getEncoder(rosMsg.__class__, positional,
+                                binaryArrays)(rosMsg)
+    
+    def encodeSerialized(self, msgCls, data, positional=False):
+        """ Generate the JSON encoded message directly from a serialized ROS
+            message without creating the ROS message instance and the JSON
+            compatible data first.
+            
+            This is only possible if the message does not contain any binary
+            data, i.e. the method 'hasBinaries' returns False for the message
+            class.
+            
+            @param msgCls:  ROS message class of the serialized message.
+            @type  msgCls:  ROS Message class
+            
+            @param data:    Serialized ROS message.
+            @type  data:    str
+            
+            @param positional:  Flag which is True if the messages should be
+                                encoded as lists with the fields in the order
+                                given by the method 'getLayouts' instead of
+                                dictionaries.
+            @type  positional:  bool
+            
+            @return:        JSON encoded message.
+            @rtype:         rce.util.converter.JSONFragment
+            
+            @raise:         TypeError, ValueError
+        """
+        if self.hasBinaries(msgCls):
+            raise TypeError('Message of type "{0}" can not be encoded '
+                            'directly.'.format(msgCls._type))
+        
+        parts = []
         
-        return self._encode(rosMsg)
+        try:
+            self._getSerializedEncoder(msgCls, positional)(data, 0, parts)
+        except struct.error as e:
+            raise ValueError('{0}: {1}'.format(msgCls.__name__, e))
+        
+        return JSONFragment(''.join(parts))
     
-    def _decode(self, msgCls, data):
-        """ Internally used method which is responsible for the heavy lifting.
+    def _getSerializedEncoder(self, msgCls, positional):
+        """ Internally used method to get the compiled function which writes
+            the JSON representation of a serialized ROS message. The function
+            is compiled on first use.
         """
-        rosMsg = msgCls()
-
-        for (slotName, slotType) in zip(rosMsg.__slots__, rosMsg._slot_types):
-            if slotName not in data:
-                continue
-
-            if '[]' == slotType[-2:]:
-                listBool = True
-                slotType = slotType[:-2]
+        try:
+            return self._serializedEncoders[msgCls, positional]
+        except KeyError:
+            encoder = self._compileSerializedEncoder(msgCls, positional)
+            self._serializedEncoders[msgCls, positional] = encoder
+            return encoder
+    
+    def _compileSerializedEncoder(self, msgCls, positional):
+        """ Internally used method which resolves the layout of the given ROS
+            message class once and returns a function which reads the
+            serialized message starting at the given offset, appends the JSON
+            representation to the given list and returns the offset of the
+            end of the message.
+        """
+        fields = []
+        
+        for slotName, slotType in zip(msgCls.__slots__, msgCls._slot_types):
+            slotType, listBool, arrayLen = parse_type(slotType)
+            
+            if listBool and slotType in Converter._ARRAY_FORMATS:
+                writer = self._serializedArrayWriter(slotType, arrayLen)
             else:
-                listBool = False
+                if slotType in Converter._BASE_TYPES:
+                    writer = self._serializedBaseWriter(slotType)
+                elif slotType in Converter._SPECIAL_TYPES:
+                    writer = self._serializedSpecialWriter(slotType)
+                else:
+                    writer = self._getSerializedEncoder(
+                        self._loadMsgCls(slotType), positional)
+                
+                if listBool:
+                    writer = self._serializedListWriter(writer, arrayLen)
             
-            field = data[slotName]
+            if positional:
+                prefix = ','
+            else:
+                prefix = ',{0}:'.format(json.dumps(slotName))
             
-            if listBool and not isinstance(field, list):
-                raise TypeError('Given data does not match the definition of '
-                                'the ROS message.')
+            fields.append((prefix, writer))
+        
+        if not fields:
+            empty = '[]' if positional else '{}'
+            
+            def write(data, offset, parts):
+                parts.append(empty)
+                return offset
+            
+            return write
+        
+        start, end = ('[', ']') if positional else ('{', '}')
+        fields[0] = (start + fields[0][0][1:], fields[0][1])
+        
+        def write(data, offset, parts):
+            for prefix, writer in fields:
+                parts.append(prefix)
+                offset = writer(data, offset, parts)
+            
+            parts.append(end)
+            return offset
+        
+        return write
+    
+    def _serializedBaseWriter(self, slotType):
+        """ Internally used method to create the function which writes a single
+            field of a base type of a serialized message.
+        """
+        length = Converter._LENGTH
+        
+        if slotType == 'string':
+            encodeString = json.encoder.encode_basestring_ascii
+            
+            def write(data, offset, parts):
+                size, = length.unpack_from(data, offset)
+                offset += 4
+                
+                if offset + size > len(data):
+                    raise struct.error('string exceeds the message length')
+                
+                parts.append(encodeString(data[offset:offset+size]))
+                return offset + size
+            
+            return write
+        
+        if slotType == 'bool':
+            fmt = struct.Struct('<B')
+            toJSON = lambda value: 'true' if value else 'false'
+        else:
+            fmt = struct.Struct('<' + Converter._ARRAY_FORMATS[slotType])
+            toJSON = _jsonFloat if slotType[:5] == 'float' else str
+        
+        size = fmt.size
+        
+        def write(data, offset, parts):
+            value, = fmt.unpack_from(data, offset)
+            parts.append(toJSON(value))
+            return offset + size
+        
+        return write
+    
+    def _serializedSpecialWriter(self, slotType):
+        """ Internally used method to create the function which writes a single
+            field of a special type, i.e. time or duration, of a serialized
+            message.
+        """
+        cls, fmt = Converter._SPECIAL_FORMATS[slotType]
+        fmt = struct.Struct(fmt)
+        size = fmt.size
+        encode = Converter._SPECIAL_TYPES[slotType]().encode
+        
+        def write(data, offset, parts):
+            parts.append(json.dumps(encode(cls(*fmt.unpack_from(data,
+                                                                offset)))))
+            return offset + size
+        
+        return write
+    
+    def _serializedArrayWriter(self, slotType, arrayLen):
+        """ Internally used method to create the function which writes an array
+            of a numeric type of a serialized message in one go.
+        """
+        length = Converter._LENGTH
+        fmt = Converter._ARRAY_FORMATS[slotType]
+        size = struct.calcsize(fmt)
+        
+        if fmt == 'B':
+            unpack = lambda data, offset, n: bytearray(data[offset:offset+n])
+        else:
+            fmt = '<{0}' + fmt
+            unpack = lambda data, offset, n: struct.unpack_from(fmt.format(n),
+                                                                data, offset)
+        
+        toJSON = _jsonFloat if slotType[:5] == 'float' else str
+        
+        def write(data, offset, parts):
+            if arrayLen is None:
+                n, = length.unpack_from(data, offset)
+                offset += 4
+            else:
+                n = arrayLen
+            
+            end = offset + n*size
+            
+            if end > len(data):
+                raise struct.error('array exceeds the message length')
+            
+            parts.append('[{0}]'.format(','.join(map(toJSON,
+                                                     unpack(data, offset, n)))))
+            return end
+        
+        return write
+    
+    def _serializedListWriter(self, writer, arrayLen):
+        """ Internally used method to create the function which writes an array
+            of a serialized message whose elements are written using the given
+            function.
+        """
+        length = Converter._LENGTH
+        
+        def write(data, offset, parts):
+            if arrayLen is None:
+                n, = length.unpack_from(data, offset)
+                offset += 4
+            else:
+                n = arrayLen
+            
+            parts.append('[')
+            
+            for i in xrange(n):
+                if i:
+                    parts.append(',')
+                
+                offset = writer(data, offset, parts)
+            
+            parts.append(']')
+            return offset
+        
+        return write
+    
+    def hasBinaries(self, msgCls, binaryArrays=False):
+        """ Check whether the JSON compatible data generated from a ROS message
+            of the given class might contain binary data, i.e. StringIO
+            instances. This is the case if a custom Converter is used for the
+            message or any of its fields or if numeric arrays can be sent as
+            binary data.
+            
+            @param msgCls:  ROS message class which should be checked.
+            @type  msgCls:  ROS Message class
+            
+            @param binaryArrays:    Flag which is True if the message is
+                                encoded with the binary arrays enabled.
+            @type  binaryArrays:    bool
+            
+            @return:        True if the encoded message might contain binary
+                            data; False otherwise.
+            @rtype:         bool
+        """
+        try:
+            return self._binaries[msgCls, binaryArrays]
+        except KeyError:
+            pass
+        
+        for _, cls in self._customTypes.itervalues():
+            if issubclass(msgCls, cls):
+                binary = True
+                break
+        else:
+            binary = False
+            
+            for slotType in msgCls._slot_types:
+                slotType, listBool, _ = parse_type(slotType)
+                
+                if slotType in Converter._BASE_TYPES:
+                    binary = (listBool and binaryArrays and
+                              self._binaryArrayThreshold > 0 and
+                              slotType in Converter._ARRAY_FORMATS)
+                elif slotType in Converter._SPECIAL_TYPES:
+                    continue
+                elif slotType in self._customTypes:
+                    binary = True
+                else:
+                    binary = self.hasBinaries(self._loadMsgCls(slotType),
+                                              binaryArrays)
+                
+                if binary:
+                    break
+        
+        self._binaries[msgCls, binaryArrays] = binary
+        return binary
+    
+    def getLayouts(self, msgCls):
+        """ Get the layouts of the given ROS message class and of all message
+            classes used in its fields. The layouts describe the order of the
+            fields in the positional encoding. Message classes which are
+            handled by a custom Converter have no layout.
+            
+            @param msgCls:  ROS message class for which the layouts should be
+                            returned.
+            @type  msgCls:  ROS Message class
+            
+            @return:    Dictionary with the message type, i.e.
+                        'std_msgs/Int8', as key and a list of the tuples
+                        (field name, field type) as value.
+            @rtype:     { str : [ (str, str) ] }
+        """
+        layouts = {}
+        self._collectLayouts(msgCls, layouts)
+        return layouts
+    
+    def _collectLayouts(self, msgCls, layouts):
+        """ Internally used method to add the layouts of the given message
+            class to the given dictionary.
+        """
+        for _, cls in self._customTypes.itervalues():
+            if issubclass(msgCls, cls):
+                return
+        
+        layouts[msgCls._type] = zip(msgCls.__slots__, msgCls._slot_types)
+        
+        for slotType in msgCls._slot_types:
+            slotType, _, _ = parse_type(slotType)
+            
+            if (slotType in Converter._BASE_TYPES or
+                slotType in Converter._SPECIAL_TYPES or
+                slotType in self._customTypes or slotType in layouts):
+                continue
+            
+            self._collectLayouts(self._loadMsgCls(slotType), layouts)
+    
+    def _getDecoder(self, msgCls):
+        """ Internally used method to get the compiled decode function for the
+            given ROS message class. The function is compiled on first use.
+        """
+        try:
+            return self._decoders[msgCls]
+        except KeyError:
+            decoder = self._compileDecoder(msgCls)
+            self._decoders[msgCls] = decoder
+            return decoder
+    
+    def _compileDecoder(self, msgCls):
+        """ Internally used method which resolves the layout of the given ROS
+            message class once and returns a specialized decode function.
+        """
+        fields = []
+        
+        for slotName, slotType in zip(msgCls.__slots__, msgCls._slot_types):
+            slotType, listBool, _ = parse_type(slotType)
+            
+            if listBool and slotType in Converter._ARRAY_FORMATS:
+                fields.append((slotName, self._primitiveArrayDecoder(slotType),
+                               False))
+                continue
             
             if slotType in Converter._BASE_TYPES:
-                convFunc = self._stringify
-                slotCls = None
+                convFunc = _stringify
             elif slotType in Converter._SPECIAL_TYPES:
-                convFunc = Converter._SPECIAL_TYPES[slotType]().decode
-                slotCls = None
-            elif slotType in self._customTypes and _checkIsStringIO(field):
-                convFunc = self._customTypes[slotType][0]().decode
-                slotCls = None
+                convFunc = partial(Converter._SPECIAL_TYPES[slotType]().decode,
+                                   None)
+            elif slotType in self._customTypes:
+                converter = self._customTypes[slotType][0]
+                convFunc = self._customFieldDecoder(
+                    converter().decode,
+                    self._getDecoder(self._loadMsgCls(slotType)),
+                    getattr(converter, 'STRUCTURED', False))
             else:
-                convFunc = self._decode
-                slotCls = self._loader.loadMsg(*slotType.split('/'))
+                convFunc = self._getDecoder(self._loadMsgCls(slotType))
             
-            if listBool:
-                msgData = map(lambda ele: convFunc(slotCls, ele), field)
-            else:
-                msgData = convFunc(slotCls, field)
+            fields.append((slotName, convFunc, listBool))
+        
+        def decodePositional(data):
+            if len(data) != len(fields):
+                raise TypeError('Given data does not match the definition of '
+                                'the ROS message.')
             
-            setattr(rosMsg, slotName, msgData)
-
-        return rosMsg
+            rosMsg = msgCls()
+            
+            for (slotName, convFunc, listBool), field in zip(fields, data):
+                if listBool:
+                    if not isinstance(field, list):
+                        raise TypeError('Given data does not match the '
+                                        'definition of the ROS message.')
+                    
+                    setattr(rosMsg, slotName, map(convFunc, field))
+                else:
+                    setattr(rosMsg, slotName, convFunc(field))
+            
+            return rosMsg
+        
+        def decode(data):
+            if isinstance(data, list):
+                return decodePositional(data)
+            
+            rosMsg = msgCls()
+            
+            for slotName, convFunc, listBool in fields:
+                if slotName not in data:
+                    continue
+                
+                field = data[slotName]
+                
+                if listBool:
+                    if not isinstance(field, list):
+                        raise TypeError('Given data does not match the '
+                                        'definition of the ROS message.')
+                    
+                    setattr(rosMsg, slotName, map(convFunc, field))
+                else:
+                    setattr(rosMsg, slotName, convFunc(field))
+            
+            return rosMsg
+        
+        return decode
+    
+    @staticmethod
+    def _primitiveArrayDecoder(slotType):
+        """ Internally used method to create the decode function for an array
+            of a numeric type. The array can either be given as a JSON list,
+            which is used as it is, or as little-endian binary data.
+        """
+        fmt = Converter._ARRAY_FORMATS[slotType]
+        size = struct.calcsize('<' + fmt)
+        rawData = slotType in ('uint8', 'char')
+        
+        def decode(field):
+            if isinstance(field, list):
+                return field
+            
+            if not _checkIsStringIO(field):
+                raise TypeError('Given data does not match the definition of '
+                                'the ROS message.')
+            
+            data = field.getvalue()
+            
+            if rawData:
+                return data
+            
+            if len(data) % size:
+                raise ValueError('Length of binary data does not match the '
+                                 'size of the array elements.')
+            
+            return struct.unpack('<{0}{1}'.format(len(data)//size, fmt), data)
+        
+        return decode
+    
+    @staticmethod
+    def _customFieldDecoder(customFunc, genericFunc, structured):
+        """ Internally used method to create a decode function for a field
+            with a custom Converter, which is only used if binary data is
+            received for the field or if the custom Converter is structured.
+        """
+        def decode(field):
+            if structured or _checkIsStringIO(field):
+                return customFunc(None, field)
+            else:
+                return genericFunc(field)
+        
+        return decode
     
     def decode(self, msgCls, data):
         """ Generate a ROS message from JSON compatible data.
@@ -296,18 +1043,19 @@ class Converter(object):
             @type  msgCls:  ROS Message class
 
             @param data:    Dictionary with keys matching the fields in the
-                            desired ROS message. Binary files should be
-                            included as StringIO instances.
-            @param data:    { str : {} }
+                            desired ROS message or list with the fields in the
+                            order of the message layout. Binary files should
+                            be included as StringIO instances.
+            @param data:    { str : {} } / []
 
             @return:    ROS message of type rosMsg containing the given data.
             @rtype:     ROS message of type rosMsg
 
             @raise:     TypeError, ValueError
         """
-        if _checkIsStringIO(data):
-            for converter, cls in self._customTypes.itervalues():
-                if msgCls == cls:
-                    return converter().decode(msgCls, data)
+        for converter, cls in self._customTypes.itervalues():
+            if msgCls == cls and (_checkIsStringIO(data) or
+                                  getattr(converter, 'STRUCTURED', False)):
+                return converter().decode(msgCls, data)
         
-        return self._decode(msgCls, data)
+        return self._getDecoder(msgCls)(data)
@@ -31,6 +31,8 @@
 #     
 
 # Python specific imports
+import struct
+
 try:
     from cStringIO import StringIO, InputType, OutputType
     from StringIO import StringIO as pyStringIO
@@ -56,8 +58,12 @@ from rce.util.converters.interfaces import IROSConverter
 
 
 class ImageConverter(object):
-    """ Convert images from PNG file format to ROS sensor message format and
-        back.
+    """ Convert images from PNG/JPEG file format or a raw format to ROS sensor
+        message format and back.
+        
+        The raw format consists of a header, i.e. the magic string 'RIMG',
+        width, height and step as little-endian uint32 and the ROS encoding
+        as null-padded string of 16 bytes, followed by the image data.
     """
     implements(IROSConverter)
     
@@ -68,58 +74,193 @@ class ImageConverter(object):
     _ENCODINGMAP_ROS_TO_PY = { 'mono8' : 'L', 'rgb8' : 'RGB',
                                'rgba8' : 'RGBA', 'yuv422' : 'YCbCr' }
     _PIL_MODE_CHANNELS = { 'L' : 1, 'RGB' : 3, 'RGBA' : 4, 'YCbCr' : 3 }
+    
+    _CODECS = ('png', 'jpeg', 'raw')
+    
+    _RAW_MAGIC = 'RIMG'
+    _RAW_HEADER = struct.Struct('<4sIII16s')
+    
+    def __init__(self, codec='png', level=None, quality=75, scale=1.0,
+                 roi=None):
+        """ Initialize the ImageConverter. The arguments can be given for each
+            Converter interface using the option 'converter'.
+            
+            @param codec:       Format of the encoded images; one of 'png',
+                                'jpeg' or 'raw'.
+            @type  codec:       str
+            
+            @param level:       zlib compression level (0-9) of PNG images;
+                                None uses the default of PIL.
+            @type  level:       int
+            
+            @param quality:     Quality (1-100) of JPEG images.
+            @type  quality:     int
+            
+            @param scale:       Factor (0-1] by which the images are scaled
+                                down before they are encoded.
+            @type  scale:       float
+            
+            @param roi:         Region of interest (x, y, width, height) to
+                                which the images are cropped before they are
+                                scaled and encoded; None uses the whole image.
+            @type  roi:         [int]
+            
+            @raise:             ValueError
+        """
+        if codec not in ImageConverter._CODECS:
+            raise ValueError('Image codec has to be one of '
+                             '{0}.'.format(', '.join(ImageConverter._CODECS)))
+        
+        if level is not None and level not in range(10):
+            raise ValueError('PNG compression level has to be an integer '
+                             'between 0 and 9.')
+        
+        if quality not in range(1, 101):
+            raise ValueError('JPEG quality has to be an integer between 1 and '
+                             '100.')
+        
+        if not isinstance(scale, (int, long, float)) or not 0 < scale <= 1:
+            raise ValueError('Image scale has to be a number in (0, 1].')
+        
+        if roi is not None:
+            if (not isinstance(roi, (list, tuple)) or len(roi) != 4 or
+                not all(isinstance(v, (int, long)) and v >= 0 for v in roi) or
+                not roi[2] or not roi[3]):
+                raise ValueError('Image ROI has to be a list of four '
+                                 'non-negative integers (x, y, width, '
+                                 'height).')
+            
+            roi = tuple(roi)
+        
+        self._codec = str(codec)
+        self._level = level
+        self._quality = quality
+        self._scale = scale
+        self._roi = roi
 
     def decode(self, _, imgObj):
-        """ Convert a image stored (PIL library readable image file format)
-            in a StringIO object to a ROS compatible message
+        """ Convert a image stored (PIL library readable image file format or
+            raw format) in a StringIO object to a ROS compatible message
             (sensor_msgs.Image).
         """
         if not _checkIsStringIO(imgObj):
             raise TypeError('Given object is not a StringIO instance.')
         
-        # Checking of image according to django.forms.fields.ImageField
+        imgObj.seek(0)
+        
+        if imgObj.read(4) == ImageConverter._RAW_MAGIC:
+            return self._decodeRaw(imgObj)
+        
+        # Decode the image only once; loading the image checks the content as
+        # well
+        imgObj.seek(0)
+        
         try:
-            imgObj.seek(0)
             img = Image.open(imgObj)
-            img.verify()
-        except:
+            img.load()
+        except Exception:
             raise ValueError('Content of given image could not be verified.')
         
-        imgObj.seek(0)
-        img = Image.open(imgObj)
-        img.load()
-        
         # Everything ok, convert PIL.Image to ROS and return it
         if img.mode == 'P':
             img = img.convert('RGB')
         
+        try:
+            encoding = ImageConverter._ENCODINGMAP_PY_TO_ROS[img.mode]
+        except KeyError:
+            raise ValueError('Image mode "{0}" is not '
+                             'supported.'.format(img.mode))
+        
         rosimage = sensor_msgs.msg.Image()
-        rosimage.encoding = ImageConverter._ENCODINGMAP_PY_TO_ROS[img.mode]
+        rosimage.encoding = encoding
         (rosimage.width, rosimage.height) = img.size
         rosimage.step = (ImageConverter._PIL_MODE_CHANNELS[img.mode]
                          * rosimage.width)
         rosimage.data = img.tostring()
         return rosimage
+    
+    def _decodeRaw(self, imgObj):
+        """ Internally used method to convert an image in the raw format to a
+            ROS compatible message (sensor_msgs.Image).
+        """
+        imgObj.seek(0)
+        header = imgObj.read(ImageConverter._RAW_HEADER.size)
+        
+        try:
+            _, width, height, step, encoding = \
+                ImageConverter._RAW_HEADER.unpack(header)
+        except struct.error:
+            raise ValueError('Header of raw image is incomplete.')
+        
+        data = imgObj.read()
+        
+        if len(data) != height*step:
+            raise ValueError('Size of raw image does not match its header.')
+        
+        rosimage = sensor_msgs.msg.Image()
+        rosimage.encoding = encoding.rstrip('\0')
+        rosimage.width = width
+        rosimage.height = height
+        rosimage.step = step
+        rosimage.data = data
+        return rosimage
 
     def encode(self, rosMsg):
-        """ Convert a ROS compatible message (sensor_msgs.Image) to a
-            PNG encoded image stored in a StringIO object.
+        """ Convert a ROS compatible message (sensor_msgs.Image) to an image
+            in the selected format stored in a StringIO object.
         """
         if not isinstance(rosMsg, sensor_msgs.msg.Image):
             raise TypeError('Given object is not a sensor_msgs.msg.Image '
                             'instance.')
-
+        
+        img = StringIO()
+        
+        if (self._codec == 'raw' and self._scale == 1 and
+            self._roi is None):
+            # Nothing to do for PIL; ship the image data as is
+            img.write(ImageConverter._RAW_HEADER.pack(
+                ImageConverter._RAW_MAGIC, rosMsg.width, rosMsg.height,
+                rosMsg.step, rosMsg.encoding))
+            img.write(rosMsg.data)
+            return img
+        
+        try:
+            mode = ImageConverter._ENCODINGMAP_ROS_TO_PY[rosMsg.encoding]
+        except KeyError:
+            raise ValueError('Image encoding "{0}" is not '
+                             'supported.'.format(rosMsg.encoding))
+        
         # Convert to PIL Image
-        pil = Image.fromstring(
-                ImageConverter._ENCODINGMAP_ROS_TO_PY[rosMsg.encoding],
-                (rosMsg.width, rosMsg.height),
-                rosMsg.data,
-                'raw',
-                ImageConverter._ENCODINGMAP_ROS_TO_PY[rosMsg.encoding],
-                0,
-                1)
-
+        pil = Image.fromstring(mode, (rosMsg.width, rosMsg.height),
+                               rosMsg.data, 'raw', mode, 0, 1)
+        
+        if self._roi:
+            x, y, width, height = self._roi
+            x, y = min(x, pil.size[0]), min(y, pil.size[1])
+            pil = pil.crop((x, y, min(x+width, pil.size[0]),
+                            min(y+height, pil.size[1])))
+        
+        if self._scale != 1:
+            pil = pil.resize((max(int(pil.size[0]*self._scale), 1),
+                              max(int(pil.size[1]*self._scale), 1)),
+                             Image.BILINEAR)
+        
         # Save to StringIO
-        img = StringIO()
-        pil.save(img, 'PNG')
+        if self._codec == 'png':
+            if self._level is None:
+                pil.save(img, 'PNG')
+            else:
+                pil.save(img, 'PNG', compress_level=self._level)
+        elif self._codec == 'jpeg':
+            if pil.mode == 'RGBA':
+                pil = pil.convert('RGB')
+            
+            pil.save(img, 'JPEG', quality=self._quality)
+        else:
+            img.write(ImageConverter._RAW_HEADER.pack(
+                ImageConverter._RAW_MAGIC, pil.size[0], pil.size[1],
+                ImageConverter._PIL_MODE_CHANNELS[pil.mode]*pil.size[0],
+                ImageConverter._ENCODINGMAP_PY_TO_ROS[pil.mode]))
+            img.write(pil.tostring())
+        
         return img
@@ -37,6 +37,15 @@ from zope.interface import Interface, Attribute
 class IROSConverter(Interface):
     """ Interface which declares the necessary methods which all ROS message
         types converters have to implement.
+        
+        The constructor has to work without arguments; optional keyword
+        arguments can be used to configure the converter for a single
+        Converter interface.
+        
+        The method 'decode' is only used for binary data, i.e. StringIO
+        instances, unless the converter sets the optional class attribute
+        STRUCTURED to True, in which case it receives also the JSON compatible
+        dictionaries generated by its method 'encode'.
     """
     MESSAGE_TYPE = Attribute("""
     Identifier which is used to select the ROS converter.
@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#     
+#     sensor.py
+#     
+#     This file is part of the RoboEarth Cloud Engine framework.
+#     
+#     This file was originally created for RoboEearth
+#     http://www.roboearth.org/
+#     
+#     The research leading to these results has received funding from
+#     the European Union Seventh Framework Programme FP7/2007-2013 under
+#     grant agreement no248942 RoboEarth.
+#     
+#     Copyright 2012 RoboEarth
+#     
+#     Licensed under the Apache License, Version 2.0 (the "License");
+#     you may not use this file except in compliance with the License.
+#     You may obtain a copy of the License at
+#     
+#     http://www.apache.org/licenses/LICENSE-2.0
+#     
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#     
+#     \author/s: Dominique Hunziker 
+#     
+#     
+
+# Python specific imports
+try:
+    from cStringIO import StringIO, InputType, OutputType
+    from StringIO import StringIO as pyStringIO
+    
+    def _checkIsStringIO(obj):
+        return isinstance(obj, (InputType, OutputType, pyStringIO))
+except ImportError:
+    from StringIO import StringIO
+    
+    def _checkIsStringIO(obj):
+        return isinstance(obj, StringIO)
+
+import numpy
+
+# ROS specific imports
+from rospy.rostime import Time
+import sensor_msgs.msg
+import nav_msgs.msg
+
+# zope specific imports
+from zope.interface import implements
+
+# Custom imports
+from rce.util.converters.interfaces import IROSConverter
+
+
+def _encodeHeader(header):
+    """ Internally used function to convert a std_msgs/Header to a JSON
+        compatible dictionary.
+    """
+    return {'seq' : header.seq, 'frame_id' : header.frame_id,
+            'stamp' : {'secs' : header.stamp.secs,
+                       'nsecs' : header.stamp.nsecs}}
+
+
+def _decodeHeader(header, data):
+    """ Internally used function to fill a std_msgs/Header from a JSON
+        compatible dictionary.
+    """
+    try:
+        header.seq = int(data.get('seq', 0))
+        header.frame_id = str(data.get('frame_id', ''))
+        stamp = data.get('stamp', {})
+        header.stamp = Time(int(stamp.get('secs', 0)),
+                            int(stamp.get('nsecs', 0)))
+    except AttributeError:
+        raise TypeError('Header has to be a dictionary.')
+
+
+def _getBinary(data, key):
+    """ Internally used function to get the content of a binary field of a
+        JSON compatible dictionary.
+    """
+    try:
+        binary = data[key]
+    except KeyError:
+        raise ValueError("Message is missing the field '{0}'.".format(key))
+    
+    if not _checkIsStringIO(binary):
+        raise TypeError("Field '{0}' has to be binary data.".format(key))
+    
+    return binary.getvalue()
+
+
+def _checkRange(minRange, maxRange):
+    """ Internally used function to validate the range clipping options.
+    """
+    for value in (minRange, maxRange):
+        if not isinstance(value, (int, long, float)) or value < 0:
+            raise ValueError('Range limits have to be non-negative numbers.')
+    
+    if maxRange and maxRange < minRange:
+        raise ValueError('Maximal range has to be larger than the minimal '
+                         'range.')
+
+
+class PointCloud2Converter(object):
+    """ Convert point clouds to a JSON header and a packed binary attachment
+        containing the points and back.
+        
+        The points can be clipped to a range around the sensor and downsampled
+        using a voxel grid; in both cases the resulting point cloud is
+        unorganized and contains no invalid (NaN) points.
+    """
+    implements(IROSConverter)
+    
+    STRUCTURED = True
+    
+    MESSAGE_TYPE = 'sensor_msgs/PointCloud2'
+    
+    # numpy types of the PointField data types
+    _DTYPES = { 1 : 'i1', 2 : 'u1', 3 : 'i2', 4 : 'u2',
+                5 : 'i4', 6 : 'u4', 7 : 'f4', 8 : 'f8' }
+    
+    def __init__(self, voxel=0.0, minRange=0.0, maxRange=0.0):
+        """ Initialize the PointCloud2Converter. The arguments can be given
+            for each Converter interface using the option 'converter'.
+            
+            @param voxel:       Edge length of the voxels which are used to
+                                downsample the point cloud; one point per
+                                voxel is kept. 0 disables the downsampling.
+            @type  voxel:       float
+            
+            @param minRange:    Minimal distance of a point from the origin.
+            @type  minRange:    float
+            
+            @param maxRange:    Maximal distance of a point from the origin;
+                                0 disables the limit.
+            @type  maxRange:    float
+            
+            @raise:             ValueError
+        """
+        if not isinstance(voxel, (int, long, float)) or voxel < 0:
+            raise ValueError('Voxel size has to be a non-negative number.')
+        
+        _checkRange(minRange, maxRange)
+        
+        self._voxel = voxel
+        self._minRange = minRange
+        self._maxRange = maxRange
+    
+    def _dtype(self, rosMsg):
+        """ Internally used method to create the numpy data type matching a
+            point of the point cloud.
+        """
+        byteorder = '>' if rosMsg.is_bigendian else '<'
+        names, formats, offsets = [], [], []
+        
+        for field in rosMsg.fields:
+            try:
+                fmt = byteorder + PointCloud2Converter._DTYPES[field.datatype]
+            except KeyError:
+                raise ValueError('Point field "{0}" has an invalid data '
+                                 'type.'.format(field.name))
+            
+            names.append(field.name)
+            formats.append((fmt, field.count) if field.count > 1 else fmt)
+            offsets.append(field.offset)
+        
+        return numpy.dtype({'names' : names, 'formats' : formats,
+                            'offsets' : offsets,
+                            'itemsize' : rosMsg.point_step})
+    
+    def _filter(self, rosMsg):
+        """ Internally used method to clip and downsample the points of the
+            point cloud.
+        """
+        if len(rosMsg.data) < rosMsg.height*rosMsg.row_step:
+            raise ValueError('Point cloud data is incomplete.')
+        
+        dtype = self._dtype(rosMsg)
+        
+        if not set(('x', 'y', 'z')).issubset(dtype.names):
+            raise ValueError('Point cloud has no fields x, y and z.')
+        
+        points = numpy.ndarray((rosMsg.height, rosMsg.width), dtype,
+                               rosMsg.data,
+                               strides=(rosMsg.row_step, rosMsg.point_step))
+        points = points.reshape(-1)
+        
+        xyz = numpy.column_stack((points['x'], points['y'],
+                                  points['z'])).astype('f8')
+        mask = numpy.isfinite(xyz).all(axis=1)
+        
+        if self._minRange or self._maxRange:
+            dist = numpy.sqrt((xyz*xyz).sum(axis=1))
+            mask &= dist >= self._minRange
+            
+            if self._maxRange:
+                mask &= dist <= self._maxRange
+        
+        points = points[mask]
+        
+        if self._voxel and len(points):
+            voxels = numpy.floor(xyz[mask]/self._voxel).astype('i8')
+            voxels = numpy.ascontiguousarray(voxels).view(
+                numpy.dtype((numpy.void, voxels.dtype.itemsize*3)))
+            _, index = numpy.unique(voxels.reshape(-1), return_index=True)
+            points = points[numpy.sort(index)]
+        
+        return points
+    
+    def decode(self, _, data):
+        """ Generate a sensor_msgs/PointCloud2 message from the JSON
+            compatible header and the binary point data.
+        """
+        if not isinstance(data, dict):
+            raise TypeError('Point cloud has to be a dictionary.')
+        
+        rosMsg = sensor_msgs.msg.PointCloud2()
+        _decodeHeader(rosMsg.header, data.get('header', {}))
+        
+        try:
+            rosMsg.height = int(data['height'])
+            rosMsg.width = int(data['width'])
+            rosMsg.is_bigendian = bool(data.get('is_bigendian', False))
+            rosMsg.point_step = int(data['point_step'])
+            rosMsg.row_step = int(data['row_step'])
+            rosMsg.is_dense = bool(data.get('is_dense', False))
+            rosMsg.fields = [sensor_msgs.msg.PointField(
+                                 str(f['name']), int(f['offset']),
+                                 int(f['datatype']), int(f.get('count', 1)))
+                             for f in data['fields']]
+        except KeyError as e:
+            raise ValueError('Point cloud is missing the field {0}.'.format(e))
+        
+        rosMsg.data = _getBinary(data, 'data')
+        
+        if len(rosMsg.data) != rosMsg.height*rosMsg.row_step:
+            raise ValueError('Size of point cloud data does not match its '
+                             'header.')
+        
+        return rosMsg
+    
+    def encode(self, rosMsg):
+        """ Convert a sensor_msgs/PointCloud2 message to a JSON compatible
+            header and the binary point data.
+        """
+        if not isinstance(rosMsg, sensor_msgs.msg.PointCloud2):
+            raise TypeError('Given object is not a sensor_msgs.msg.PointCloud2'
+                            ' instance.')
+        
+        fields = [{'name' : f.name, 'offset' : f.offset,
+                   'datatype' : f.datatype, 'count' : f.count}
+                  for f in rosMsg.fields]
+        
+        if self._voxel or self._minRange or self._maxRange:
+            points = self._filter(rosMsg)
+            height, width = 1, len(points)
+            rowStep = width*rosMsg.point_step
+            isDense = True
+            data = points.tostring()
+        else:
+            # Ship the point data as is
+            height, width = rosMsg.height, rosMsg.width
+            rowStep = rosMsg.row_step
+            isDense = rosMsg.is_dense
+            data = rosMsg.data
+        
+        return {'header' : _encodeHeader(rosMsg.header), 'height' : height,
+                'width' : width, 'fields' : fields,
+                'is_bigendian' : rosMsg.is_bigendian,
+                'point_step' : rosMsg.point_step, 'row_step' : rowStep,
+                'is_dense' : isDense, 'data' : StringIO(data)}
+
+
+class LaserScanConverter(object):
+    """ Convert laser scans to a JSON header and packed little-endian float32
+        attachments containing the ranges and intensities and back.
+        
+        The ranges can be clipped, i.e. ranges outside of the limits are
+        replaced by NaN, and the scan can be downsampled by keeping only every
+        n-th beam.
+    """
+    implements(IROSConverter)
+    
+    STRUCTURED = True
+    
+    MESSAGE_TYPE = 'sensor_msgs/LaserScan'
+    
+    def __init__(self, step=1, minRange=0.0, maxRange=0.0):
+        """ Initialize the LaserScanConverter. The arguments can be given for
+            each Converter interface using the option 'converter'.
+            
+            @param step:        Only every n-th beam of the scan is kept.
+            @type  step:        int
+            
+            @param minRange:    Minimal valid range.
+            @type  minRange:    float
+            
+            @param maxRange:    Maximal valid range; 0 disables the limit.
+            @type  maxRange:    float
+            
+            @raise:             ValueError
+        """
+        if not isinstance(step, (int, long)) or step < 1:
+            raise ValueError('Step has to be a positive integer.')
+        
+        _checkRange(minRange, maxRange)
+        
+        self._step = step
+        self._minRange = minRange
+        self._maxRange = maxRange
+    
+    def decode(self, _, data):
+        """ Generate a sensor_msgs/LaserScan message from the JSON compatible
+            header and the binary ranges and intensities.
+        """
+        if not isinstance(data, dict):
+            raise TypeError('Laser scan has to be a dictionary.')
+        
+        rosMsg = sensor_msgs.msg.LaserScan()
+        _decodeHeader(rosMsg.header, data.get('header', {}))
+        
+        try:
+            for field in ('angle_min', 'angle_max', 'angle_increment',
+                          'time_increment', 'scan_time', 'range_min',
+                          'range_max'):
+                setattr(rosMsg, field, float(data[field]))
+        except KeyError as e:
+            raise ValueError('Laser scan is missing the field {0}.'.format(e))
+        
+        rosMsg.ranges = numpy.frombuffer(_getBinary(data, 'ranges'),
+                                         '<f4').tolist()
+        
+        if 'intensities' in data:
+            rosMsg.intensities = numpy.frombuffer(
+                _getBinary(data, 'intensities'), '<f4').tolist()
+        
+        return rosMsg
+    
+    def encode(self, rosMsg):
+        """ Convert a sensor_msgs/LaserScan message to a JSON compatible
+            header and the binary ranges and intensities.
+        """
+        if not isinstance(rosMsg, sensor_msgs.msg.LaserScan):
+            raise TypeError('Given object is not a sensor_msgs.msg.LaserScan '
+                            'instance.')
+        
+        ranges = numpy.asarray(rosMsg.ranges, '<f4')[::self._step]
+        intensities = numpy.asarray(rosMsg.intensities, '<f4')[::self._step]
+        rangeMin, rangeMax = rosMsg.range_min, rosMsg.range_max
+        
+        if self._minRange or self._maxRange:
+            rangeMin = max(rangeMin, self._minRange)
+            
+            if self._maxRange:
+                rangeMax = min(rangeMax, self._maxRange)
+            
+            with numpy.errstate(invalid='ignore'):
+                ranges[(ranges < rangeMin) | (ranges > rangeMax)] = numpy.nan
+        
+        return {'header' : _encodeHeader(rosMsg.header),
+                'angle_min' : rosMsg.angle_min,
+                'angle_max' : rosMsg.angle_max,
+                'angle_increment' : rosMsg.angle_increment*self._step,
+                'time_increment' : rosMsg.time_increment*self._step,
+                'scan_time' : rosMsg.scan_time,
+                'range_min' : rangeMin, 'range_max' : rangeMax,
+                'ranges' : StringIO(ranges.tostring()),
+                'intensities' : StringIO(intensities.tostring())}
+
+
+class OccupancyGridConverter(object):
+    """ Convert occupancy grids to a JSON header and a packed int8 attachment
+        containing the cells and back.
+    """
+    implements(IROSConverter)
+    
+    STRUCTURED = True
+    
+    MESSAGE_TYPE = 'nav_msgs/OccupancyGrid'
+    
+    def decode(self, _, data):
+        """ Generate a nav_msgs/OccupancyGrid message from the JSON compatible
+            header and the binary cells.
+        """
+        if not isinstance(data, dict):
+            raise TypeError('Occupancy grid has to be a dictionary.')
+        
+        rosMsg = nav_msgs.msg.OccupancyGrid()
+        _decodeHeader(rosMsg.header, data.get('header', {}))
+        
+        try:
+            info = data['info']
+            rosMsg.info.map_load_time = Time(
+                int(info['map_load_time']['secs']),
+                int(info['map_load_time']['nsecs']))
+            rosMsg.info.resolution = float(info['resolution'])
+            rosMsg.info.width = int(info['width'])
+            rosMsg.info.height = int(info['height'])
+            
+            origin = rosMsg.info.origin
+            
+            for field in ('x', 'y', 'z'):
+                setattr(origin.position, field,
+                        float(info['origin']['position'][field]))
+            
+            for field in ('x', 'y', 'z', 'w'):
+                setattr(origin.orientation, field,
+                        float(info['origin']['orientation'][field]))
+        except (KeyError, TypeError) as e:
+            raise ValueError('Occupancy grid has an invalid field '
+                             '{0}.'.format(e))
+        
+        cells = numpy.frombuffer(_getBinary(data, 'data'), 'i1')
+        
+        if len(cells) != rosMsg.info.width*rosMsg.info.height:
+            raise ValueError('Size of occupancy grid does not match its '
+                             'header.')
+        
+        rosMsg.data = cells.tolist()
+        return rosMsg
+    
+    def encode(self, rosMsg):
+        """ Convert a nav_msgs/OccupancyGrid message to a JSON compatible
+            header and the binary cells.
+        """
+        if not isinstance(rosMsg, nav_msgs.msg.OccupancyGrid):
+            raise TypeError('Given object is not a nav_msgs.msg.OccupancyGrid '
+                            'instance.')
+        
+        info = rosMsg.info
+        position = info.origin.position
+        orientation = info.origin.orientation
+        
+        return {'header' : _encodeHeader(rosMsg.header),
+                'info' : {'map_load_time' : {
+                              'secs' : info.map_load_time.secs,
+                              'nsecs' : info.map_load_time.nsecs},
+                          'resolution' : info.resolution,
+                          'width' : info.width, 'height' : info.height,
+                          'origin' : {
+                              'position' : {'x' : position.x,
+                                            'y' : position.y,
+                                            'z' : position.z},
+                              'orientation' : {'x' : orientation.x,
+                                               'y' : orientation.y,
+                                               'z' : orientation.z,
+                                               'w' : orientation.w}}},
+                'data' : StringIO(numpy.asarray(rosMsg.data,
+                                                'i1').tostring())}
@@ -56,4 +56,5 @@ cred = UsernamePassword('robot', 'robot')
 # Run main function
 main(reactor, cred, sys.argv[1], settings.MASTER_PORT, settings.EXT_IF,
      settings.WS_PORT, settings.RCE_INTERNAL_PORT, settings.ROOT_PKG_DIR,
-     settings.CONVERTER_CLASSES)
+     settings.CONVERTER_CLASSES,
+     getattr(settings, 'BINARY_ARRAY_THRESHOLD', 0))
@@ -31,6 +31,7 @@
 #     
 
 # twisted specific imports
+from twisted.python import log
 from autobahn.websocket import WebSocketClientFactory, \
     WebSocketClientProtocol
 
@@ -38,23 +39,31 @@ from autobahn.websocket import WebSocketClientFactory, \
 import sys                          ### TODO:
 sys.path.append('../framework')     ### TEMPORARY FIX
 
-from rce.client.assembler import MessageAssembler
+from rce.client.assembler import MessageAssembler, MSGPACK_ENCODING
 
 
 class RCERobotProtocol(WebSocketClientProtocol):
     """ WebSocket client protocol which is used to communicate with the Robot
         Manager.
     """
-    def __init__(self, conn):
+    # CONFIG
+    MAX_PAUSE = 1.0     # Maximal time in seconds the reading is paused
+    
+    def __init__(self, conn, encoding):
         """ Initialize the protocol.
                                 
             @param conn:        Connection instance which provides callback
                                 functions.
             @type  conn:        pyrce.connection._Connection
+            
+            @param encoding:    Wire encoding which is used for the messages.
+            @type  encoding:    str
         """
         self._connection = conn
+        self._encoding = encoding
         self._assembler = MessageAssembler(self, 60)
         self._registered = False
+        self._resumeCall = None
     
     def onOpen(self):
         """ This method is called by twisted as soon as the websocket
@@ -68,7 +77,29 @@ class RCERobotProtocol(WebSocketClientProtocol):
         """ This method is called by twisted when a new message has been
             received.
         """
-        self._assembler.processMessage(msg, binary)
+        if self._encoding == MSGPACK_ENCODING:
+            self._assembler.processPackedMessage(msg)
+        else:
+            self._assembler.processMessage(msg, binary)
+    
+    def sendBinaryMessage(self, uri, binary):
+        """ Send a binary message to the Robot Manager. The URI and the binary
+            data are written as a single frame without joining the two parts
+            first.
+            
+            @param uri:         URI which is used to identify the binary data.
+            @type  uri:         str
+            
+            @param binary:      Binary data which should be sent.
+            @type  binary:      StringIO
+        """
+        payload = binary.getvalue()
+        
+        self.beginMessage(WebSocketClientProtocol.MESSAGE_TYPE_BINARY)
+        self.beginMessageFrame(len(uri) + len(payload))
+        self.sendMessageFrameData(uri)
+        self.sendMessageFrameData(payload)
+        self.endMessage()
     
     def processCompleteMessage(self, msg):
         """ Callback for MessageAssembler which will be called as soon as a
@@ -76,10 +107,55 @@ class RCERobotProtocol(WebSocketClientProtocol):
         """
         self._connection.receivedMessage(msg)
     
+    def assemblerCongested(self, congested):
+        """ Callback for MessageAssembler which will be called as soon as the
+            budget of the assembler is (almost) exhausted or has recovered.
+            
+            While the assembler is congested no data is read from the
+            connection, such that the Robot Manager has to slow down. As the
+            stored parts might only be completed by data which has not yet
+            been read, the reading is resumed after at most MAX_PAUSE seconds.
+        """
+        log.msg('Message assembler is {0}congested: {1}'.format(
+                    '' if congested else 'no longer ', self._assembler.stats))
+        
+        if congested:
+            self._pauseReading()
+        else:
+            self._resumeReading()
+    
+    def _pauseReading(self):
+        """ Internally used method to stop reading from the connection.
+        """
+        if self._resumeCall:
+            return
+        
+        self.transport.pauseProducing()
+        self._resumeCall = self._connection.reactor.callLater(
+            self.MAX_PAUSE, self._resumeReading)
+    
+    def _resumeReading(self):
+        """ Internally used method to resume reading from the connection.
+        """
+        if not self._resumeCall:
+            return
+        
+        if self._resumeCall.active():
+            self._resumeCall.cancel()
+        
+        self._resumeCall = None
+        self.transport.resumeProducing()
+    
     def onClose(self, *a):
         """ This method is called by twisted when the connection has been
             closed.
         """
+        if self._resumeCall:
+            if self._resumeCall.active():
+                self._resumeCall.cancel()
+            
+            self._resumeCall = None
+        
         if self._registered:
             self._connection.unregisterConnection(self)
             self._assembler.stop()
@@ -97,7 +173,7 @@ class RCERobotFactory(WebSocketClientFactory):
     """ WebSocket protocol factory which is used for the communication with the
         Robot Manager.
     """
-    def __init__(self, url, conn):
+    def __init__(self, url, conn, encoding):
         """ Initialize the factory.
             
             @param url:         URL of the Robot Manager.
@@ -106,14 +182,18 @@ class RCERobotFactory(WebSocketClientFactory):
             @param conn:        Connection instance which provides callback
                                 functions.
             @type  conn:        pyrce.connection._Connection
+            
+            @param encoding:    Wire encoding which is used for the messages.
+            @type  encoding:    str
         """
         WebSocketClientFactory.__init__(self, url)
         self._connection = conn
+        self._encoding = encoding
     
     def buildProtocol(self, addr):
         """ This method is called by twisted when a new connection should be
             made.
         """
-        p = RCERobotProtocol(self._connection)
+        p = RCERobotProtocol(self._connection, self._encoding)
         p.factory = self
         return p
@@ -34,6 +34,7 @@
 from urllib import urlencode
 from urllib2 import urlopen, HTTPError
 import json
+import struct
 import weakref
 
 try:
@@ -58,7 +59,8 @@ import sys                          ### TODO:
 sys.path.append('../framework')     ### TEMPORARY FIX
 
 from rce.client import types
-from rce.client.assembler import recursiveBinarySearch
+from rce.client.assembler import recursiveBinarySearch, packMessage, \
+    ENCODINGS, JSON_ENCODING, MSGPACK_ENCODING, ARRAY_FORMATS
 
 # Custom local imports
 from comm import RCERobotFactory
@@ -72,6 +74,29 @@ if interface.HAS_ROS:
 _VERSION = '20130210'  # Client version
 
 
+def _unpackArray(baseType, field):
+    """ Convert a numeric array which has been sent as little-endian binary
+        data back into a list.
+        
+        @param baseType:    Type of the elements of the array, i.e. 'float32'.
+        @type  baseType:    str
+        
+        @param field:       Binary data of the array.
+        @type  field:       StringIO
+        
+        @return:            Elements of the array.
+        @rtype:             list
+    """
+    data = field.getvalue()
+    fmt = ARRAY_FORMATS[baseType]
+    
+    if fmt == 'B':
+        return list(bytearray(data))
+    
+    count = len(data) // struct.calcsize('<' + fmt)
+    return list(struct.unpack('<{0}{1}'.format(count, fmt), data))
+
+
 class ConnectionError(Exception):
     """ Error is raised when there is no connection or the connection is
         not valid.
@@ -83,7 +108,8 @@ class _Connection(object):
     """
     INTERFACE_MAP = {}
     
-    def __init__(self, userID, robotID, password, reactor):
+    def __init__(self, userID, robotID, password, reactor,
+                 encoding=JSON_ENCODING, positional=False, binaryArrays=False):
         """ Initialize the Connection.
             
             @param userID:      User ID which will be used to authenticate the
@@ -101,11 +127,39 @@ class _Connection(object):
             @param reactor:     Reference to reactor which is used for this
                                 connection.
             @type  reactor:     twisted::reactor
+            
+            @param encoding:    Preferred wire encoding for the messages.
+                                Either 'json' or 'msgpack', where 'msgpack'
+                                requires the python package msgpack. If the
+                                cloud engine does not support the encoding
+                                'json' is used.
+            @type  encoding:    str
+            
+            @param positional:  Flag which is True if the cloud engine should
+                                send the converted messages as lists in the
+                                order of the message layouts instead of
+                                dictionaries. The received messages are
+                                expanded to dictionaries again.
+            @type  positional:  bool
+            
+            @param binaryArrays:    Flag which is True if the cloud engine
+                                should send large numeric arrays in the
+                                converted messages as binary data instead of
+                                JSON lists. The received arrays are unpacked
+                                into lists again.
+            @type  binaryArrays:    bool
         """
+        if encoding not in ENCODINGS:
+            raise ValueError("Encoding '{0}' is not "
+                             'supported.'.format(encoding))
+        
         self._userID = userID
         self._robotID = robotID
         self._password = password
         self._reactor = reactor
+        self._encoding = encoding
+        self._positional = positional
+        self._binaryArrays = binaryArrays
         
         self._argList = [('userID', self._userID), ('robotID', self._robotID)]
         
@@ -113,6 +167,11 @@ class _Connection(object):
         self._connectedDeferred = None
         
         self._interfaces = {}
+        
+        # Layouts of the message types and the message type of the interfaces
+        # which are used for the positional encoding and the binary arrays
+        self._layouts = {}
+        self._interfaceLayouts = {}
     
     @property
     def reactor(self):
@@ -129,6 +188,8 @@ class _Connection(object):
             raise ConnectionError('There is already a connection registered.')
         
         self._conn = conn
+        self._layouts = {}
+        self._interfaceLayouts = {}
         
         print('Connection to RCE established.')
         
@@ -160,6 +221,9 @@ class _Connection(object):
         args = self._argList+[('password', self._password),
                               ('version', _VERSION)]
         
+        if self._encoding != JSON_ENCODING:
+            args += [('encoding', self._encoding), ('encoding', JSON_ENCODING)]
+        
         try:
             f = urlopen('{0}?{1}'.format(masterUrl, urlencode(args)))
         except HTTPError as e:
@@ -186,9 +250,22 @@ class _Connection(object):
         
         print('Connect to Robot Manager on: {0}'.format(url))
         
+        # Use the encoding selected by the Master
+        self._encoding = resp.get('encoding', JSON_ENCODING)
+        args = self._argList+[('key', resp['key'])]
+        
+        if self._encoding != JSON_ENCODING:
+            args.append(('encoding', self._encoding))
+        
+        if self._positional:
+            args.append(('positional', '1'))
+        
+        if self._binaryArrays:
+            args.append(('binaryArrays', '1'))
+        
         # Make websocket connection to Robot Manager
-        args = urlencode(self._argList+[('key', resp['key'])])
-        factory = RCERobotFactory('{0}?{1}'.format(url, args), self)
+        factory = RCERobotFactory('{0}?{1}'.format(url, urlencode(args)), self,
+                                  self._encoding)
         connectWS(factory)
     
     def connect(self, masterUrl, deferred):
@@ -262,12 +339,16 @@ class _Connection(object):
         if not self._conn:
             raise ConnectionError('No connection registered.')
         
+        if self._encoding == MSGPACK_ENCODING:
+            self._conn.sendMessage(packMessage(msg), True)
+            return
+        
         uriBinary, msgURI = recursiveBinarySearch(msg)
         
         self._conn.sendMessage(json.dumps(msgURI))
         
-        for data in uriBinary:
-            self._conn.sendMessage(data[0] + data[1].getvalue(), binary=True)
+        for uri, data in uriBinary:
+            self._conn.sendBinaryMessage(uri, data)
     
     def createContainer(self, cTag):
         """ Create a container.
@@ -396,7 +477,7 @@ class _Connection(object):
                            'data':{'deleteParam':[{'containerTag':cTag,
                                                    'name':name}]}})
     
-    def addInterface(self, eTag, iTag, iType, iCls, addr=''):
+    def addInterface(self, eTag, iTag, iType, iCls, addr='', options=None):
         """ Add an interface.
             
             @param eTag:        Tag of endpoint to which the interface should
@@ -424,6 +505,17 @@ class _Connection(object):
                                 the name under which the interface will be
                                 available in the local ROS environment.
             @type  addr:        str
+            
+            @param options:     Optional argument which is used for
+                                Publishers to enable conflation and
+                                throttling of the messages sent to the robot,
+                                e.g. {'conflate' : True, 'maxRate' : 10}, and
+                                to configure custom Converters, e.g.
+                                {'converter' : {'codec' : 'jpeg'}}, or to
+                                select fields and send messages only on a
+                                change, e.g. {'fields' : ['pose.position'],
+                                'threshold' : {'pose.position.x' : 0.01}}
+            @type  options:     dict
         """
         print('Request addition of interface "{0}" of type "{1}" to endpoint '
               '"{2}".'.format(iTag, iType, eTag))
@@ -441,6 +533,9 @@ class _Connection(object):
         if addr:
             interface['addr'] = addr
         
+        if options:
+            interface['options'] = options
+        
         self._sendMessage({'type':types.CONFIGURE_COMPONENT,
                            'data':{'addInterfaces':[interface]}})
     
@@ -543,10 +638,13 @@ class _Connection(object):
         
         if msgType == types.ERROR:
             print('Received error message: {0}'.format(data))
-#        elif msgType == types.STATUS:
-#            print('Received status message: {0}'.format(data))
+        elif msgType == types.STATUS:
+            print('Received status message: {0}'.format(data))
         elif msgType == types.DATA_MESSAGE:
             self._processDataMessage(data)
+        elif msgType == types.LAYOUT:
+            self._layouts.update(data['layouts'])
+            self._interfaceLayouts[data['iTag']] = data['type']
         else:
             print('Received message with unknown message type: '
                   '{0}'.format(msgType))
@@ -561,14 +659,85 @@ class _Connection(object):
         msgType = dataMsg['type']
         msg = dataMsg['msg']
         msgID = dataMsg['msgID']
+        iTag = dataMsg['iTag']
+        
+        if isinstance(msg, list):
+            msg = self._expandMessage(self._interfaceLayouts[iTag], msg)
+        elif (self._binaryArrays and isinstance(msg, dict) and
+              iTag in self._interfaceLayouts):
+            msg = self._unpackArrays(self._interfaceLayouts[iTag], msg)
         
         try:
-            interfaces = self._interfaces[dataMsg['iTag']].copy()
+            interfaces = self._interfaces[iTag].copy()
         except (KeyError, weakref.ReferenceError):
             interfaces = []
         
         for interface in interfaces:
             interface.callback(msgType, msg, msgID)
+    
+    def _expandMessage(self, msgType, msg):
+        """ Internally used method to convert a message in the positional
+            encoding into a dictionary.
+            
+            @param msgType:     Message type of the message, i.e.
+                                'std_msgs/Int32'.
+            @type  msgType:     str
+            
+            @param msg:         Message in the positional encoding.
+            @type  msg:         list
+            
+            @return:            Message in the dictionary encoding.
+            @rtype:             dict
+        """
+        data = {}
+        
+        for (name, fieldType), field in zip(self._layouts[msgType], msg):
+            baseType = fieldType.split('[', 1)[0]
+            
+            if baseType in self._layouts:
+                if baseType == fieldType:
+                    field = self._expandMessage(baseType, field)
+                else:
+                    field = [self._expandMessage(baseType, f) for f in field]
+            elif baseType in ARRAY_FORMATS and _checkIsStringIO(field):
+                field = _unpackArray(baseType, field)
+            
+            data[name] = field
+        
+        return data
+    
+    def _unpackArrays(self, msgType, msg):
+        """ Internally used method to convert the numeric arrays of a
+            message which have been sent as binary data into lists.
+            
+            @param msgType:     Message type of the message, i.e.
+                                'sensor_msgs/LaserScan'.
+            @type  msgType:     str
+            
+            @param msg:         Message in the dictionary encoding.
+            @type  msg:         dict
+            
+            @return:            Given message, where the numeric arrays have
+                                been replaced by lists.
+            @rtype:             dict
+        """
+        for name, fieldType in self._layouts[msgType]:
+            if name not in msg:
+                continue
+            
+            field = msg[name]
+            baseType = fieldType.split('[', 1)[0]
+            
+            if baseType in self._layouts:
+                if baseType == fieldType:
+                    self._unpackArrays(baseType, field)
+                else:
+                    for f in field:
+                        self._unpackArrays(baseType, f)
+            elif baseType in ARRAY_FORMATS and _checkIsStringIO(field):
+                msg[name] = _unpackArray(baseType, field)
+        
+        return msg
 
 
 class Connection(_Connection):
@@ -639,6 +808,10 @@ if interface.HAS_ROS:
             'SubscriberConverter' : 'SubscriberForwarder'
         }
         
+        # Flag which is True if the serialized ROS messages are exchanged
+        # without compression
+        RAW = False
+        
         _LOADER = Loader()
         
         @property
@@ -693,3 +866,18 @@ if interface.HAS_ROS:
             @param addr:        Address where the service will be available.
             """
             return interface.ROSService(self, iTag, srvType, addr)
+    
+    
+    class ROSRawConnection(ROSConnection):
+        """ Connection which should be used for ROS based messages if the
+            serialized ROS messages should be exchanged without compression,
+            e.g. for robots which are connected through a LAN.
+        """
+        INTERFACE_MAP = {
+            'ServiceClientConverter' : 'ServiceClientRaw',
+            'ServiceProviderConverter' : 'ServiceProviderRaw',
+            'PublisherConverter' : 'PublisherRaw',
+            'SubscriberConverter' : 'SubscriberRaw'
+        }
+        
+        RAW = True
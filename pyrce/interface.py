@@ -56,6 +56,27 @@ from twisted.internet.defer import Deferred
 _GZIP_LVL = 9
 
 
+def _pack(conn, buff):
+    """ Internally used function to wrap a serialized ROS message for the
+        communication with the cloud engine. The message is only compressed
+        if the connection does not use the Raw interfaces.
+    """
+    if conn.RAW:
+        return StringIO(buff)
+    
+    return StringIO(zlib.compress(buff, _GZIP_LVL))
+
+
+def _unpack(conn, msg):
+    """ Internally used function to get the serialized ROS message from a
+        message received from the cloud engine.
+    """
+    if conn.RAW:
+        return msg.getvalue()
+    
+    return zlib.decompress(msg.getvalue())
+
+
 class _Publisher(object):
     """ Abstract implementation of a Publisher Interface.
     """
@@ -212,7 +233,7 @@ if HAS_ROS:
         def _rosCB(self, msg):
             """ Internally used callback for ROS Subscriber.
             """
-            self.publish(StringIO(zlib.compress(msg._buff, _GZIP_LVL)))
+            self.publish(_pack(self._conn, msg._buff))
         
         def __del__(self):
             """ Finalize the Publisher.
@@ -246,7 +267,7 @@ if HAS_ROS:
                 Publisher.
             """
             rosMsg = rospy.AnyMsg()
-            rosMsg._buff = zlib.decompress(msg.getvalue())
+            rosMsg._buff = _unpack(self._conn, msg)
             
             self._pub.publish(rosMsg)
         
@@ -295,7 +316,7 @@ if HAS_ROS:
             deferred.addCallback(self._callback, uid, event)
             self._responses[uid] = deferred
             
-            msg = StringIO(zlib.compress(req._buff, _GZIP_LVL))
+            msg = _pack(self._conn, req._buff)
             
             self._conn.sendMessage(self._iTag, self._srvType, msg, uid)
             event.wait()
@@ -313,7 +334,7 @@ if HAS_ROS:
                 Service as response.
             """
             rosMsg = rospy.AnyMsg()
-            rosMsg._buff = zlib.decompress(msg.getvalue())
+            rosMsg._buff = _unpack(self._conn, msg)
             
             with self._pendingLock:
                 self._pending[uid] = rosMsg
@@ -44,7 +44,7 @@ except ImportError:
 from twisted.internet.defer import Deferred
 
 # Custom imports
-from connection import ConnectionError, ROSConnection
+from connection import ConnectionError, ROSConnection, ROSRawConnection
 
 
 _MAP = {#'ServiceConverter' : '???',
@@ -125,8 +125,11 @@ def main(config, reactor):
         print('Configuration is missing the key {0}.'.format(e))
         return 1
     
+    # The optional key 'raw' disables the compression of the ROS messages
+    connCls = ROSRawConnection if config.get('raw', False) else ROSConnection
+    
     # TODO: Add password at some point instead of just using userID as passwd
-    conn = ROSConnection(userID, robotID, userID, reactor)
+    conn = connCls(userID, robotID, userID, reactor)
     env = Environment(reactor, conn, config)
     
     deferred = Deferred()